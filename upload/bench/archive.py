@@ -0,0 +1,93 @@
+"""Per-job .py/.log files against the segment archive (scheduler/jobarchive.py) over a long history.
+
+Stores N jobs both ways, with code and logs shaped like real ones (a short program, the log header and
+a few hundred lines of prints), and reports the cost per finished job, the disk blocks and inodes the
+full history takes, and the time to look up a job and read its log from an offset. The old worker also
+listed and sorted logs/ after every job to keep 20; that cost is timed for a directory of 20 files.
+Usage: python bench/archive.py [jobs]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(SRC, 'scheduler'))
+
+from jobarchive import JobArchive
+
+def job(n):
+    code = (f"# job {n}\nfor i in range({n % 50 + 10}):\n"
+            f"    setLEDs([({n % 256}, i, 0, 100)] * getLEDCount())\n    print('frame', i)\n    sleep(0.1)\n")
+    lines = random.randint(20, 400)
+    log = (f"Job: editor.py\nUser: user{n % 37}\nHash: {n:08x}\n" + "=" * 50 + "\n\n"
+           + "".join(f"frame {i} value {random.random():.6f}\n" for i in range(lines)))
+    return f"{n:08x}", code.encode(), log.encode()
+
+def disk(paths):
+    blocks = inodes = 0
+    for path in paths:
+        blocks += os.stat(path).st_blocks * 512
+        inodes += 1
+    return blocks, inodes
+
+def files(root, jobs):
+    archive_dir, log_dir = os.path.join(root, "archive"), os.path.join(root, "logs")
+    os.makedirs(archive_dir)
+    os.makedirs(log_dir)
+    start = time.perf_counter()
+    for job_hash, code, log in jobs:
+        with open(os.path.join(archive_dir, f"{job_hash}.py"), 'wb') as f:
+            f.write(code)
+        with open(os.path.join(log_dir, f"{job_hash}.log"), 'wb') as f:
+            f.write(log)
+    per_job = (time.perf_counter() - start) / len(jobs)
+    names = os.listdir(log_dir)
+    start = time.perf_counter()
+    for _ in range(100):
+        # The old cleanup_old_logs, on a directory it keeps at 20
+        sorted(names[:20], key=lambda f: os.path.getmtime(os.path.join(log_dir, f)))
+    cleanup = (time.perf_counter() - start) / 100
+    paths = [os.path.join(d, name) for d in (archive_dir, log_dir) for name in os.listdir(d)]
+    def read(job_hash, offset):
+        with open(os.path.join(log_dir, f"{job_hash}.log"), 'rb') as f:
+            f.seek(offset)
+            return f.read()
+    return per_job + cleanup, disk(paths), read
+
+def segments(root, jobs):
+    archive = JobArchive(os.path.join(root, "archive"), os.path.join(root, "logs"))
+    start = time.perf_counter()
+    for job_hash, code, log in jobs:
+        archive.put(job_hash, code, log)
+    per_job = (time.perf_counter() - start) / len(jobs)
+    paths = [archive._path(segment) for segment in archive.segments()]
+    reader = JobArchive(archive.directory, archive.log_dir)
+    start = time.perf_counter()
+    reader.refresh()
+    print(f"segment index of {len(jobs)} jobs built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return per_job, disk(paths), lambda job_hash, offset: reader.read_log(job_hash, offset)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    random.seed(1)
+    jobs = [job(n) for n in range(count)]
+    raw = sum(len(code) + len(log) for _, code, log in jobs)
+    print(f"{count} jobs, {raw / 2**20:.1f} MB of code and logs")
+    print(f"{'store':>9} {'per job ms':>11} {'disk MB':>8} {'inodes':>7} {'lookup+read us':>15} {'tail read us':>13}")
+    for name, store in (("files", files), ("segments", segments)):
+        per_job, (blocks, inodes), read = store(tempfile.mkdtemp(), jobs)
+        sample = random.sample(jobs, 200)
+        start = time.perf_counter()
+        for job_hash, _, log in sample:
+            assert read(job_hash, 0) == log
+        full = (time.perf_counter() - start) / len(sample)
+        start = time.perf_counter()
+        for job_hash, _, log in sample:
+            assert read(job_hash, len(log) - 200) == log[-200:]
+        tail = (time.perf_counter() - start) / len(sample)
+        print(f"{name:>9} {per_job * 1000:>11.3f} {blocks / 2**20:>8.1f} {inodes:>7} {full * 1e6:>15.1f} {tail * 1e6:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""LED compositor costs: a producer's frame write, one compositor tick, and idle -> job hand-off through the real daemon.
+
+Ticks are timed with numpy and with the pure Python fallback, holding one layer, with an overlay on top,
+and mid-crossfade. The hand-off runs `python -m runner.compositor` on the null backend and watches the
+frame mirror: how long after the job's first frame the LEDs start fading to it, and how long the fade takes.
+Usage: python bench/compositor.py [leds]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, SRC)
+
+from runner import compositor, mirror
+from runner.compositor import Layer, Compositor, LAYERS, IDLE, JOB, NOTICE
+
+numpy_module = compositor.numpy
+
+def per_call(fn, seconds=0.5):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        calls += 1
+    return (time.perf_counter() - start) / calls
+
+def ticks(count, directory):
+    layers = [Layer.create(name, count, priority, flags, directory) for name, (priority, flags) in LAYERS.items()]
+    idle, job, notice = (Layer.open(name, directory) for name in (IDLE, JOB, NOTICE))
+    frame = bytes(n % 256 for n in range(count * 4))
+    for label, with_numpy in (("numpy", compositor.numpy), ("python", None)):
+        if label == "numpy" and with_numpy is None:
+            continue
+        compositor.numpy = with_numpy
+        for l in (idle, job, notice):
+            l.release()
+        c = Compositor(layers, lambda payload: None, crossfade=3600)
+        clock = [0.0]
+        def tick():
+            clock[0] += 0.001
+            c.tick(clock[0])
+        job.publish(frame)
+        c.tick(0.0)
+        c.crossfade = 0
+        c.key = ()
+        c.fade_start = None
+        print(f"{label:>7} tick, one layer      {per_call(tick) * 1000:8.3f} ms")
+        notice.publish(bytes((count - count // 20) * 4) + bytes((0, 0, 255, 100)) * (count // 20))
+        print(f"{label:>7} tick, with overlay   {per_call(tick) * 1000:8.3f} ms")
+        c.crossfade = 3600
+        idle.publish(frame[::-1])
+        print(f"{label:>7} tick, crossfading   {per_call(tick) * 1000:8.3f} ms")
+    compositor.numpy = numpy_module
+
+def handoff(count, directory):
+    mirror_path = os.path.join(directory, 'frames')
+    env = dict(os.environ, LED_BACKEND='null', TREE_LEDS=str(count), LED_COMPOSITOR=directory,
+               FRAME_MIRROR=mirror_path, LED_SOCKET='', LED_SEGMENTS='')
+    proc = subprocess.Popen([sys.executable, '-m', 'runner.compositor'], cwd=SRC, env=env, stdout=subprocess.DEVNULL)
+    try:
+        idle, job = Layer.open(IDLE, directory), Layer.open(JOB, directory)
+        idle_frame, job_frame = bytes((0, 0, 200, 100)) * count, bytes((200, 0, 0, 100)) * count
+        for _ in range(30):
+            idle.publish(idle_frame)
+            time.sleep(0.05)
+        ring = mirror.FrameRing.open(mirror_path)
+        idle.release()
+        started = time.monotonic()
+        job.publish(job_frame)
+        first = last = None
+        seen = ring.seq()
+        while time.monotonic() - started < compositor.CROSSFADE_SECONDS + 1:
+            latest = ring.latest()
+            if latest and latest[0] != seen:
+                seen = latest[0]
+                if first is None and latest[2][0] > 0:
+                    first = time.monotonic() - started
+                if latest[2] == job_frame:
+                    last = time.monotonic() - started
+                    break
+            time.sleep(0.001)
+        print(f"hand-off: LEDs move {first * 1000:.1f} ms after the job's first frame, "
+              f"fully the job's after {last * 1000:.0f} ms (CROSSFADE_SECONDS={compositor.CROSSFADE_SECONDS:g})")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    directory = tempfile.mkdtemp()
+    layer = Layer.create("bench", count, directory=directory)
+    frame = bytes(count * 4)
+    print(f"{count} LEDs")
+    print(f"producer frame write         {per_call(lambda: layer.publish(frame)) * 1e6:8.2f} us")
+    ticks(count, directory)
+    handoff(count, directory)
+
+if __name__ == "__main__":
+    main()
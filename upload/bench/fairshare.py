@@ -0,0 +1,112 @@
+"""Fair-share queue and ETA accuracy, simulated: 1,000 synthetic submissions against one tree on a virtual clock.
+
+One user floods (a third of all submissions), a few submit regularly and many only now and then; every user has
+a few programs with their own typical runtime. The same stream is run through the JobQueue twice, once with
+everyone as one user (plain first come, first served) and once fair-shared, both with the MAX_PENDING_PER_USER
+cap. At every submission the ETA the queue page would show is computed from the history so far and later
+compared with when the job really started.
+Usage: python bench/fairshare.py [submissions] [seed]
+"""
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from scheduler.eta import HISTORY, RuntimeModel, schedule
+from scheduler.jobqueue import JobQueue
+
+CAP = int(os.environ.get('MAX_PENDING_PER_USER', 5))
+TIMEOUT = 45.0
+# Offered load: expected runtime over mean gap between submissions; above 1 a backlog builds up
+LOAD = 1.2
+
+def submissions(count, rng):
+    users = ["flood"] * 35 + [f"regular{n}" for n in range(4)] * 10 + [f"casual{n}" for n in range(25)]
+    programs = {user: [min(rng.choice((3, 8, 15, 30, TIMEOUT)), TIMEOUT) for _ in range(3)] for user in sorted(set(users))}
+    mean_runtime = statistics.mean(t for runtimes in programs.values() for t in runtimes)
+    clock = 0.0
+    jobs = []
+    for n in range(count):
+        clock += rng.expovariate(LOAD / mean_runtime)
+        user = rng.choice(users)
+        program = rng.randrange(3)
+        runtime = min(programs[user][program] * rng.lognormvariate(0, 0.15), TIMEOUT)
+        jobs.append({"hash": f"j{n:04d}", "username": user, "code_hash": f"{user}/{program}",
+                     "submitted": clock, "runtime": runtime})
+    return jobs
+
+def simulate(jobs, fair):
+    queue = JobQueue()
+    pending = {}
+    finished = []
+    served = {}
+    starts, etas = {}, {}
+    rejected = 0
+    free_at = 0.0
+    running = None
+
+    def advance(until):
+        nonlocal free_at, running
+        while len(queue) and free_at <= until:
+            job = pending.pop(queue.pop(0))
+            start = max(free_at, job["submitted"])
+            starts[job["hash"]] = start
+            served[job["username"]] = start
+            free_at = start + job["runtime"]
+            running = dict(job, started=start)
+            finished.append({"username": job["username"], "code_hash": job["code_hash"],
+                             "seconds": job["runtime"], "finished": free_at})
+
+    for job in jobs:
+        now = job["submitted"]
+        advance(now)
+        if sum(1 for other in pending.values() if other["username"] == job["username"]) >= CAP:
+            rejected += 1
+            continue
+        pending[job["hash"]] = job
+        queue.push(job["hash"], job["username"] if fair else "", job["submitted"])
+        if fair:
+            history = [past for past in finished if past["finished"] <= now][-HISTORY:]
+            current = running if running is not None and free_at > now else None
+            etas[job["hash"]] = schedule(list(pending.values()), current, RuntimeModel(history),
+                                         served, now)[job["hash"]]
+    advance(float("inf"))
+    return starts, etas, rejected
+
+def waits(jobs, starts, prefix):
+    return sorted(starts[j["hash"]] - j["submitted"] for j in jobs if j["hash"] in starts and j["username"].startswith(prefix))
+
+def pct(values, q):
+    return values[min(int(len(values) * q), len(values) - 1)] if values else 0.0
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    jobs = submissions(count, random.Random(seed))
+    print(f"{count} submissions, load {LOAD}, cap {CAP} pending per user")
+    print(f"{'queue':>6} {'group':>8} {'jobs':>5} {'mean wait s':>12} {'p90 wait s':>11}")
+    results = {}
+    for fair in (False, True):
+        starts, etas, rejected = simulate(jobs, fair)
+        name = "fair" if fair else "fcfs"
+        for group in ("flood", "regular", "casual"):
+            group_waits = waits(jobs, starts, group)
+            results[name, group] = pct(group_waits, 0.9)
+            print(f"{name:>6} {group:>8} {len(group_waits):>5} {statistics.mean(group_waits):>12.0f} {pct(group_waits, 0.9):>11.0f}")
+        print(f"{name:>6} rejected by the cap: {rejected}")
+    assert results["fair", "casual"] < results["fcfs", "casual"]
+
+    errors = sorted(abs(etas[h] - starts[h]) for h in etas)
+    waited = [starts[h] - j["submitted"] for j in jobs for h in (j["hash"],) if h in etas]
+    relative = sorted(abs(etas[h] - starts[h]) / max(w, 1.0) for h, w in zip(etas, waited))
+    print(f"ETA error: median {statistics.median(errors):.1f} s, p90 {pct(errors, 0.9):.1f} s "
+          f"(median wait {statistics.median(waited):.1f} s), "
+          f"within 25% of the real wait for {sum(r <= 0.25 for r in relative) / len(relative):.0%} of jobs")
+    # An ETA has to say more about the wait than "some time": typically off by well under half of it,
+    # and even the worst tenth off by less than two thirds of a long wait
+    assert statistics.median(errors) < statistics.median(waited) / 2
+    assert pct(errors, 0.9) < pct(sorted(waited), 0.9) * 2 / 3
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Stand-in `neopixel`/`board` modules so the runner can be imported off a Raspberry Pi"""
+import sys
+import types
+
+class FakeNeoPixel:
+    """Mirrors the buffer layout of adafruit_pixelbuf.PixelBuf; show() sends nothing"""
+    def __init__(self, pin, n, brightness=1.0, auto_write=False, pixel_order="GRB"):
+        self._pixels = n
+        self._bpp = 3
+        self._offset = 0
+        self._byteorder = tuple("RGB".index(c) for c in pixel_order)
+        self._post_brightness_buffer = bytearray(n * 3)
+        self._pre_brightness_buffer = bytearray(n * 3) if brightness != 1.0 else None
+        self.brightness = brightness
+        self.shows = 0
+
+    def __len__(self):
+        return self._pixels
+
+    def __setitem__(self, index, value):
+        offset = self._offset + index * self._bpp
+        for c in range(3):
+            if self._pre_brightness_buffer is not None:
+                self._pre_brightness_buffer[offset + self._byteorder[c]] = value[c]
+            self._post_brightness_buffer[offset + self._byteorder[c]] = int(value[c] * self.brightness)
+
+    def show(self):
+        self.shows += 1
+
+def install():
+    neopixel = types.ModuleType("neopixel")
+    neopixel.NeoPixel = FakeNeoPixel
+    neopixel.RGB = "RGB"
+    neopixel.GRB = "GRB"
+    board = types.ModuleType("board")
+    for pin in (10, 12, 18, 21):
+        setattr(board, f"D{pin}", pin)
+    sys.modules.setdefault("neopixel", neopixel)
+    sys.modules.setdefault("board", board)
@@ -0,0 +1,66 @@
+"""The idle wave written as user code both ways, at 500 LEDs: a list of tuples vs the Frame API.
+
+Both run through execute_code, so the list version pays the sandbox's guard on every index and
+iteration like real submissions do. Frames go straight to the null backend with the governor off.
+Usage: python bench/frame_api.py [frames]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ.setdefault('TREE_LEDS', '500')
+os.environ['LED_BACKEND'] = 'null'
+os.environ['FRAME_RATE'] = '0'
+os.environ['FRAME_MIRROR'] = ''
+os.environ['BYTECODE_CACHE_DIR'] = tempfile.mkdtemp()
+
+from runner import frame, leds
+from runner.main import execute_code
+
+LIST = """
+led_count = getLEDCount()
+for frame in range(FRAMES):
+    fade = min(1.0, frame / 100)
+    states = []
+    for i in range(led_count):
+        wave = math.sin((i / led_count * 4 * math.pi) + (frame / 20))
+        brightness = int((wave * 0.5 + 0.5) * 100 * fade)
+        r, g, b = int(80 * fade), int(50 * fade), int(200 * fade)
+        states.append((r, g, b, brightness))
+    setLEDs(states)
+"""
+
+FRAME = """
+states = Frame()
+for frame in range(FRAMES):
+    fade = min(1.0, frame / 100)
+    states.fill((int(80 * fade), int(50 * fade), int(200 * fade), 0))
+    states.levelWave(cycles=2, phase=frame / 20, high=100 * fade)
+    setLEDs(states)
+"""
+
+def per_frame_ms(code, frames):
+    code = code.replace("FRAMES", str(frames))
+    execute_code(code)
+    start = time.perf_counter()
+    execute_code(code)
+    return (time.perf_counter() - start) / frames * 1000
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    numpy = frame.numpy
+    list_ms = per_frame_ms(LIST, frames)
+    rows = [("list of tuples", list_ms), ("Frame", per_frame_ms(FRAME, frames))]
+    if numpy is not None:
+        frame.numpy = leds.numpy = None
+        rows.append(("Frame, no numpy", per_frame_ms(FRAME, frames)))
+        frame.numpy = leds.numpy = numpy
+    print(f"{leds.SIZE} LEDs, {frames} frames")
+    print(f"{'version':>16} {'ms/frame':>9} {'fps':>8} {'speedup':>8}")
+    for name, ms in rows:
+        print(f"{name:>16} {ms:>9.3f} {1000 / ms:>8.0f} {list_ms / ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
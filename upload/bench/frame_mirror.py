@@ -0,0 +1,59 @@
+"""Overhead that publishing to the frame mirror adds to setLEDs, at 500 LEDs by default.
+
+Times setLEDs with the mirror writer on and off (the LED driver itself is stubbed out so only
+the mirror's cost is compared) and checks it stays under the 1 ms budget. Also reads frames
+back the way /api/frames does.
+Usage: python bench/frame_mirror.py [frames]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ.setdefault('TREE_LEDS', '500')
+os.environ['FRAME_MIRROR'] = os.path.join(tempfile.mkdtemp(), "tree-frames")
+os.environ['LED_BACKEND'] = 'null'
+os.environ['FRAME_RATE'] = '0'
+
+from runner import exposed, leds, mirror
+
+BUDGET_MS = 1.0
+
+def per_call_ms(frames, states):
+    start = time.perf_counter()
+    for n in range(frames):
+        exposed.setLEDs(states[n % len(states)])
+    return (time.perf_counter() - start) / frames * 1000
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    size = exposed.SIZE
+    states = [[(n % 256, i % 256, 255 - i % 256, 100) for i in range(size)] for n in range(16)]
+    leds.set_framebuf = lambda payload: True
+
+    path = mirror.PATH
+    mirror.PATH = ""
+    mirror._writer = None
+    off = per_call_ms(frames, states)
+    mirror.PATH = path
+    mirror._writer = None
+    on = per_call_ms(frames, states)
+
+    reader = mirror.open_reader()
+    seq, _, frame = reader.latest()
+    assert seq == frames and frame == bytes(v for led in states[(frames - 1) % 16] for v in led)
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        reader.latest()
+    read = (time.perf_counter() - start) / frames * 1000
+
+    overhead = on - off
+    print(f"{size} LEDs: setLEDs {off:.4f} ms without mirror, {on:.4f} ms with, "
+          f"overhead {overhead * 1000:.1f} us; reader {read * 1000:.1f} us per frame")
+    print("OK" if overhead < BUDGET_MS else f"FAIL: overhead over {BUDGET_MS} ms")
+    return 0 if overhead < BUDGET_MS else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
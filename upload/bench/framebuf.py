@@ -0,0 +1,74 @@
+"""Frames per second of the setLEDs -> set_framebuf path at a few tree sizes, against a fake neopixel.
+
+Columns: the old per-pixel path, setLEDs with a list of tuples, setLEDs with a packed RGBL buffer,
+and (when NumPy is installed) the list case again on the pure-Python lookup table path.
+
+Usage: python bench/framebuf.py [seconds per case]
+"""
+import importlib
+import importlib.util
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ['FRAME_MIRROR'] = ''
+# Show every frame as it is set, so this measures the framebuffer path and not the frame rate cap
+os.environ['FRAME_RATE'] = '0'
+import fake_hw
+fake_hw.install()
+
+SIZES = (200, 500, 2000)
+
+def legacy_set_leds(leds, new_leds):
+    payload = bytearray()
+    for led in new_leds:
+        payload.extend(led)
+    payload = bytes(payload)
+    for i in range(leds.SIZE):
+        r, g, b, l = payload[i*4:i*4+4]
+        leds.backend.pixels[i] = leds.brightness_hack(l, r, g, b)
+    leds.backend.pixels.show()
+
+def wave(size, frame):
+    return [(80, 50, 200, int((math.sin(i / size * 4 * math.pi + frame / 20) * 0.5 + 0.5) * 100))
+            for i in range(size)]
+
+def fps(push, frames, seconds):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        push(frames[count % len(frames)])
+        count += 1
+    return count / (time.perf_counter() - start)
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    has_numpy = importlib.util.find_spec('numpy') is not None
+    print(f"{'LEDs':>6} {'legacy':>10} {'list':>10} {'buffer':>10}" + (f" {'no numpy':>10}" if has_numpy else ""))
+    for size in SIZES:
+        os.environ['TREE_LEDS'] = str(size)
+        from runner import leds, exposed
+        importlib.reload(leds)
+        importlib.reload(exposed)
+
+        frames = [wave(size, f) for f in range(32)]
+        packed = [bytes(v for led in frame for v in led) for frame in frames]
+        exposed.setLEDs(frames[0])
+        exposed.output.flush()
+        legacy_out = bytes(leds.backend.pixels._post_brightness_buffer)
+        legacy_set_leds(leds, frames[0])
+        assert legacy_out == bytes(leds.backend.pixels._post_brightness_buffer), "framebuffer output differs from legacy path"
+
+        row = [fps(lambda f: legacy_set_leds(leds, f), frames, seconds),
+               fps(exposed.setLEDs, frames, seconds),
+               fps(exposed.setLEDs, packed, seconds)]
+        if leds.numpy is not None:
+            leds.numpy = None
+            row.append(fps(exposed.setLEDs, frames, seconds))
+        print(f"{size:>6} " + " ".join(f"{r:>10.0f}" for r in row))
+
+if __name__ == "__main__":
+    main()
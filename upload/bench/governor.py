@@ -0,0 +1,44 @@
+"""A runaway setLEDs loop with and without the frame governor: frames shown, CPU used and frame pacing.
+
+Runs a tight loop (no sleep) for a few seconds against the simulated strip at 500 LEDs.
+Usage: python bench/governor.py [seconds per case]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ.setdefault('TREE_LEDS', '500')
+os.environ['LED_BACKEND'] = 'sim'
+os.environ['FRAME_MIRROR'] = ''
+
+from runner import exposed, governor, leds
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    frames = [[(n % 256, 0, 255 - n % 256, 100)] * leds.SIZE for n in range(256)]
+    print(f"{'fps target':>10} {'wire':>5} {'setLEDs/s':>10} {'shown/s':>8} {'cpu %':>6} {'interval ms':>12} {'jitter ms':>10}")
+    # Without the wire wait, "off" is what a faster strip or the null backend would see
+    for fps, realtime in ((0, False), (0, True), (30, True), (60, True)):
+        leds.backend.realtime = realtime
+        exposed.output = governor.FrameGovernor(exposed._show, fps)
+        leds.backend.reset_stats()
+        leds.backend.recording.clear()
+        calls = 0
+        cpu = time.process_time()
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            exposed.setLEDs(frames[calls % 256])
+            calls += 1
+        exposed.output.flush()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+
+        stamps = [t for t, _ in leds.backend.frames()]
+        gaps = [(b - a) * 1000 for a, b in zip(stamps, stamps[1:])]
+        print(f"{fps or 'off':>10} {'yes' if realtime else 'no':>5} {calls / elapsed:>10.0f} {leds.backend.shown / elapsed:>8.0f} "
+              f"{cpu / elapsed * 100:>6.0f} {statistics.mean(gaps):>12.2f} {statistics.pstdev(gaps):>10.2f}")
+
+if __name__ == "__main__":
+    main()
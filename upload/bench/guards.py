@@ -0,0 +1,112 @@
+"""Sandbox guard overhead on typical animation loops: the old guards, the new guards, and the new guards plus guard elision.
+
+Each case computes frames for a 500 LED strip the way user programs do (nothing is sent to a strip),
+compiled with RestrictedPython and run with the guards the sandbox installs.
+Usage: python bench/guards.py [frames per case]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from RestrictedPython import compile_restricted_exec
+from RestrictedPython.Eval import default_guarded_getiter
+from RestrictedPython.Guards import safe_builtins, safer_getattr, guarded_iter_unpack_sequence, guarded_unpack_sequence
+from RestrictedPython.transformer import RestrictingNodeTransformer
+
+from runner import guards
+
+LEDS = 500
+CASES = {
+    "rainbow": """
+frame = [(0, 0, 0, 100)] * LEDS
+offset = 0
+for n in range(FRAMES):
+    for i in range(LEDS):
+        hue = (i * 3 + offset) % 768
+        if hue < 256:
+            frame[i] = (255 - hue, hue, 0, 100)
+        elif hue < 512:
+            hue -= 256
+            frame[i] = (0, 255 - hue, hue, 100)
+        else:
+            hue -= 512
+            frame[i] = (hue, 0, 255 - hue, 100)
+    offset += 7
+""",
+    "comet": """
+frame = [(0, 0, 0, 100)] * LEDS
+head = 0.0
+speed = 3.5
+for n in range(FRAMES):
+    head += speed
+    if head >= LEDS:
+        head -= LEDS
+    for i in range(LEDS):
+        distance = (head - i) % LEDS
+        level = 255 - distance * 16
+        if level < 0:
+            level = 0
+        level //= 1
+        frame[i] = (int(level), int(level), 255, 100)
+""",
+    "fade": """
+frame = [(255, 128, 64, 100)] * LEDS
+def fade(pixels, keep):
+    out = []
+    for i, (r, g, b, bright) in enumerate(pixels):
+        r *= keep
+        g *= keep
+        b *= keep
+        out.append((r, g, b, bright))
+    return out
+for n in range(FRAMES):
+    frame = fade(frame, 0.9)
+""",
+    "bits": """
+mask = 1
+frame = [(0, 0, 0, 100)] * LEDS
+for n in range(FRAMES):
+    mask <<= 1
+    if mask >= 1 << 24:
+        mask = 1
+    for i in range(LEDS):
+        bits = mask >> (i % 24)
+        bits &= 255
+        frame[i] = (bits, bits ^ 255, bits | 15, 100)
+""",
+}
+
+def old_inplacevar(op, var, expr):
+    ops = {"+=": lambda: var + expr, "-=": lambda: var - expr, "*=": lambda: var * expr,
+           "/=": lambda: var / expr, "%=": lambda: var % expr, "**=": lambda: var ** expr,
+           "<<": lambda: var << expr, ">>=": lambda: var >> expr, "|=": lambda: var | expr,
+           "^=": lambda: var ^ expr, "&=": lambda: var & expr, "//=": lambda: var // expr}
+    return ops.get(op, lambda: var)()
+
+OLD = {"_getitem_": lambda obj, index: obj[index], "_inplacevar_": old_inplacevar, "_write_": lambda obj: obj,
+       "_getiter_": default_guarded_getiter, "_iter_unpack_sequence_": guarded_iter_unpack_sequence,
+       "_unpack_sequence_": guarded_unpack_sequence}
+BUILTINS = {**safe_builtins, "enumerate": enumerate}
+
+def run(code, guard_globals, policy, frames):
+    result = compile_restricted_exec(code, "<bench>", policy=policy)
+    assert not result.errors, result.errors
+    env = {**guard_globals, "__builtins__": BUILTINS, "_getattr_": safer_getattr, "LEDS": LEDS, "FRAMES": frames}
+    start = time.perf_counter()
+    exec(result.code, env)
+    return (time.perf_counter() - start) / frames * 1000
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    variants = (("old guards", OLD, RestrictingNodeTransformer),
+                ("new guards", guards.restricted_globals(), RestrictingNodeTransformer),
+                ("+ elision", guards.restricted_globals(), guards.ElidingTransformer))
+    print(f"{'case':>8} " + " ".join(f"{name + ' ms':>15}" for name, _, _ in variants) + f" {'speedup':>8}")
+    for case, code in CASES.items():
+        times = [min(run(code, guard_globals, policy, frames) for _ in range(3)) for _, guard_globals, policy in variants]
+        print(f"{case:>8} " + " ".join(f"{t:>15.3f}" for t in times) + f" {times[0] / times[-1]:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Load test: the SQLite job store vs the old metadata.json read-modify-write.
+
+Seeds HISTORY finished jobs, then runs concurrent submitters and a reader that repeatedly does
+what /api/queue and the worker did on every request/tick. Reports submit throughput, lost
+submissions ("all" if the writers leave metadata.json torn), reads that hit a half-written
+metadata.json, and latency of the reads that succeeded.
+Usage: python bench/jobstore.py [history] [threads] [submits per thread]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from scheduler.jobstore import JobStore, PENDING, RUNNING, COMPLETED, FAILED
+
+class JsonMetadata:
+    """The old scheme: every submit loads and rewrites the whole file"""
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        return {}
+
+    def add(self, job_hash, username, filename):
+        metadata = self.load()
+        metadata[job_hash] = {"filename": filename, "username": username, "timestamp": time.time()}
+        with open(self.path, 'w') as f:
+            json.dump(metadata, f)
+
+    def seed(self, history):
+        with open(self.path, 'w') as f:
+            json.dump({f"old{n:05d}": {"filename": "editor.py", "username": f"user{n % 97}", "timestamp": n}
+                       for n in range(history)}, f)
+
+    def count(self):
+        """None when the writers left the file torn: whatever it held is unreadable, so lost"""
+        try:
+            return len(self.load())
+        except ValueError:
+            return None
+
+    def read_queue(self):
+        self.load()
+
+class SqliteStore:
+    def __init__(self, path):
+        self.store = JobStore(path)
+
+    def add(self, job_hash, username, filename):
+        self.store.add(job_hash, username, filename)
+
+    def seed(self, history):
+        db = self.store._db()
+        db.execute("BEGIN")
+        db.executemany("INSERT INTO jobs (hash, username, filename, status, submitted) VALUES (?, ?, ?, ?, ?)",
+                       [(f"old{n:05d}", f"user{n % 97}", "editor.py", COMPLETED, n) for n in range(history)])
+        db.execute("COMMIT")
+
+    def count(self):
+        return sum(self.store.counts().values())
+
+    def read_queue(self):
+        self.store.by_status(PENDING, RUNNING)
+        self.store.recent(20, COMPLETED, FAILED)
+
+def run(backend, history, threads, submits):
+    backend.seed(history)
+    reads = []
+    torn = []
+    done = threading.Event()
+
+    def submitter(t):
+        for n in range(submits):
+            try:
+                backend.add(f"new{t:02d}{n:05d}", f"user{t}", "editor.py")
+            except (ValueError, OSError):
+                pass  # a torn metadata.json read; the submit is lost
+
+    def reader():
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                backend.read_queue()
+            except ValueError:
+                torn.append(1)
+                continue
+            reads.append(time.perf_counter() - start)
+
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    start = time.perf_counter()
+    workers = [threading.Thread(target=submitter, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    reader_thread.join()
+
+    stored = backend.count()
+    lost = "all" if stored is None else history + threads * submits - stored
+    reads.sort()
+    return threads * submits / elapsed, lost, len(torn), reads[len(reads) // 2] * 1000, reads[int(len(reads) * 0.99)] * 1000
+
+def main():
+    history = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    submits = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    scratch = tempfile.mkdtemp()
+    print(f"{history} historical jobs, {threads} threads x {submits} submits")
+    print(f"{'backend':>14} {'submits/s':>10} {'lost':>6} {'torn reads':>11} {'read p50 ms':>12} {'read p99 ms':>12}")
+    for name, backend in (("metadata.json", JsonMetadata(os.path.join(scratch, "metadata.json"))),
+                          ("sqlite", SqliteStore(os.path.join(scratch, "jobs.db")))):
+        rate, lost, torn, p50, p99 = run(backend, history, threads, submits)
+        print(f"{name:>14} {rate:>10.0f} {lost:>6} {torn:>11} {p50:>12.2f} {p99:>12.2f}")
+
+if __name__ == "__main__":
+    main()
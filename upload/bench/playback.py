@@ -0,0 +1,60 @@
+"""CPU cost of the idle animation computed live every frame vs replayed from its recording.
+
+Runs each for a few seconds at the idle animation's 20 fps against the null backend, and reports
+CPU per second, plus the recording's size against raw frames.
+Usage: python bench/playback.py [seconds] [leds]
+"""
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ['TREE_LEDS'] = sys.argv[2] if len(sys.argv) > 2 else '500'
+os.environ['LED_BACKEND'] = 'null'
+os.environ['FRAME_RATE'] = '0'
+os.environ['FRAME_MIRROR'] = ''
+os.environ['RECORDING_DIR'] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'scheduler')))
+
+from runner import exposed, leds, recording
+import idle_animation
+
+def live(seconds):
+    # The idle loop as it was before recordings: a list of tuples and math.sin per LED
+    led_count = exposed.getLEDCount()
+    frame = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fade = min(1.0, frame / 100)
+        states = []
+        for i in range(led_count):
+            wave = math.sin((i / led_count * 4 * math.pi) + (frame / 20))
+            states.append((int(80 * fade), int(50 * fade), int(200 * fade), int((wave * 0.5 + 0.5) * 100 * fade)))
+        exposed.setLEDs(states)
+        frame += 1
+        time.sleep(0.05)
+
+def replay(seconds):
+    animation = idle_animation.idle_recording(exposed.getLEDCount())
+    start = time.perf_counter()
+    recording.play(animation, exposed.setLEDs, loops=None, stop=lambda: time.perf_counter() - start >= seconds)
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    size = leds.SIZE
+    idle_animation.idle_recording(size)
+    path = recording.path_for(f"idle-v1-{size}")
+    frames = idle_animation.FADE_FRAMES + idle_animation.LOOP_FRAMES
+    print(f"{size} LEDs; recording {os.path.getsize(path)} B for {frames} frames ({frames * size * 4} B raw)")
+    print(f"{'mode':>8} {'frames':>7} {'cpu ms/s':>9}")
+    for name, run in (("live", live), ("replay", replay)):
+        shown = leds.backend.frames
+        cpu = time.process_time()
+        run(seconds)
+        cpu = time.process_time() - cpu
+        print(f"{name:>8} {leds.backend.frames - shown:>7} {cpu / seconds * 1000:>9.2f}")
+
+if __name__ == "__main__":
+    main()
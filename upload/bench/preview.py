@@ -0,0 +1,52 @@
+"""How long a preview takes next to how long the program would hold the tree.
+
+Sends a few typical 45 s programs (a sleep-paced animation, a waitFrame() loop, an unpaced setLEDs loop,
+one that mostly sleeps) through the webapp's preview pool, twice each: once cold and once from the cache.
+Usage: python bench/preview.py [leds]
+"""
+import os
+import sys
+import tempfile
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, SRC)
+os.environ['TREE_LEDS'] = sys.argv[1] if len(sys.argv) > 1 else '500'
+os.environ['JOB_DB'] = os.path.join(tempfile.mkdtemp(), 'jobs.db')
+os.environ['BYTECODE_CACHE_DIR'] = tempfile.mkdtemp()
+
+from webapp import preview
+
+PROGRAMS = {
+    "sleep paced": ("for n in range(45 * 30):\n"
+                    "    setLEDs([(n % 256, 0, 255 - n % 256, 100)] * getLEDCount())\n"
+                    "    sleep(1 / 30)\n"),
+    "waitFrame": ("while True:\n"
+                  "    f = frame()\n"
+                  "    setLEDs([((i + f) % 256, 0, 0, 100) for i in range(getLEDCount())])\n"
+                  "    waitFrame()\n"),
+    "unpaced": ("n = 0\n"
+                "while True:\n"
+                "    setLEDs([(n % 256, 0, 0, 100)] * getLEDCount())\n"
+                "    n += 1\n"),
+    "mostly sleeps": ("for c in [RED, GREEN, BLUE] * 5:\n"
+                      "    setLEDs([c] * getLEDCount())\n"
+                      "    sleep(3)\n"),
+}
+
+def main():
+    print(f"{os.environ['TREE_LEDS']} LEDs, {preview.PREVIEW_FRAMES} samples over {preview.PREVIEW_SECONDS:g} s")
+    print(f"{'program':>14} {'cold s':>7} {'cached s':>9} {'virtual s':>10} {'frames set':>11} {'truncated':>10}")
+    preview.run("pass\n")
+    for name, code in PROGRAMS.items():
+        start = time.perf_counter()
+        result = preview.run(code)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        preview.cached(code)
+        hit = time.perf_counter() - start
+        print(f"{name:>14} {cold:>7.2f} {hit:>9.5f} {result['duration']:>10.1f} {result['pushed']:>11} "
+              f"{str(result['truncated']):>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Loopback benchmark of the binary LED protocol: bytes per frame and end-to-end frames per second.
+
+Runs the LED server (against the null LED backend) and a client in one process over a Unix socket.
+Usage: python bench/protocol.py [frames per animation]
+"""
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ.setdefault('TREE_LEDS', '500')
+os.environ['LED_BACKEND'] = 'null'
+
+from runner import leds, ledserver, protocol
+
+def idle_wave(size, frame):
+    # Same maths as scheduler/idle_animation.py
+    fade = min(1.0, frame / 100)
+    r, g, b = int(80 * fade), int(50 * fade), int(200 * fade)
+    return [(r, g, b, int((math.sin((i / size * 4 * math.pi) + (frame / 20)) * 0.5 + 0.5) * 100 * fade))
+            for i in range(size)]
+
+def solid(size, frame):
+    return [((frame * 5) % 256, 0, 255 - (frame * 5) % 256, 100)] * size
+
+def chase(size, frame):
+    return [(255, 255, 255, 100) if i == frame % size else (0, 0, 0, 0) for i in range(size)]
+
+def noise(size, frame):
+    return [(random.randrange(256), random.randrange(256), random.randrange(256), 100) for _ in range(size)]
+
+def check_decoder(size):
+    """Malformed frames are rejected and leave the decoder's framebuffer as it was"""
+    encoder, decoder = protocol.FrameEncoder(size), protocol.FrameDecoder(size)
+    for frame in range(3):
+        message = encoder.encode(bytes(v for led in chase(size, frame) for v in led))
+        _, flags, number, count, _ = protocol.HEADER.unpack_from(message)
+        decoder.apply(flags, number, count, message[protocol.HEADER.size:])
+    shown = bytes(decoder.buf)
+    white = bytes((255, 255, 255, 100))
+    bad = {
+        "span past the last LED": (protocol.DELTA, protocol.SPAN.pack(size - 1, 2) + white * 2),
+        "body shorter than its span": (protocol.DELTA, protocol.SPAN.pack(0, 3) + white * 2),
+        "good span, then a cut-off one": (protocol.DELTA, protocol.SPAN.pack(0, 1) + white + b"\0"),
+        "runs covering too few LEDs": (protocol.RLE, protocol.RUN.pack(size - 1) + white),
+    }
+    for name, (flags, body) in bad.items():
+        try:
+            decoder.apply(flags, decoder.frame + 1, size, body)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"decoder accepted a frame with {name}")
+        assert bytes(decoder.buf) == shown, f"a frame with {name} changed the framebuffer"
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    check_decoder(leds.SIZE)
+    path = os.path.join(tempfile.mkdtemp(), "leds.sock")
+    threading.Thread(target=ledserver.serve, args=(path,), daemon=True).start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+
+    size = leds.SIZE
+    print(f"{size} LEDs, {frames} frames per animation")
+    print(f"{'animation':>10} {'text B':>8} {'full B':>8} {'wire B':>8} {'fps':>8}")
+    for animation in (idle_wave, solid, chase, noise):
+        states = [animation(size, f) for f in range(frames)]
+        payloads = [bytes(v for led in frame for v in led) for frame in states]
+        text = sum(len(str(frame)) for frame in states) / frames
+
+        encoder = protocol.FrameEncoder(size)
+        wire = sum(len(encoder.encode(p)) for p in payloads) / frames
+
+        client = protocol.LEDClient(path)
+        shows = leds.backend.frames
+        start = time.perf_counter()
+        for payload in payloads:
+            client.set_framebuf(payload)
+        while leds.backend.frames < shows + frames:
+            time.sleep(0.0005)
+        elapsed = time.perf_counter() - start
+        client._close()
+
+        print(f"{animation.__name__:>10} {text:>8.0f} {size * 4 + protocol.HEADER.size:>8} {wire:>8.0f} {frames / elapsed:>8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Requests per second on /api/queue and /api/stream with 1k and 10k jobs in the store.
+
+Compares a snapshot rebuild on every request (what an uncached endpoint pays), the cached
+snapshot, and a poller that sends If-None-Match and gets a 304. Uses Flask's test client,
+so the numbers are the app's own cost without a network or WSGI server in front.
+Usage: python bench/queue_api.py [seconds per case]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+scratch = tempfile.mkdtemp()
+os.environ['JOB_DB'] = os.path.join(scratch, "jobs.db")
+os.environ['LED_BACKEND'] = 'null'
+
+from scheduler.jobstore import COMPLETED, PENDING
+from webapp.app import app
+from webapp.routes import queue
+
+def seed(store, jobs):
+    db = store._db()
+    db.execute("BEGIN")
+    db.execute("DELETE FROM jobs")
+    db.executemany("INSERT INTO jobs (hash, username, filename, status, submitted) VALUES (?, ?, ?, ?, ?)",
+                   [(f"j{n:06d}", f"user{n % 97}", "editor.py", PENDING if n >= jobs - 50 else COMPLETED, n)
+                    for n in range(jobs)])
+    db.execute("COMMIT")
+
+def rps(client, path, seconds, headers=None, invalidate=False):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        if invalidate:
+            queue.snapshot.version = None
+        client.get(path, headers=headers or {})
+        count += 1
+    return count / (time.perf_counter() - start)
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    client = app.test_client()
+    print(f"{'jobs':>6} {'endpoint':>11} {'rebuild':>9} {'cached':>9} {'304':>9}")
+    for jobs in (1000, 10000):
+        seed(queue.snapshot.store, jobs)
+        for path in ('/api/queue', '/api/stream'):
+            etag = client.get(path).headers['ETag']
+            row = (rps(client, path, seconds, invalidate=True),
+                   rps(client, path, seconds),
+                   rps(client, path, seconds, headers={'If-None-Match': etag}))
+            print(f"{jobs:>6} {path:>11} " + " ".join(f"{r:>9.0f}" for r in row))
+
+if __name__ == "__main__":
+    main()
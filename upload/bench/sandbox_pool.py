@@ -0,0 +1,68 @@
+"""Spawn-to-first-frame latency: a fresh Process + Queue per job (the old run_job) vs the warm SandboxPool.
+
+Latency is measured from handing the code over to the first set_framebuf call inside the sandbox.
+Usage: python bench/sandbox_pool.py [jobs]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(SRC, 'scheduler'))
+sys.path.insert(0, SRC)
+os.environ['LED_BACKEND'] = 'null'
+os.environ['BYTECODE_CACHE_DIR'] = tempfile.mkdtemp()
+
+from runner import leds
+from runner.main import execute_code
+import pool
+
+CODE = "setLEDs([BLUE] * getLEDCount())\n"
+first_frame = multiprocessing.Value('d', 0.0)
+
+def mark_first_frame(payload):
+    if not first_frame.value:
+        first_frame.value = time.perf_counter()
+    return True
+
+leds.set_framebuf = mark_first_frame
+
+def legacy_wrapper(code, result_queue):
+    try:
+        result_queue.put(('success', execute_code(code)))
+    except Exception as e:
+        result_queue.put(('error', str(e)))
+
+def legacy_run(code, timeout):
+    result_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=legacy_wrapper, args=(code, result_queue))
+    process.start()
+    process.join(timeout=timeout)
+    return result_queue.get()
+
+def measure(run, jobs):
+    latencies = []
+    for _ in range(jobs):
+        # The worker writes the log header and picks the next job in between; give the pool that gap too
+        time.sleep(0.05)
+        first_frame.value = 0.0
+        start = time.perf_counter()
+        status, _ = run(CODE, 10)
+        assert status == 'success', status
+        latencies.append((first_frame.value - start) * 1000)
+    latencies.sort()
+    return sum(latencies) / jobs, latencies[-1]
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{'mode':>24} {'mean ms':>8} {'max ms':>8}")
+    print(f"{'process per job':>24} {'%8.2f %8.2f' % measure(legacy_run, jobs)}")
+    for max_jobs in (1, 20):
+        sandboxes = pool.SandboxPool(size=1, max_jobs=max_jobs)
+        sandboxes.warm()
+        print(f"{f'pool, max_jobs={max_jobs}':>24} {'%8.2f %8.2f' % measure(sandboxes.run, jobs)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Frames per second for one long strip against the same LEDs split into segments driven in parallel.
+
+Uses simulated WS2812 strips (LED_BACKEND=sim), which sleep through each modelled transfer, so a 1200 LED strip
+tops out around 27 fps; split over LED_SEGMENTS every controller only clocks out its own share.
+Usage: python bench/segments.py [frames]
+"""
+import importlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ['FRAME_MIRROR'] = ''
+
+LEDS = 1200
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print(f"{'segments':>8} {'fps':>8} {'ms/frame':>9}  slowest segment")
+    for count in (1, 2, 4, 8):
+        os.environ['LED_SEGMENTS'] = ",".join([f"sim:{LEDS // count}"] * count)
+        from runner import leds
+        importlib.reload(leds)
+        payloads = [bytes([n % 256, 40, 200, 50]) * LEDS for n in range(frames)]
+        start = time.perf_counter()
+        for payload in payloads:
+            leds.set_framebuf(payload)
+        elapsed = time.perf_counter() - start
+        slowest = max(leds.segment_status(), key=lambda s: s['push_ms'])
+        assert all(s['pushes'] == frames for s in leds.segment_status())
+        print(f"{count:>8} {frames / elapsed:>8.0f} {elapsed / frames * 1000:>9.2f}  {slowest['name']} {slowest['push_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Submit-to-start latency of the worker: time from a job file + notification landing to run_job starting.
+
+Runs the real worker loop (against the null LED backend) in a scratch directory.
+Usage: python bench/submit_latency.py [jobs]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(SRC, 'scheduler'))
+sys.path.insert(0, SRC)
+os.environ['LED_BACKEND'] = 'null'
+
+scratch = tempfile.mkdtemp()
+os.chdir(scratch)
+os.environ['WORKER_SOCKET'] = os.path.join(scratch, "worker.sock")
+os.environ['JOB_DB'] = os.path.join(scratch, "jobs.db")
+os.environ['JOB_ARCHIVE_DIR'] = os.path.join(scratch, "archive")
+os.environ['JOB_LOG_DIR'] = os.path.join(scratch, "logs")
+os.environ['BYTECODE_CACHE_DIR'] = os.path.join(scratch, "bytecode")
+import jobqueue
+import worker
+from jobstore import FINISHED
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    started = {}
+    run_job = worker.run_job
+
+    def timed_run_job(working_path, meta, job_hash):
+        started[job_hash] = time.perf_counter()
+        return run_job(working_path, meta, job_hash)
+
+    worker.run_job = timed_run_job
+    threading.Thread(target=worker.worker_loop, daemon=True).start()
+    while not os.path.exists(os.environ['WORKER_SOCKET']):
+        time.sleep(0.01)
+
+    latencies = []
+    for n in range(jobs):
+        job_hash = f"bench{n:03d}"
+        submitted = time.perf_counter()
+        with open(os.path.join(worker.JOB_DIR, f"{job_hash}.py"), 'w') as f:
+            f.write("print('hi')\n")
+        worker.store.add(job_hash, "bench", "editor.py")
+        jobqueue.notify_worker(job_hash)
+        while worker.store.get(job_hash)["status"] not in FINISHED:
+            time.sleep(0.001)
+        latencies.append((started[job_hash] - submitted) * 1000)
+
+    latencies.sort()
+    print(f"{jobs} jobs: submit-to-start mean {sum(latencies) / jobs:.2f} ms, "
+          f"p50 {latencies[jobs // 2]:.2f} ms, max {latencies[-1]:.2f} ms")
+    print("(the old 2 s poll plus 0.5 s sleep averaged ~1.5 s and peaked at 2.5 s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Submission flood: 500 submits/s at /editor from 200 clients, with the worker running alongside.
+
+Clients (one IP each, most with a username) resubmit their last program a third of the time. Reports what
+happened to the submissions (queued, deduplicated onto a pending job, rate limited, over the pending cap),
+the app's latency, and how many job files, pending jobs and database bytes there are as the flood goes on.
+The first seconds' bursts pile up to at most MAX_PENDING_PER_USER per username; once every client is down to
+its refill rate the worker keeps up, so the backlog drains instead of growing with the request rate.
+Uses Flask's test client from several threads, against a scratch job directory and database.
+Usage: python bench/submit_load.py [seconds] [submits per second]
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, SRC)
+# The compile pool's spawned processes run this module again; they have to find the same scratch directory
+scratch = os.environ.get('SUBMIT_LOAD_SCRATCH') or tempfile.mkdtemp()
+os.environ['SUBMIT_LOAD_SCRATCH'] = scratch
+os.chdir(scratch)
+os.environ['LED_BACKEND'] = 'null'
+os.environ['FRAME_MIRROR'] = ''
+os.environ['RECORD_JOBS'] = '0'
+os.environ['IDLE_ANIMATION_DELAY'] = '3600'
+os.environ['WORKER_SOCKET'] = os.path.join(scratch, "worker.sock")
+os.environ['JOB_DB'] = os.path.join(scratch, "jobs.db")
+os.environ['JOB_ARCHIVE_DIR'] = os.path.join(scratch, "archive")
+os.environ['JOB_LOG_DIR'] = os.path.join(scratch, "logs")
+os.environ['BYTECODE_CACHE_DIR'] = os.path.join(scratch, "bytecode")
+from scheduler.jobstore import PENDING, COMPLETED, FAILED
+from webapp.app import app
+from webapp.routes import editor
+
+editor.JOB_DIR = os.path.join(scratch, "jobs")
+CLIENTS = 200
+THREADS = 4
+
+def client_loop(n, rate, deadline, results):
+    client = app.test_client()
+    rng = random.Random(n)
+    clients = [(f"10.0.{c // 256}.{c % 256}", "anonymous" if c % 4 == 0 else f"user{c}") for c in range(n, CLIENTS, THREADS)]
+    last_code = {}
+    seen = set()
+    interval = THREADS / rate
+    next_at = time.perf_counter()
+    while next_at < deadline:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        next_at += interval
+        ip, user = rng.choice(clients)
+        code = last_code.get(ip) if ip in last_code and rng.random() < 1 / 3 else f"print({rng.random()})\n"
+        last_code[ip] = code
+        start = time.perf_counter()
+        response = client.post('/editor', data={'editor_code': code, 'username': user},
+                               environ_base={'REMOTE_ADDR': ip})
+        elapsed = time.perf_counter() - start
+        body = response.get_json()
+        if response.status_code == 200:
+            outcome = "deduplicated" if body["job_hash"] in seen else "queued"
+            seen.add(body["job_hash"])
+        elif "waiting" in body["error"]:
+            outcome = "over the pending cap"
+        else:
+            outcome = "rate limited"
+        results.append((outcome, elapsed))
+
+def disk_usage():
+    db = sum(os.path.getsize(os.environ['JOB_DB'] + suffix) for suffix in ("", "-wal")
+             if os.path.exists(os.environ['JOB_DB'] + suffix))
+    return len(os.listdir(editor.JOB_DIR)), db
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 500
+    # The worker in its own process, as in production, running in the scratch directory
+    worker = subprocess.Popen([sys.executable, os.path.join(SRC, 'scheduler', 'worker.py')], stdout=subprocess.DEVNULL)
+    while not os.path.exists(os.environ['WORKER_SOCKET']):
+        time.sleep(0.01)
+
+    try:
+        run(seconds, rate)
+    finally:
+        # SIGTERM lets the worker stop its sandboxes
+        worker.terminate()
+        try:
+            worker.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+            worker.wait()
+
+def run(seconds, rate):
+    results = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client_loop, args=(n, rate, deadline, results)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    print(f"{'second':>6} {'job files':>10} {'pending':>8} {'db KiB':>7} {'finished':>9}")
+    start = time.perf_counter()
+    peak = 0
+    while any(thread.is_alive() for thread in threads):
+        time.sleep(1)
+        files, db = disk_usage()
+        counts = editor.store.counts()
+        peak = max(peak, counts.get(PENDING, 0))
+        print(f"{time.perf_counter() - start:>6.0f} {files:>10} {counts.get(PENDING, 0):>8} {db // 1024:>7} "
+              f"{counts.get(COMPLETED, 0) + counts.get(FAILED, 0):>9}")
+
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for _, latency in results)
+    print(f"\n{len(results)} submissions in {elapsed:.1f} s ({len(results) / elapsed:.0f}/s), "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    for outcome in ("queued", "deduplicated", "rate limited", "over the pending cap"):
+        print(f"{outcome:>22}: {sum(1 for o, _ in results if o == outcome)}")
+    # Every anonymous client shares one username, so one cap
+    usernames = len({"anonymous" if c % 4 == 0 else c for c in range(CLIENTS)})
+    print(f"peak pending {peak}, bounded by the pending cap at {usernames * editor.MAX_PENDING}; "
+          f"{editor.store.counts().get(PENDING, 0)} left at the end")
+    assert peak <= usernames * editor.MAX_PENDING
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Tree time spent on jobs that are not using it, with and without the watchdog.
+
+Runs a queue of typical misbehaving jobs (a busy loop that never draws, one that draws once and then
+freezes, one stuck in a single long C call) plus a well-behaved animation through the SandboxPool,
+once with the watchdog's checks off and once with the defaults, and reports how long each job held the tree.
+Usage: python bench/watchdog.py [job timeout seconds]
+"""
+import os
+import sys
+import tempfile
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(SRC, 'scheduler'))
+sys.path.insert(0, SRC)
+os.environ['LED_BACKEND'] = 'null'
+os.environ['FRAME_MIRROR'] = ''
+os.environ['BYTECODE_CACHE_DIR'] = tempfile.mkdtemp()
+
+import pool
+
+JOBS = {
+    "busy loop": "while True:\n    pass\n",
+    "frozen": "setLEDs([BLUE] * getLEDCount())\nwhile True:\n    sleep(1)\n",
+    "C call": "total = sum(range(10 ** 11))\n",
+    "animation": ("for n in range(150):\n"
+                  "    setLEDs([(n, 0, 255 - n, 100)] * getLEDCount())\n"
+                  "    sleep(1 / 30)\n"),
+}
+
+def main():
+    timeout = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    defaults = (pool.NO_FRAMES_SECONDS, pool.STATIC_SECONDS, pool.STALL_SECONDS)
+    sandboxes = pool.SandboxPool()
+    sandboxes.warm()
+    print(f"{'job':>10} {'watchdog':>9} {'status':>10} {'held s':>7}")
+    totals = {}
+    for watchdog in (False, True):
+        pool.NO_FRAMES_SECONDS, pool.STATIC_SECONDS, pool.STALL_SECONDS = defaults if watchdog else (0, 0, 0)
+        totals[watchdog] = 0.0
+        for name, code in JOBS.items():
+            start = time.monotonic()
+            status, _ = sandboxes.run(code, timeout)
+            held = time.monotonic() - start
+            totals[watchdog] += held
+            print(f"{name:>10} {'on' if watchdog else 'off':>9} {status:>10} {held:>7.1f}")
+    print(f"queue total: {totals[False]:.1f}s without the watchdog, {totals[True]:.1f}s with it "
+          f"({totals[False] - totals[True]:.1f}s reclaimed)")
+
+if __name__ == "__main__":
+    main()
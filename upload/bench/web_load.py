@@ -0,0 +1,105 @@
+"""Requests per second and latency of the webapp under the Flask development server and under gunicorn.
+
+Starts each server on a scratch job store with a queue of 50 pending jobs, then has many keep-alive clients
+fetch the pages a livestream crowd hits (/, /queue, /api/stream and a stylesheet) as fast as they can,
+from several processes so the load generator is not the bottleneck.
+Usage: python bench/web_load.py [seconds] [clients]
+"""
+import http.client
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+PATHS = ('/', '/queue', '/api/stream', '/static/main.css')
+PROCESSES = 4
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def seed(env):
+    code = ("import sys; sys.path.insert(0, '.'); from scheduler.jobstore import JobStore; s = JobStore()\n"
+            "for n in range(50): s.add(f'j{n:04d}', f'user{n % 7}', 'editor.py')")
+    subprocess.run([sys.executable, '-c', code], cwd=SRC, env=env, check=True)
+
+def client(port, seconds, latencies):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        path = PATHS[n % len(PATHS)]
+        n += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            ok = False
+        latencies.append((path, time.perf_counter() - start, ok))
+
+def load(args):
+    port, seconds, clients = args
+    latencies = []
+    threads = [threading.Thread(target=client, args=(port, seconds, latencies)) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+def wait_for(port, proc):
+    for _ in range(300):
+        if proc.poll() is not None:
+            raise RuntimeError("server exited")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+def run(name, args, cwd, env, seconds, clients):
+    proc = subprocess.Popen(args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(int(env['PORT']), proc)
+        with multiprocessing.Pool(PROCESSES) as pool:
+            results = pool.map(load, [(int(env['PORT']), seconds, clients // PROCESSES)] * PROCESSES)
+    finally:
+        proc.terminate()
+        proc.wait()
+    latencies = [item for result in results for item in result]
+    for path in PATHS + ('all',):
+        times = sorted(t for p, t, _ in latencies if path in (p, 'all'))
+        errors = sum(1 for p, _, ok in latencies if path in (p, 'all') and not ok)
+        print(f"{name:>9} {path:>16} {len(times) / seconds:>8.0f} {times[len(times) // 2] * 1000:>8.1f} "
+              f"{times[int(len(times) * 0.99)] * 1000:>8.1f} {errors:>7}")
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    scratch = tempfile.mkdtemp()
+    env = dict(os.environ, JOB_DB=os.path.join(scratch, 'jobs.db'), LED_BACKEND='null',
+               BYTECODE_CACHE_DIR=os.path.join(scratch, 'bytecode'), PYTHONPATH=SRC)
+    seed(env)
+    print(f"{clients} keep-alive clients, {seconds:.0f} s per server")
+    print(f"{'server':>9} {'path':>16} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    port = free_port()
+    run('flask', [sys.executable, '-m', 'flask', 'run', '--port', str(port), '--no-reload'], os.path.join(SRC, 'webapp'),
+        dict(env, FLASK_APP='app.py', PORT=str(port)), seconds, clients)
+    port = free_port()
+    run('gunicorn', [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', 'webapp.app:app'],
+        SRC, dict(env, PORT=str(port)), seconds, clients)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Frames per second against the simulated WS2812 strip, and whether the wire or Python is the limit.
+
+Pushes the idle animation through setLEDs as fast as it will go (governor off) with LED_BACKEND=sim, which sleeps
+through each modelled transfer (30 us per LED plus the reset time) like the real DMA driver does.
+Usage: python bench/wire_time.py [frames]
+"""
+import importlib
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ['LED_BACKEND'] = 'sim'
+os.environ['FRAME_RATE'] = '0'
+os.environ['FRAME_MIRROR'] = ''
+
+def idle_wave(size, frame):
+    return [(80, 50, 200, int((math.sin((i / size * 4 * math.pi) + (frame / 20)) * 0.5 + 0.5) * 100))
+            for i in range(size)]
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f"{'leds':>6} {'fps':>8} {'wire max':>9} {'wire %':>7} {'waited s':>9} {'bound':>6}")
+    for size in (200, 500, 2000):
+        os.environ['TREE_LEDS'] = str(size)
+        from runner import leds, exposed
+        importlib.reload(leds)
+        importlib.reload(exposed)
+        states = [idle_wave(size, n) for n in range(frames)]
+        for state in states:
+            exposed.setLEDs(state)
+        stats = leds.backend.stats()
+        assert len(leds.backend.frames()) == min(frames, 1024)
+        print(f"{size:>6} {stats['fps']:>8.0f} {stats['max_fps']:>9.0f} {stats['wire_utilisation'] * 100:>6.0f}% "
+              f"{stats['waited_seconds']:>9.2f} {stats['bound']:>6}")
+
+if __name__ == "__main__":
+    main()
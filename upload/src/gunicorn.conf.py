@@ -0,0 +1,20 @@
+"""gunicorn settings for the webapp (start.py runs `gunicorn -c gunicorn.conf.py webapp.app:app`)
+
+Threaded workers: every Server-Sent Events viewer (job pages, the mirror, the overlays) holds a thread
+for as long as it is connected, so threads are cheap and plentiful; several processes spread the
+request handling over the Pi's cores. Streams may take at most WEB_MAX_STREAMS (3/4 of WEB_THREADS) of a
+worker's threads; past that they are refused with a 503 and the pages fall back to polling. State that has to agree between workers lives in the job store,
+the frame mirror and the submission rate limiter's database, never in one worker's memory.
+"""
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+worker_class = 'gthread'
+# The app picks its shared rate limiter from WEB_WORKERS, so it must see the same number
+workers = int(os.environ.setdefault('WEB_WORKERS', '2'))
+threads = int(os.environ.get('WEB_THREADS', 64))
+keepalive = 5
+# Not a request timeout: a gthread worker that misses heartbeats this long is restarted
+timeout = 30
+graceful_timeout = 10
+accesslog = None
@@ -1,3 +1,8 @@
-from .main import execute_code
+def __getattr__(name):
+    # Lazy so that runner.compiler/runner.protocol can be imported without pulling in the LED hardware
+    if name == "execute_code":
+        from .main import execute_code
+        return execute_code
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = ["execute_code"]
\ No newline at end of file
@@ -0,0 +1,21 @@
+"""LED output backends, picked with the LED_BACKEND environment variable
+
+    hardware  the NeoPixel strip on LED_GPIO_PIN (default, needs a Raspberry Pi)
+    null      drops every frame; for running the runner anywhere
+    sim       in-memory WS2812 model that records frames and accounts for wire time
+
+Each backend takes packed, brightness-scaled RGB bytes in write() and latches them in show().
+"""
+BACKENDS = ("hardware", "null", "sim")
+
+def load(name, size, pin=None):
+    if name == "hardware":
+        from .hardware import HardwareStrip
+        return HardwareStrip(size, pin)
+    if name == "null":
+        from .null import NullStrip
+        return NullStrip(size)
+    if name == "sim":
+        from .sim import SimulatedStrip
+        return SimulatedStrip(size)
+    raise ValueError(f"Unknown LED backend {name!r}, expected one of {', '.join(BACKENDS)}")
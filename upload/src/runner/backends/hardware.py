@@ -0,0 +1,39 @@
+"""NeoPixel strip on a Raspberry Pi GPIO pin"""
+import os
+import neopixel
+import board
+
+def _find_pin(pin):
+    pins = {10: board.D10, 12: board.D12, 18: board.D18, 21: board.D21}
+    if pin not in pins:
+        raise ValueError(f'Pin {pin} not supported')
+    return pins[pin]
+
+class HardwareStrip:
+    def __init__(self, size, pin=None):
+        self.size = size
+        pin = _find_pin(pin or int(os.environ.get('LED_GPIO_PIN', 18)))
+        self.pixels = neopixel.NeoPixel(pin, size, brightness=0.2, auto_write=False, pixel_order=neopixel.RGB)
+        self._dim = bytes(int(v * self.pixels.brightness) for v in range(256))
+
+    def write(self, rgb):
+        """Copy packed RGB bytes straight into the driver's pre/post-brightness buffers"""
+        pixels = self.pixels
+        post = getattr(pixels, '_post_brightness_buffer', None)
+        order = getattr(pixels, '_byteorder', None)
+        if post is None or order is None or getattr(pixels, '_bpp', 3) != 3:
+            for i in range(self.size):
+                pixels[i] = tuple(rgb[i * 3:i * 3 + 3])
+            return
+
+        start = pixels._offset
+        end = start + self.size * 3
+        pre = pixels._pre_brightness_buffer
+        dimmed = rgb.translate(self._dim)
+        for c in range(3):
+            if pre is not None:
+                pre[start + order[c]:end:3] = rgb[c::3]
+            post[start + order[c]:end:3] = dimmed[c::3]
+
+    def show(self):
+        self.pixels.show()
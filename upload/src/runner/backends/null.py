@@ -0,0 +1,12 @@
+"""Backend that drops every frame"""
+
+class NullStrip:
+    def __init__(self, size):
+        self.size = size
+        self.frames = 0
+
+    def write(self, rgb):
+        pass
+
+    def show(self):
+        self.frames += 1
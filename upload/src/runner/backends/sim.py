@@ -0,0 +1,116 @@
+"""Headless WS2812 strip: records every frame and models how long it would spend on the wire
+
+A WS2812 takes 24 bits at 800 kHz (30 us per LED) and latches after the line is held low for the
+reset time (50 us on the original part, 280 us on the WS2812B-V5). Like the rpi_ws281x DMA driver,
+show() starts the transfer and returns; the next show() waits for the previous transfer to finish.
+That wait is what makes a job wire-bound, and stats() reports it next to the time spent in Python.
+
+Frames are kept in memory (the last SIM_FRAMES of them), or in a memory-mapped ring at SIM_RECORD:
+
+    header  4s magic, I slots, I led count, Q frames shown
+    slots   [d timestamp, led count * 3 RGB bytes] * slots
+"""
+import mmap
+import os
+import struct
+import time
+from collections import deque
+
+BIT_SECONDS = 1.25e-6
+RESET_SECONDS = float(os.environ.get('SIM_RESET_US', 280)) / 1e6
+RECORD_PATH = os.environ.get('SIM_RECORD', '')
+MAX_FRAMES = int(os.environ.get('SIM_FRAMES', 1024))
+# Sleep through the modelled transfer like the real driver would; 0 only accounts for it
+REALTIME = os.environ.get('SIM_REALTIME', '1') != '0'
+
+MAGIC = b"TRS1"
+HEADER = struct.Struct("<4sIIQ")
+STAMP = struct.Struct("<d")
+
+def wire_seconds(count):
+    return count * 24 * BIT_SECONDS + RESET_SECONDS
+
+class FrameFile:
+    """Fixed-size mmap ring of recorded frames, readable while the simulator runs"""
+    def __init__(self, path, count, slots=MAX_FRAMES):
+        self.count = count
+        self.slots = slots
+        self.slot_size = STAMP.size + count * 3
+        size = HEADER.size + slots * self.slot_size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self.mm, 0, MAGIC, slots, count, 0)
+        self.shown = 0
+
+    def append(self, timestamp, rgb):
+        offset = HEADER.size + (self.shown % self.slots) * self.slot_size
+        STAMP.pack_into(self.mm, offset, timestamp)
+        self.mm[offset + STAMP.size:offset + self.slot_size] = rgb
+        self.shown += 1
+        HEADER.pack_into(self.mm, 0, MAGIC, self.slots, self.count, self.shown)
+
+    def frames(self):
+        """(timestamp, rgb bytes) of the recorded frames, oldest first"""
+        first = max(0, self.shown - self.slots)
+        for n in range(first, self.shown):
+            offset = HEADER.size + (n % self.slots) * self.slot_size
+            yield STAMP.unpack_from(self.mm, offset)[0], self.mm[offset + STAMP.size:offset + self.slot_size]
+
+class SimulatedStrip:
+    def __init__(self, size, record_path=RECORD_PATH, max_frames=MAX_FRAMES, realtime=REALTIME):
+        self.size = size
+        self.realtime = realtime
+        self.wire_time = wire_seconds(size)
+        self.buffer = bytes(size * 3)
+        self.recording = FrameFile(record_path, size, max_frames) if record_path else deque(maxlen=max_frames)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.shown = 0
+        self.waited = 0.0
+        self.started = None
+        self.busy_until = 0.0
+
+    def write(self, rgb):
+        self.buffer = bytes(rgb)
+
+    def show(self):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        # The previous frame may still be clocking out; the driver blocks until it is done
+        wait = self.busy_until - now
+        if wait > 0:
+            self.waited += wait
+            if self.realtime:
+                time.sleep(wait)
+            now = self.busy_until
+        self.busy_until = now + self.wire_time
+        self.shown += 1
+        if isinstance(self.recording, deque):
+            self.recording.append((time.time(), self.buffer))
+        else:
+            self.recording.append(time.time(), self.buffer)
+
+    def frames(self):
+        return list(self.recording) if isinstance(self.recording, deque) else list(self.recording.frames())
+
+    def stats(self):
+        """Frame rate and where the time went since the first show()"""
+        if not self.shown:
+            return {"frames": 0}
+        elapsed = max(self.busy_until - self.started, 1e-9)
+        wire = self.shown * self.wire_time
+        return {
+            "frames": self.shown,
+            "fps": self.shown / elapsed,
+            "max_fps": 1 / self.wire_time,
+            "wire_seconds": self.wire_time,
+            "wire_utilisation": min(wire / elapsed, 1.0),
+            "waited_seconds": self.waited,
+            "bound": "wire" if self.waited > 0.05 * elapsed else "cpu",
+        }
@@ -0,0 +1,96 @@
+"""RestrictedPython compilation of user code, cached by content hash in memory and on disk"""
+import hashlib
+import importlib.util
+import marshal
+import os
+from collections import OrderedDict
+
+from RestrictedPython import compile_restricted_exec
+
+from .guards import ElidingTransformer
+
+CACHE_DIR = os.environ.get('BYTECODE_CACHE_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scheduler', 'bytecode')))
+CACHE_SIZE = int(os.environ.get('BYTECODE_CACHE_SIZE', 256))
+FILENAME = "<user_code>"
+# Bumped whenever the compile pass changes, so bytecode cached by an older pass is recompiled
+POLICY_VERSION = b"guards1"
+HEADER = importlib.util.MAGIC_NUMBER + POLICY_VERSION
+
+_memory = OrderedDict()
+
+def code_hash(code):
+    return hashlib.sha256(code.encode()).hexdigest()
+
+def _cache_path(digest):
+    return os.path.join(CACHE_DIR, f"{digest}.bin")
+
+def _remember(digest, byte_code):
+    _memory[digest] = byte_code
+    _memory.move_to_end(digest)
+    while len(_memory) > CACHE_SIZE:
+        _memory.popitem(last=False)
+
+def _load(digest):
+    if digest in _memory:
+        _memory.move_to_end(digest)
+        return _memory[digest]
+    try:
+        with open(_cache_path(digest), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    # Bytecode from another interpreter version or compile pass is just a miss
+    if data[:len(HEADER)] != HEADER:
+        return None
+    try:
+        byte_code = marshal.loads(data[len(HEADER):])
+    except (EOFError, ValueError, TypeError):
+        return None
+    os.utime(_cache_path(digest))
+    _remember(digest, byte_code)
+    return byte_code
+
+def _mtime(entry):
+    try:
+        return entry.stat().st_mtime
+    except OSError:
+        return 0  # evicted by another process meanwhile
+
+def _store(digest, byte_code):
+    _remember(digest, byte_code)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = _cache_path(digest) + f".{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER + marshal.dumps(byte_code))
+    os.replace(tmp_path, _cache_path(digest))
+
+    cached = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".bin")]
+    if len(cached) > CACHE_SIZE:
+        cached.sort(key=_mtime)
+        for entry in cached[:len(cached) - CACHE_SIZE]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+def cached(code):
+    """True if code has compiled before (so it passes the policy) and is still cached"""
+    digest = code_hash(code)
+    return digest in _memory or os.path.exists(_cache_path(digest))
+
+def compile_user_code(code):
+    """Returns (byte_code, errors); byte_code is None when the restricted policy rejects the code"""
+    digest = code_hash(code)
+    byte_code = _load(digest)
+    if byte_code is not None:
+        return byte_code, ()
+
+    result = compile_restricted_exec(code, FILENAME, policy=ElidingTransformer)
+    if result.errors:
+        return None, result.errors
+    _store(digest, result.code)
+    return result.code, ()
+
+def precompile(code):
+    """Compile and cache code ahead of its turn on the tree, returning only the errors (picklable)"""
+    return list(compile_user_code(code)[1])
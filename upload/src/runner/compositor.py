@@ -0,0 +1,282 @@
+"""LED compositor: one long-lived process owns the strip and composites the layers other processes draw into
+
+With LED_COMPOSITOR set to a directory, `python -m runner.compositor` creates a shared-memory layer file
+there for every entry in LAYERS and is the only process that touches the LEDs. Producers (the idle
+animation in the worker, the job in its sandbox, the worker's notices) write frames into their layer
+and never wait on the compositor: a frame is one copy into the slot the compositor is not reading.
+
+Every 1 / COMPOSITOR_FPS seconds the compositor takes the active opaque layer with the highest priority,
+draws the active overlays above it (overlay pixels at brightness 0 are transparent), crossfades from
+what was on the LEDs over CROSSFADE_SECONDS whenever the set of active layers changes, and pushes the
+result if it differs from the last frame. With no layer active the last frame stays up. A layer turns
+active with its first frame and stays active until its producer releases it. Layer file layout:
+
+    header  4s magic, I led count, i priority, I flags, I active, Q newest sequence number
+    slots   [Q sequence, led count * 4 RGBL bytes] * 2
+
+As in runner.mirror, a slot's sequence is zeroed while it is written, which is how a torn copy is detected.
+"""
+import mmap
+import os
+import struct
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import mirror
+
+DIRECTORY = os.environ.get('LED_COMPOSITOR', '')
+FPS = float(os.environ.get('COMPOSITOR_FPS', 60))
+CROSSFADE_SECONDS = float(os.environ.get('CROSSFADE_SECONDS', 0.5))
+# How long a producer waits for the compositor to create its layer
+OPEN_TIMEOUT = 30
+
+IDLE, JOB, NOTICE = "idle", "job", "notice"
+OVERLAY = 1
+# name: (priority, flags)
+LAYERS = {IDLE: (0, 0), JOB: (10, 0), NOTICE: (20, OVERLAY)}
+
+MAGIC = b"TRL1"
+HEADER = struct.Struct("<4sIiIIQ")
+LAYOUT = struct.Struct("<iI")
+LAYOUT_OFFSET = 8
+ACTIVE = struct.Struct("<I")
+ACTIVE_OFFSET = 16
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 20
+SLOTS = 2
+
+class Layer:
+    """One producer's frames in shared memory. Also speaks the leds module's interface (SIZE,
+    set_framebuf), so runner.exposed can draw into a layer instead of onto the strip"""
+    def __init__(self, name, mm):
+        magic, self.count, self.priority, flags, _, _ = HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise ValueError(f"{name} is not a compositor layer")
+        self.name = name
+        self.mm = mm
+        self.overlay = bool(flags & OVERLAY)
+        self.slot_size = SEQ.size + self.count * 4
+        if len(mm) != HEADER.size + SLOTS * self.slot_size:
+            raise ValueError(f"Layer {name} has a different layout")
+
+    @staticmethod
+    def path(name, directory=DIRECTORY):
+        return os.path.join(directory, f"{name}.layer")
+
+    @classmethod
+    def create(cls, name, count, priority=0, flags=0, directory=DIRECTORY):
+        """Compositor side: make (or take over) the layer file, inactive"""
+        path = cls.path(name, directory)
+        size = HEADER.size + SLOTS * (SEQ.size + count * 4)
+        os.makedirs(directory, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            mm = mmap.mmap(fd, 0) if os.fstat(fd).st_size == size else None
+        finally:
+            os.close(fd)
+        if mm is None or HEADER.unpack_from(mm)[:2] != (MAGIC, count):
+            # Never resize a file producers may have mapped; write a whole new one and swap it in
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.ftruncate(fd, size)
+                mm = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            HEADER.pack_into(mm, 0, MAGIC, count, priority, flags, 0, 0)
+            os.replace(tmp_path, path)
+        # A producer left over from before a restart keeps its mapping and its sequence
+        LAYOUT.pack_into(mm, LAYOUT_OFFSET, priority, flags)
+        ACTIVE.pack_into(mm, ACTIVE_OFFSET, 0)
+        return cls(name, mm)
+
+    @classmethod
+    def open(cls, name, directory=DIRECTORY, timeout=OPEN_TIMEOUT):
+        """Producer side: map the layer the compositor created, waiting for it to start if need be"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(cls.path(name, directory), os.O_RDWR)
+                break
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        try:
+            mm = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        return cls(name, mm)
+
+    @property
+    def SIZE(self):
+        return self.count
+
+    def _slot(self, seq):
+        return HEADER.size + (seq % SLOTS) * self.slot_size
+
+    def seq(self):
+        return SEQ.unpack_from(self.mm, SEQ_OFFSET)[0]
+
+    @property
+    def active(self):
+        return ACTIVE.unpack_from(self.mm, ACTIVE_OFFSET)[0] == 1
+
+    def publish(self, payload):
+        seq = self.seq() + 1
+        offset = self._slot(seq)
+        SEQ.pack_into(self.mm, offset, 0)
+        self.mm[offset + SEQ.size:offset + self.slot_size] = payload
+        SEQ.pack_into(self.mm, offset, seq)
+        SEQ.pack_into(self.mm, SEQ_OFFSET, seq)
+        ACTIVE.pack_into(self.mm, ACTIVE_OFFSET, 1)
+
+    def set_framebuf(self, payload):
+        if memoryview(payload).nbytes != self.count * 4:
+            return False
+        self.publish(payload)
+        return True
+
+    def release(self):
+        """The producer is done; the compositor fades to whatever else is active"""
+        ACTIVE.pack_into(self.mm, ACTIVE_OFFSET, 0)
+
+    def read_into(self, buffer):
+        """Copy the newest complete frame into buffer; False if there is none, or the producer kept lapping us
+        (buffer may then hold a torn frame, so read into scratch space)"""
+        for _ in range(3):
+            seq = self.seq()
+            if not seq:
+                return False
+            offset = self._slot(seq)
+            if SEQ.unpack_from(self.mm, offset)[0] != seq:
+                continue
+            buffer[:] = memoryview(self.mm)[offset + SEQ.size:offset + self.slot_size]
+            if SEQ.unpack_from(self.mm, offset)[0] == seq:
+                return True
+        return False
+
+_layers = {}
+
+def layer(name):
+    """This process's handle on a layer, opened on first use (the mapping survives fork)"""
+    if name not in _layers:
+        _layers[name] = Layer.open(name)
+    return _layers[name]
+
+class Compositor:
+    def __init__(self, layers, output, fps=FPS, crossfade=CROSSFADE_SECONDS):
+        self.layers = sorted(layers, key=lambda l: l.priority)
+        self.output = output
+        self.interval = 1.0 / fps
+        self.crossfade = crossfade
+        size = self.layers[0].count * 4
+        # Every buffer is allocated here, once; a tick only copies between them
+        self.frames = {l.name: bytearray(size) for l in self.layers}
+        self.scratch = bytearray(size)
+        self.composite = bytearray(size)
+        self.faded = bytearray(size)
+        self.fade_from = bytearray(size)
+        self.shown = bytearray(size)
+        self.key = ()
+        self.fade_start = None
+        self.pushed = 0
+        if numpy is not None:
+            self._np = {name: numpy.frombuffer(buf, dtype=numpy.uint8).reshape(-1, 4) for name, buf in
+                        (("composite", self.composite), ("faded", self.faded), ("fade_from", self.fade_from))}
+            self._np.update((l.name, numpy.frombuffer(self.frames[l.name], dtype=numpy.uint8).reshape(-1, 4))
+                            for l in self.layers)
+            self._weights = numpy.empty((size // 4, 4), dtype=numpy.float32)
+            self._mix = numpy.empty((size // 4, 4), dtype=numpy.float32)
+
+    def _read(self, layer):
+        if layer.read_into(self.scratch):
+            self.frames[layer.name][:] = self.scratch
+
+    def _overlay(self, name):
+        frame = self.frames[name]
+        if numpy is not None:
+            pixels = self._np[name]
+            visible = pixels[:, 3] != 0
+            self._np["composite"][visible] = pixels[visible]
+            return
+        for i in range(3, len(frame), 4):
+            if frame[i]:
+                self.composite[i - 3:i + 1] = frame[i - 3:i + 1]
+
+    def _blend(self, t):
+        if numpy is not None:
+            numpy.multiply(self._np["fade_from"], 1.0 - t, out=self._weights)
+            numpy.multiply(self._np["composite"], t, out=self._mix)
+            numpy.add(self._weights, self._mix, out=self._mix)
+            numpy.copyto(self._np["faded"], self._mix, casting='unsafe')
+            return
+        self.faded[:] = bytes(int(a + (b - a) * t) for a, b in zip(self.fade_from, self.composite))
+
+    def compose(self, now):
+        """The frame for time now: the layers composited, part way through a crossfade if one is running"""
+        active = [l for l in self.layers if l.active]
+        for l in active:
+            self._read(l)
+        base = next((l for l in reversed(active) if not l.overlay), None)
+        self.composite[:] = self.frames[base.name] if base is not None else self.shown
+        for l in active:
+            if l.overlay and (base is None or l.priority > base.priority):
+                self._overlay(l.name)
+
+        key = tuple(l.name for l in active)
+        if key != self.key:
+            self.key = key
+            if self.crossfade > 0:
+                self.fade_from[:] = self.shown
+                self.fade_start = now
+        if self.fade_start is None:
+            return self.composite
+        t = (now - self.fade_start) / self.crossfade
+        if t >= 1:
+            self.fade_start = None
+            return self.composite
+        self._blend(t)
+        return self.faded
+
+    def tick(self, now):
+        frame = self.compose(now)
+        if frame != self.shown:
+            self.shown[:] = frame
+            self.output(self.shown)
+            self.pushed += 1
+
+    def run(self):
+        next_tick = time.perf_counter()
+        while True:
+            self.tick(time.monotonic())
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()
+
+def main():
+    if not DIRECTORY:
+        raise SystemExit("Set LED_COMPOSITOR to the directory for the layer files")
+    if os.environ.get('LED_SOCKET'):
+        from .protocol import LEDClient
+        strip = LEDClient(os.environ['LED_SOCKET'])
+    else:
+        from . import leds as strip
+    layers = [Layer.create(name, strip.SIZE, priority, flags) for name, (priority, flags) in LAYERS.items()]
+
+    def output(frame):
+        strip.set_framebuf(frame)
+        mirror.publish(frame, strip.SIZE)
+
+    print(f"LED compositor on {DIRECTORY} ({strip.SIZE} LEDs, {FPS:g} fps)")
+    Compositor(layers, output).run()
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,90 @@
 import inspect
+import os
 import time
-from . import leds
+import itertools
+
+from . import compositor
+if compositor.DIRECTORY:
+    # The compositor owns the strip and the mirror; this process draws into a layer (the sandbox
+    # switches to the job's)
+    leds = compositor.layer(compositor.IDLE)
+elif os.environ.get('LED_SOCKET'):
+    from . import protocol
+    leds = protocol.LEDClient(os.environ['LED_SOCKET'])
+else:
+    from . import leds
+from . import governor, heartbeat, mirror, recording
+from .frame import Frame
+from .profiler import profiler
 
 SIZE = leds.SIZE
+Frame.default_size = SIZE
 current_leds = [(0, 0, 0, 0)] * SIZE 
 
 def getLEDCount():
     return SIZE
     
+def _pack_leds(new_leds):
+    try:
+        payload = memoryview(new_leds).cast('B')
+    except TypeError:
+        if len(new_leds) != SIZE:
+            raise ValueError("LED list size does not match Tree size")
+        payload = bytes(itertools.chain.from_iterable(new_leds))
+
+    if len(payload) != SIZE * 4:
+        raise ValueError("LED states must be (R, G, B, L) tuples, one per LED")
+    return payload
+
+def _show(payload):
+    if not profiler.enabled:
+        leds.set_framebuf(payload)
+        if not compositor.DIRECTORY:
+            mirror.publish(payload, SIZE)
+        recording.capture(payload)
+        heartbeat.frame(payload)
+        return
+    start = time.perf_counter()
+    leds.set_framebuf(payload)
+    sent = time.perf_counter()
+    if not compositor.DIRECTORY:
+        mirror.publish(payload, SIZE)
+    if os.environ.get('LED_SOCKET'):
+        profiler.record('send', sent - start)
+    profiler.record('mirror', time.perf_counter() - sent)
+    recording.capture(payload)
+    heartbeat.frame(payload)
+    profiler.frame()
+
+output = governor.FrameGovernor(_show)
+
 def setLEDs(new_leds):
     global current_leds
-    if len(new_leds) != SIZE:
-        raise ValueError("LED list size does not match Tree size")
-    
+    if profiler.enabled:
+        start = time.perf_counter()
+        payload = _pack_leds(new_leds)
+        profiler.record('pack', time.perf_counter() - start)
+    else:
+        payload = _pack_leds(new_leds)
     current_leds = new_leds
-    payload = bytearray()
-    for led in current_leds:
-        payload.extend(led)
-    leds.set_framebuf(bytes(payload))
+    output.submit(bytes(payload))
     return True
 
+def waitFrame():
+    return output.wait_frame()
+
+def frame():
+    return output.frame
+
+def replay(job_hash, loops=1):
+    try:
+        animation = recording.Recording.open(recording.path_for(job_hash))
+    except OSError:
+        raise ValueError(f"There is no recording of job {job_hash}")
+    if animation.count != SIZE:
+        raise ValueError(f"Job {job_hash} was recorded on a tree with {animation.count} LEDs")
+    recording.play(animation, setLEDs, loops)
+
 def clearLEDs():
     setLEDs([(0, 0, 0, 0)] * SIZE)
 
@@ -0,0 +1,154 @@
+"""Frame: a whole tree's worth of R,G,B,L bytes with bulk drawing operations
+
+A Frame is a bytearray (4 bytes per LED), so setLEDs takes it as-is, with no list of tuples in
+between. Every operation works on the whole buffer at once (slices, translate, or numpy when it is
+installed) instead of a Python loop per LED, which inside the sandbox would pay a guard call on
+every index and iteration. Operations return the frame, so they chain.
+"""
+import colorsys
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def _color(color):
+    if len(color) != 4:
+        raise ValueError("Colors are (R, G, B, L) tuples")
+    return bytes(color)
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+class Frame(bytearray):
+    default_size = 0
+
+    def __init__(self, size=None, color=(0, 0, 0, 0)):
+        size = self.default_size if size is None else size
+        super().__init__(_color(color) * size)
+
+    def size(self):
+        return len(self) // 4
+
+    def _range(self, start, end):
+        size = self.size()
+        end = size if end is None else end
+        return _clamp(start, 0, size), _clamp(end, 0, size)
+
+    def getLED(self, index):
+        return tuple(self[index * 4:index * 4 + 4])
+
+    def setLED(self, index, color):
+        self[index * 4:index * 4 + 4] = _color(color)
+        return self
+
+    def fill(self, color):
+        self[:] = _color(color) * self.size()
+        return self
+
+    def fillRange(self, start, end, color):
+        """Set LEDs start (inclusive) to end (exclusive) to color"""
+        start, end = self._range(start, end)
+        if end > start:
+            self[start * 4:end * 4] = _color(color) * (end - start)
+        return self
+
+    def gradient(self, start_color, end_color, start=0, end=None):
+        """Linear blend from start_color at LED start to end_color at LED end - 1"""
+        start, end = self._range(start, end)
+        count = end - start
+        if count <= 0:
+            return self
+        a, b = _color(start_color), _color(end_color)
+        steps = max(count - 1, 1)
+        if numpy is not None:
+            t = numpy.arange(count)[:, None] / steps
+            mixed = numpy.frombuffer(a, numpy.uint8) * (1 - t) + numpy.frombuffer(b, numpy.uint8) * t
+            self[start * 4:end * 4] = numpy.rint(mixed).astype(numpy.uint8).tobytes()
+            return self
+        for c in range(4):
+            self[start * 4 + c:end * 4:4] = bytes(round(a[c] + (b[c] - a[c]) * i / steps) for i in range(count))
+        return self
+
+    def hsvWave(self, hue=0.0, spread=1.0, saturation=1.0, level=100):
+        """Rainbow: LED i gets hue + spread * i / size (hues in turns, 0-1), at full value"""
+        size = self.size()
+        level = _clamp(int(level), 0, 100)
+        if numpy is not None:
+            h = ((hue + spread * numpy.arange(size) / size) % 1.0) * 6
+            sector = h.astype(numpy.int64) % 6
+            f = h - numpy.floor(h)
+            v = numpy.ones(size)
+            p = v * (1 - saturation)
+            q = v * (1 - saturation * f)
+            t = v * (1 - saturation * (1 - f))
+            # Same sector table as colorsys.hsv_to_rgb
+            r = numpy.choose(sector, (v, q, p, p, t, v))
+            g = numpy.choose(sector, (t, v, v, q, p, p))
+            b = numpy.choose(sector, (p, p, t, v, v, q))
+            px = numpy.empty((size, 4), numpy.uint8)
+            px[:, 0], px[:, 1], px[:, 2] = (r * 255).astype(numpy.uint8), (g * 255).astype(numpy.uint8), (b * 255).astype(numpy.uint8)
+            px[:, 3] = level
+            self[:] = px.tobytes()
+            return self
+        out = bytearray(size * 4)
+        for i in range(size):
+            r, g, b = colorsys.hsv_to_rgb((hue + spread * i / size) % 1.0, saturation, 1.0)
+            out[i * 4:i * 4 + 4] = bytes((int(r * 255), int(g * 255), int(b * 255), level))
+        self[:] = out
+        return self
+
+    def levelWave(self, cycles=1.0, phase=0.0, low=0, high=100):
+        """Brightness follows a sine wave along the strip: cycles periods, shifted by phase radians"""
+        size = self.size()
+        if numpy is not None:
+            wave = numpy.sin(numpy.arange(size) / size * 2 * math.pi * cycles + phase)
+            levels = (wave * 0.5 + 0.5) * (high - low) + low
+            self[3::4] = numpy.clip(levels, 0, 100).astype(numpy.uint8).tobytes()
+            return self
+        step = 2 * math.pi * cycles / size
+        span = high - low
+        self[3::4] = bytes(_clamp(int((math.sin(i * step + phase) * 0.5 + 0.5) * span + low), 0, 100)
+                           for i in range(size))
+        return self
+
+    def rotate(self, count=1):
+        """Move every LED count places up the strip, wrapping around the end"""
+        size = self.size()
+        if size:
+            count %= size
+            if count:
+                self[:] = self[-count * 4:] + self[:-count * 4]
+        return self
+
+    def shift(self, count=1, color=(0, 0, 0, 0)):
+        """Move every LED count places up the strip (down if negative), filling the gap with color"""
+        size = self.size()
+        count = _clamp(count, -size, size)
+        fill = _color(color) * abs(count)
+        if count > 0:
+            self[:] = fill + self[:(size - count) * 4]
+        elif count < 0:
+            self[:] = self[-count * 4:] + fill
+        return self
+
+    def blend(self, other, amount=0.5):
+        """Mix towards other (a Frame or RGBL buffer of the same size): 0 keeps self, 1 copies other"""
+        other = memoryview(other).cast('B')
+        if len(other) != len(self):
+            raise ValueError("Frames to blend must be the same size")
+        amount = _clamp(float(amount), 0.0, 1.0)
+        if numpy is not None:
+            a = numpy.frombuffer(self, numpy.uint8)
+            b = numpy.frombuffer(other, numpy.uint8)
+            self[:] = (a * (1 - amount) + b * amount).astype(numpy.uint8).tobytes()
+            return self
+        self[:] = bytes(int(x * (1 - amount) + y * amount) for x, y in zip(self, other))
+        return self
+
+    def scale(self, factor):
+        """Multiply every LED's brightness level by factor (clamped to 0-100)"""
+        table = bytes(_clamp(int(v * factor), 0, 100) for v in range(256))
+        self[3::4] = self[3::4].translate(table)
+        return self
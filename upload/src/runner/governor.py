@@ -0,0 +1,122 @@
+"""Frame-rate governor: setLEDs hands frames to an output thread that pushes at most one per frame interval
+
+Extra frames submitted within an interval are coalesced (only the newest is shown). A program that
+keeps overwriting frames nobody will see is made to wait for the next frame after COALESCE_LIMIT
+overwrites, so a tight setLEDs loop no longer spins a core at 100%. A frame the output thread
+fails to show raises from the next submit() or flush(), as it would have from a synchronous push.
+"""
+import os
+import threading
+import time
+
+# 0 turns the governor off: every setLEDs is pushed synchronously, as before
+FRAME_RATE = float(os.environ.get('FRAME_RATE', 60))
+COALESCE_LIMIT = int(os.environ.get('FRAME_COALESCE', 8))
+MAX_WAIT_SECONDS = 1.0
+
+class FrameGovernor:
+    def __init__(self, output, fps=FRAME_RATE, coalesce_limit=COALESCE_LIMIT):
+        self.output = output
+        self.interval = 1.0 / fps if fps > 0 else 0
+        self.coalesce_limit = coalesce_limit
+        self.frame = 0
+        self.pushed = 0
+        self.coalesced = 0
+        self._pid = None
+
+    def _start(self):
+        # Sandboxes fork from the worker, whose idle animation may have started a thread here already
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._pending = None
+        self._overwrites = 0
+        self._waiters = 0
+        self._busy = False
+        self._error = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, payload):
+        """Queue payload for the next frame, replacing any frame still waiting"""
+        if not self.interval:
+            self.output(payload)
+            self.pushed += 1
+            self.frame += 1
+            return
+        self._start()
+        with self._cond:
+            self._raise_error()
+            if self._pending is not None:
+                self.coalesced += 1
+                self._overwrites += 1
+            self._pending = payload
+            self._cond.notify_all()
+            if self._overwrites >= self.coalesce_limit:
+                self._wait_frame()
+
+    def _wait_frame(self):
+        frame = self.frame
+        self._waiters += 1
+        self._cond.notify_all()
+        deadline = time.monotonic() + MAX_WAIT_SECONDS
+        while self.frame == frame and time.monotonic() < deadline:
+            self._cond.wait(deadline - time.monotonic())
+        self._waiters -= 1
+        return self.frame
+
+    def wait_frame(self):
+        """Block until the next frame has been pushed, returning its number"""
+        if not self.interval:
+            return self.frame
+        self._start()
+        with self._cond:
+            return self._wait_frame()
+
+    def flush(self):
+        """Block until the frame waiting to be shown (if any) has reached the LEDs"""
+        if not self.interval or self._pid != os.getpid():
+            return
+        with self._cond:
+            deadline = time.monotonic() + MAX_WAIT_SECONDS
+            while (self._pending is not None or self._busy) and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            self._raise_error()
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while True:
+            with self._cond:
+                # Sleep outright while nobody is drawing or waiting for a frame
+                while self._pending is None and not self._waiters:
+                    self._cond.wait()
+            now = time.perf_counter()
+            if next_tick > now:
+                time.sleep(next_tick - now)
+            else:
+                next_tick = now
+            next_tick += self.interval
+
+            with self._cond:
+                payload, self._pending = self._pending, None
+                self._overwrites = 0
+                self._busy = payload is not None
+            error = None
+            if payload is not None:
+                try:
+                    self.output(payload)
+                except Exception as e:
+                    error = e
+            with self._cond:
+                if error is not None:
+                    self._error = error
+                self._busy = False
+                if payload is not None:
+                    self.pushed += 1
+                self.frame += 1
+                self._cond.notify_all()
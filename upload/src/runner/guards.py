@@ -0,0 +1,350 @@
+"""The RestrictedPython guards user code runs with, and a compile pass that drops the provably pointless ones
+
+compile_restricted routes every `x += ...`, `a[i]`, `a[i] = ...`, loop and unpacking through a guard
+function. Ours implement the same policy as before (in-place operators compute the plain binary
+operator, indexing and iteration are unrestricted, attribute access stays with safer_getattr) with
+as little per-call work as possible. On top of that, GuardElision rewrites guard calls back into
+plain Python where it can prove the operands are built-in numbers, lists or tuples: `range()` loops,
+local numeric arithmetic and indexing of local lists. The rewritten code computes exactly what the
+guard would have, so the pass can only make code faster, never let more through.
+"""
+import ast
+import operator
+
+from RestrictedPython.Guards import guarded_iter_unpack_sequence, guarded_unpack_sequence
+from RestrictedPython.transformer import RestrictingNodeTransformer
+
+# In-place operators evaluate the binary operator, so `a += b` on a list builds a new list instead
+# of extending a list the job may have been handed
+INPLACE = {"+=": operator.add, "-=": operator.sub, "*=": operator.mul, "/=": operator.truediv,
+           "//=": operator.floordiv, "%=": operator.mod, "**=": operator.pow, "<<=": operator.lshift,
+           ">>=": operator.rshift, "&=": operator.and_, "|=": operator.or_, "^=": operator.xor,
+           "@=": operator.matmul}
+
+def inplacevar(op, var, expr):
+    try:
+        fn = INPLACE[op]
+    except KeyError:
+        raise ValueError(f"Unsupported in-place operator {op}") from None
+    return fn(var, expr)
+
+getitem = operator.getitem
+
+def getiter(ob):
+    # No restrictions, as before
+    return ob
+
+def write(ob):
+    return ob
+
+def unpack_sequence(it, spec, _getiter_):
+    # Unpacking only has to go through _getiter_; with ours that is the identity
+    if _getiter_ is getiter and type(it) in (tuple, list):
+        return it
+    return guarded_unpack_sequence(it, spec, _getiter_)
+
+def iter_unpack_sequence(it, spec, _getiter_):
+    if _getiter_ is getiter:
+        return it
+    return guarded_iter_unpack_sequence(it, spec, _getiter_)
+
+def restricted_globals():
+    return {"_getitem_": getitem, "_getiter_": getiter, "_inplacevar_": inplacevar, "_write_": write,
+            "_unpack_sequence_": unpack_sequence, "_iter_unpack_sequence_": iter_unpack_sequence}
+
+NUMBER, SEQUENCE, UNKNOWN = "number", "sequence", "unknown"
+BINOPS = {"+=": ast.Add, "-=": ast.Sub, "*=": ast.Mult, "/=": ast.Div, "//=": ast.FloorDiv, "%=": ast.Mod,
+          "**=": ast.Pow, "<<=": ast.LShift, ">>=": ast.RShift, "&=": ast.BitAnd, "|=": ast.BitOr, "^=": ast.BitXor}
+# Builtins whose result is a number whatever they are given, and those that return a number for numbers
+NUMBER_CALLS = {"len", "int", "float"}
+NUMERIC_CALLS = {"abs", "round", "pow", "min", "max"}
+SEQUENCE_CALLS = {"tuple", "sorted"}
+FUNCTION_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+# Python 3.10+
+PATTERN = getattr(ast, "pattern", ())
+
+def _join(a, b):
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    return UNKNOWN
+
+def _guard_call(node, name):
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name
+            and not node.keywords)
+
+def _bound_names(tree):
+    """Names the code binds or declares global/nonlocal anywhere, so builtins it shadows are not trusted"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+    return names
+
+def _untrusted(tree):
+    """Names whose bindings cannot all be seen from their own scope: global, nonlocal and walrus targets"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, ast.NamedExpr):
+            names.add(node.target.id)
+    return names
+
+def _bindings(scope):
+    """name -> the expressions bound to it directly in scope, with None for a binding that proves nothing
+    (arguments, imports, unpacking, ...); a range() loop target binds the marker range"""
+    bindings = {}
+    if isinstance(scope, FUNCTION_SCOPES):
+        args = scope.args
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None:
+                bindings.setdefault(arg.arg, []).append(None)
+        pending = [scope.body] if isinstance(scope, ast.Lambda) else list(scope.body)
+    else:
+        pending = list(scope.body)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bindings.setdefault(node.name, []).append(None)
+            pending.extend(node.decorator_list)
+            if isinstance(node, ast.ClassDef):
+                pending.extend(node.bases)
+                pending.extend(node.keywords)
+            else:
+                pending.extend(node.args.defaults)
+                pending.extend(d for d in node.args.kw_defaults if d is not None)
+        elif isinstance(node, ast.Lambda):
+            pending.extend(node.args.defaults)
+            pending.extend(d for d in node.args.kw_defaults if d is not None)
+        elif isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            # Only the first iterable is evaluated in this scope
+            pending.append(node.generators[0].iter)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    if node.value is not None:
+                        bindings.setdefault(target.id, []).append(node.value)
+                else:
+                    pending.append(target)
+            if node.value is not None:
+                pending.append(node.value)
+        elif isinstance(node, (ast.For, ast.AsyncFor)) and isinstance(node.target, ast.Name):
+            iterable = node.iter.args[0] if _guard_call(node.iter, "_getiter_") and node.iter.args else node.iter
+            bindings.setdefault(node.target.id, []).append(range if _guard_call(iterable, "range") else None)
+            pending.append(node.iter)
+            pending.extend(node.body)
+            pending.extend(node.orelse)
+        elif isinstance(node, ast.Name):
+            if not isinstance(node.ctx, ast.Load):
+                bindings.setdefault(node.id, []).append(None)
+        elif isinstance(node, ast.alias):
+            bindings.setdefault((node.asname or node.name).split(".")[0], []).append(None)
+        else:
+            if isinstance(node, ast.ExceptHandler) and node.name:
+                bindings.setdefault(node.name, []).append(None)
+            for name in ("name", "rest"):
+                # match captures
+                if isinstance(node, PATTERN) and isinstance(getattr(node, name, None), str):
+                    bindings.setdefault(getattr(node, name), []).append(None)
+            pending.extend(ast.iter_child_nodes(node))
+    return bindings
+
+class _Scope:
+    def __init__(self, node, parent, untrusted, shadowed):
+        self.parent = parent
+        self.shadowed = shadowed
+        self.kinds = {}
+        if isinstance(node, (ast.Module,) + FUNCTION_SCOPES):
+            self.bindings = _bindings(node)
+            self._infer(untrusted)
+        elif isinstance(node, ast.ClassDef):
+            self.bindings = _bindings(node)
+        else:
+            # Comprehension targets; nothing is inferred for them
+            self.bindings = {n.id: None for g in node.generators for n in ast.walk(g.target) if isinstance(n, ast.Name)}
+
+    def _infer(self, untrusted):
+        candidates = {name: sources for name, sources in self.bindings.items()
+                      if name not in untrusted and None not in sources}
+        self.kinds = dict.fromkeys(candidates)
+        # Least fixpoint from "no value yet", so `x = 0` and `x = x + 1` together prove x a number
+        changed = True
+        while changed:
+            changed = False
+            for name, sources in candidates.items():
+                kind = None
+                for source in sources:
+                    if source is range:
+                        kind = _join(kind, UNKNOWN if "range" in self.shadowed else NUMBER)
+                    else:
+                        kind = _join(kind, self.kind(source))
+                if kind != self.kinds.get(name):
+                    self.kinds[name] = kind
+                    changed = True
+        for name in self.bindings:
+            if self.kinds.get(name) is None:
+                self.kinds[name] = UNKNOWN
+
+    def lookup(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.bindings:
+                return scope.kinds.get(name, UNKNOWN)
+            scope = scope.parent
+        return UNKNOWN
+
+    def builtin(self, node, names):
+        return isinstance(node.func, ast.Name) and node.func.id in names and node.func.id not in self.shadowed
+
+    def kind(self, node):
+        """NUMBER, SEQUENCE or UNKNOWN for an expression; None while it depends only on names not yet inferred"""
+        if isinstance(node, ast.Constant):
+            return NUMBER if type(node.value) in (int, float, bool) else UNKNOWN
+        if isinstance(node, ast.Name):
+            return self.lookup(node.id)
+        if isinstance(node, (ast.List, ast.Tuple, ast.ListComp)):
+            return SEQUENCE
+        if isinstance(node, ast.Compare):
+            return NUMBER
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return NUMBER
+            operand = self.kind(node.operand)
+            return operand if operand in (NUMBER, None) else UNKNOWN
+        if isinstance(node, ast.BinOp):
+            return self._binop(node.op, self.kind(node.left), self.kind(node.right))
+        if isinstance(node, ast.IfExp):
+            return _join(self.kind(node.body), self.kind(node.orelse))
+        if isinstance(node, ast.BoolOp):
+            kind = None
+            for value in node.values:
+                kind = _join(kind, self.kind(value))
+            return kind
+        if isinstance(node, ast.Call) and not node.keywords:
+            if _guard_call(node, "_inplacevar_") and len(node.args) == 3 and isinstance(node.args[0], ast.Constant):
+                op = BINOPS.get(node.args[0].value)
+                return self._binop(op(), self.kind(node.args[1]), self.kind(node.args[2])) if op else UNKNOWN
+            if self.builtin(node, NUMBER_CALLS):
+                return NUMBER
+            if self.builtin(node, SEQUENCE_CALLS):
+                return SEQUENCE
+            if self.builtin(node, NUMERIC_CALLS) and node.args:
+                kind = None
+                for arg in node.args:
+                    kind = _join(kind, self.kind(arg))
+                return kind if kind in (NUMBER, None) else UNKNOWN
+        return UNKNOWN
+
+    @staticmethod
+    def _binop(op, left, right):
+        if UNKNOWN in (left, right):
+            return UNKNOWN
+        if None in (left, right):
+            return None
+        if left == right == NUMBER:
+            return UNKNOWN if isinstance(op, ast.MatMult) else NUMBER
+        if isinstance(op, ast.Add) and left == right == SEQUENCE:
+            return SEQUENCE
+        if isinstance(op, ast.Mult) and {left, right} == {SEQUENCE, NUMBER}:
+            return SEQUENCE
+        return UNKNOWN
+
+class GuardElision(ast.NodeTransformer):
+    """Rewrite guard calls on provably built-in operands back into plain Python"""
+    def __init__(self, tree):
+        self.untrusted = _untrusted(tree)
+        self.shadowed = _bound_names(tree)
+        self.scope = None
+        self.elided = 0
+        # Guard name: call sites rewritten
+        self.sites = {}
+
+    def visit_scope(self, node):
+        outer = self.scope
+        if not isinstance(node, ast.Module):
+            # Decorators, bases and argument defaults run in the enclosing scope
+            body, node.body = node.body, ast.Constant(None) if isinstance(node, ast.Lambda) else []
+            self.generic_visit(node)
+            node.body = body
+        self.scope = _Scope(node, outer, self.untrusted, self.shadowed)
+        try:
+            node.body = self.visit(node.body) if isinstance(node, ast.Lambda) else [self.visit(n) for n in node.body]
+            return node
+        finally:
+            self.scope = outer
+
+    visit_Module = visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = visit_ClassDef = visit_scope
+
+    def visit_comprehension(self, node):
+        first = node.generators[0]
+        # The first iterable runs in the enclosing scope
+        first.iter = self.visit(first.iter)
+        outer = self.scope
+        self.scope = _Scope(node, outer, self.untrusted, self.shadowed)
+        try:
+            for field in ("elt", "key", "value"):
+                if hasattr(node, field):
+                    setattr(node, field, self.visit(getattr(node, field)))
+            for generator in node.generators:
+                generator.target = self.visit(generator.target)
+                if generator is not first:
+                    generator.iter = self.visit(generator.iter)
+                generator.ifs = [self.visit(test) for test in generator.ifs]
+            return node
+        finally:
+            self.scope = outer
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = visit_comprehension
+
+    def visit_Call(self, node):
+        node = self.generic_visit(node)
+        if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name):
+            return node
+        name, args = node.func.id, node.args
+        if name == "_getiter_" and len(args) == 1 and _guard_call(args[0], "range") and "range" not in self.shadowed:
+            return self._elide(name, args[0], node)
+        if name == "_inplacevar_" and len(args) == 3 and isinstance(args[0], ast.Constant) \
+                and args[0].value in BINOPS and self.scope.kind(args[1]) == NUMBER == self.scope.kind(args[2]):
+            return self._elide(name, ast.BinOp(args[1], BINOPS[args[0].value](), args[2]), node)
+        if name == "_getitem_" and len(args) == 2 and self.scope.kind(args[0]) == SEQUENCE:
+            return self._elide(name, ast.Subscript(args[0], args[1], ast.Load()), node)
+        if name in ("_write_", "_unpack_sequence_") and args and self.scope.kind(args[0]) == SEQUENCE:
+            return self._elide(name, args[0], node)
+        return node
+
+    def _elide(self, name, replacement, node):
+        self.elided += 1
+        self.sites[name] = self.sites.get(name, 0) + 1
+        return ast.copy_location(replacement, node)
+
+class ElidingTransformer(RestrictingNodeTransformer):
+    """compile_restricted policy: the usual restricted transform, then GuardElision"""
+    def visit_Module(self, node):
+        node = super().visit_Module(node)
+        if self.errors:
+            return node
+        node = GuardElision(node).visit(node)
+        return ast.fix_missing_locations(node)
+
+def elided_sites(code):
+    """Guard name: call sites in code that GuardElision rewrites; the same pass again, for the profiler"""
+    transformer = RestrictingNodeTransformer(errors=[], warnings=[], used_names={})
+    tree = transformer.visit(ast.parse(code))
+    if transformer.errors:
+        return {}
+    elision = GuardElision(tree)
+    elision.visit(tree)
+    return elision.sites
@@ -0,0 +1,64 @@
+"""Liveness and frame counters a sandbox shares with its worker, in shared memory
+
+The worker allocates a Counters before forking the sandbox and resets it as it hands over each job.
+Inside the sandbox, attach() starts a thread that stamps the heartbeat every BEAT_SECONDS (it stops
+when a job holds the GIL in one long C call), and every frame that reaches the LEDs is counted, with
+the time the picture last changed. Times are time.monotonic(), which every process on the machine
+shares. The worker reads the counters without a lock: each slot has a single writer.
+"""
+import multiprocessing
+import threading
+import time
+
+BEAT_SECONDS = 0.25
+HEARTBEAT, FRAMES, LAST_CHANGE, STARTED = range(4)
+# Why the worker's watchdog may stop a job: no heartbeat, no frame yet, or the picture frozen
+REASONS = ('stalled', 'no_frames', 'static')
+
+class Counters:
+    def __init__(self):
+        self.values = multiprocessing.RawArray('d', 4)
+        self._last = None
+        self.reset()
+
+    def reset(self):
+        """A new job starts now"""
+        now = time.monotonic()
+        self.values[HEARTBEAT] = self.values[LAST_CHANGE] = self.values[STARTED] = now
+        self.values[FRAMES] = 0
+
+    def beat(self):
+        self.values[HEARTBEAT] = time.monotonic()
+
+    def frame(self, payload):
+        # Only the sandbox's output thread calls this, and only it knows the previous picture;
+        # the job's first frame is always a change
+        if payload != self._last or not self.values[FRAMES]:
+            self._last = payload
+            self.values[LAST_CHANGE] = time.monotonic()
+        self.values[FRAMES] += 1
+
+    @property
+    def frames(self):
+        return int(self.values[FRAMES])
+
+    def since(self, slot, now=None):
+        """Seconds from the time in slot (HEARTBEAT, LAST_CHANGE or STARTED) until now"""
+        return (time.monotonic() if now is None else now) - self.values[slot]
+
+counters = None
+
+def attach(shared):
+    """In the sandbox: report frames to and beat on shared until the process exits"""
+    global counters
+    counters = shared
+    threading.Thread(target=_beat, daemon=True).start()
+
+def _beat():
+    while True:
+        counters.beat()
+        time.sleep(BEAT_SECONDS)
+
+def frame(payload):
+    if counters is not None:
+        counters.frame(payload)
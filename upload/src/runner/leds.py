@@ -1,17 +1,26 @@
-"""LED control module - manages NeoPixel LEDs on Raspberry Pi"""
-import neopixel
-import board
+"""LED control module - scales frames and hands them to the LED_BACKEND (NeoPixel strip by default),
+or to every controller in LED_SEGMENTS (see runner.segments)"""
 import os
+import sys
+import time
 
-def __find_pin(pin):
-    pins = {10: board.D10, 12: board.D12, 18: board.D18, 21: board.D21}
-    if pin not in pins:
-        raise ValueError(f'Pin {pin} not supported')
-    return pins[pin]
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-SIZE = int(os.environ.get('TREE_LEDS', 16))
-GPIO_PIN = __find_pin(int(os.environ.get('LED_GPIO_PIN', 18)))
-pixels = neopixel.NeoPixel(GPIO_PIN, SIZE, brightness=0.2, auto_write=False, pixel_order=neopixel.RGB)
+from . import backends, segments
+from .profiler import profiler
+
+BACKEND = os.environ.get('LED_BACKEND', 'hardware')
+SEGMENTS = os.environ.get('LED_SEGMENTS', '')
+
+# _LUT[l * 256 + v] is channel value v at brightness level l (0-100), same rounding as brightness_hack
+_LUT = bytes(int(v * (l / 100.0)) if l != 100 else v for l in range(101) for v in range(256))
+_CLAMP = bytes(min(l, 100) for l in range(256))
+_LO, _HI = (0, 1) if sys.byteorder == 'little' else (1, 0)
+if numpy is not None:
+    _LUT_NP = numpy.frombuffer(_LUT, dtype=numpy.uint8).reshape(101, 256)
 
 def get_led_count():
     return SIZE
@@ -22,13 +31,68 @@ def brightness_hack(l, r, g, b):
     factor = l / 100.0
     return (int(r * factor), int(g * factor), int(b * factor))
 
+def scale_frame(payload):
+    """Turn a flat RGBL buffer into packed RGB bytes, applying brightness to the whole frame at once"""
+    frame = memoryview(payload).cast('B')
+    if numpy is not None:
+        px = numpy.frombuffer(frame, dtype=numpy.uint8).reshape(-1, 4)
+        return _LUT_NP[numpy.minimum(px[:, 3], 100)[:, None], px[:, :3]].tobytes()
+
+    # Interleave every channel byte with its brightness level so the pairs read as
+    # 16-bit LUT indices (l * 256 + v), then look the whole frame up in one map()
+    levels = bytes(frame[3::4]).translate(_CLAMP)
+    pairs = bytearray(len(levels) * 6)
+    for c in range(3):
+        pairs[_LO + 2 * c::6] = frame[c::4]
+        pairs[_HI + 2 * c::6] = levels
+    return bytes(map(_LUT.__getitem__, memoryview(pairs).cast('H')))
+
+def _drive(strip, payload):
+    if not profiler.enabled:
+        strip.write(scale_frame(payload))
+        strip.show()
+        return
+    start = time.perf_counter()
+    rgb = scale_frame(payload)
+    scaled = time.perf_counter()
+    strip.write(rgb)
+    written = time.perf_counter()
+    strip.show()
+    profiler.record('scale', scaled - start)
+    profiler.record('write', written - scaled)
+    profiler.record('show', time.perf_counter() - written)
+
+def _segment(name, count, option, start):
+    label = f"{name}:{count}" + (f"@{option}" if option else "")
+    if name == "socket":
+        if not option:
+            raise ValueError(f"LED segment {label!r} needs a socket address")
+        from .protocol import LEDClient
+        return segments.Segment(label, start, count, LEDClient(option, count).set_framebuf)
+    strip = backends.load(name, count, int(option) if option else None)
+    return segments.Segment(label, start, count, lambda payload: _drive(strip, payload), strip)
+
+def _build():
+    if not SEGMENTS:
+        return [_segment(BACKEND, int(os.environ.get('TREE_LEDS', 16)), None, 0)]
+    built = []
+    start = 0
+    for name, count, option in segments.parse(SEGMENTS):
+        built.append(_segment(name, count, option, start))
+        start += count
+    return built
+
+fanout = segments.Fanout(_build())
+SIZE = fanout.size
+# The first segment's strip, for single-backend setups and benches
+backend = fanout.segments[0].strip
+
+def segment_status():
+    """Per-segment push stats: name, start, count, last_push (epoch seconds), push_ms, pushes, failures"""
+    return fanout.status()
+
 def set_framebuf(payload):
-    if len(payload) != SIZE * 4:
+    if memoryview(payload).nbytes != SIZE * 4:
         return False
-    
-    for i in range(SIZE):
-        r, g, b, l = payload[i*4:i*4+4]
-        pixels[i] = brightness_hack(l, r, g, b)
-    
-    pixels.show()
-    return True
\ No newline at end of file
+    fanout.push(payload)
+    return True
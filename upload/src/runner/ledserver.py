@@ -0,0 +1,46 @@
+"""LED server - owns the strip and applies frames sent by protocol.LEDClient over a Unix socket,
+or over TCP when LED_SOCKET is host:port (for a segment on another controller)"""
+import os
+import socket
+import sys
+import threading
+
+from . import leds
+from .protocol import FrameDecoder, address, hello, read_message
+
+SOCKET_PATH = os.environ.get('LED_SOCKET', '/tmp/tree-leds.sock')
+_show_lock = threading.Lock()
+
+def handle_client(conn):
+    decoder = FrameDecoder(leds.SIZE)
+    try:
+        conn.sendall(hello(leds.SIZE))
+        while True:
+            msg = read_message(conn)
+            if msg is None:
+                break
+            frame = decoder.apply(*msg)
+            with _show_lock:
+                leds.set_framebuf(frame)
+    except (OSError, ValueError) as e:
+        print(f"LED client dropped: {e}", file=sys.stderr)
+    finally:
+        conn.close()
+
+def serve(path=SOCKET_PATH):
+    family, addr = address(path)
+    if family == socket.AF_UNIX and os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_INET:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(addr)
+    server.listen()
+    print(f"LED server listening on {path} ({leds.SIZE} LEDs)")
+
+    while True:
+        conn, _ = server.accept()
+        threading.Thread(target=handle_client, args=(conn,), daemon=True).start()
+
+if __name__ == "__main__":
+    serve()
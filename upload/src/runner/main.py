@@ -1,25 +1,21 @@
 import sys
+import functools
 from .color import Color
-from RestrictedPython import compile_restricted
-from RestrictedPython.Guards import safe_builtins, safer_getattr, guarded_iter_unpack_sequence, guarded_unpack_sequence
-from RestrictedPython.Eval import default_guarded_getiter
-from RestrictedPython.PrintCollector import PrintCollector
+from RestrictedPython.Guards import safe_builtins, safer_getattr
 import math
 import random
-from .exposed import get_exposed_functions
+from .exposed import get_exposed_functions, output
+from .compiler import compile_user_code
+from .guards import elided_sites, restricted_globals as guards
+from .output import BoundedOutput, PrintCollector, StreamingOutput
+from .profiler import profiler
 
-def _inplacevar_(op, var, expr):
-    ops = {"+=": lambda: var + expr, "-=": lambda: var - expr, "*=": lambda: var * expr,
-           "/=": lambda: var / expr, "%=": lambda: var % expr, "**=": lambda: var ** expr,
-           "<<": lambda: var << expr, ">>=": lambda: var >> expr, "|=": lambda: var | expr,
-           "^=": lambda: var ^ expr, "&=": lambda: var & expr, "//=": lambda: var // expr}
-    return ops.get(op, lambda: var)()
-
-def _write_(obj):
-    return obj
-
-def execute_code(code):
-    byte_code = compile_restricted(code, "<user_code>", "exec")
+def execute_code(code, prints=None):
+    """Run user code, collecting its prints into `prints` (a BoundedOutput by default)"""
+    prints = BoundedOutput() if prints is None else prints
+    byte_code, errors = compile_user_code(code)
+    if errors:
+        raise SyntaxError("\n".join(errors))
     allowed_builtins = {**safe_builtins, "enumerate": enumerate, "zip": zip, "map": map,
                         "filter": filter, "sorted": sorted, "reversed": reversed, "sum": sum,
                         "min": min, "max": max, "abs": abs, "round": round, "pow": pow,
@@ -27,15 +23,10 @@ def execute_code(code):
                         "chr": chr, "ord": ord, "hex": hex, "oct": oct, "bin": bin,
                         "range": range}
     restricted_globals = {
+        **guards(),
         "__builtins__": allowed_builtins,
-        "_getitem_": lambda obj, index: obj[index],
-        "_inplacevar_": _inplacevar_,
-        "_print_": PrintCollector,
-        "_write_": _write_,
+        "_print_": functools.partial(PrintCollector, prints),
         "_getattr_": safer_getattr,
-        "_getiter_": default_guarded_getiter,
-        "_iter_unpack_sequence_": guarded_iter_unpack_sequence,
-        "_unpack_sequence_": guarded_unpack_sequence,
         "__name__": "restricted_module",
         "__metaclass__": type,
         "RED": Color.RED, "GREEN": Color.GREEN, "BLUE": Color.BLUE,
@@ -45,17 +36,25 @@ def execute_code(code):
         "math": math, "random": random
     }
     restricted_globals.update(get_exposed_functions())
+    if profiler.enabled:
+        profiler.count_guards(restricted_globals, elided_sites(code))
     
+    # A streaming output has sent its prints already; the result then only says how the program ended
+    shown = (lambda: "") if isinstance(prints, StreamingOutput) else prints.getvalue
     try:
         exec(byte_code, restricted_globals)
-        result = restricted_globals.get("_print", lambda: "")()
-        return result if result.strip() else "No prints invoked, but ur program executed ok (we hope)"
+        return shown() if prints.size else "No prints invoked, but ur program executed ok (we hope)"
+    except MemoryError:
+        # Hitting the memory limit is reported by the sandbox, not as a bug in the program
+        raise
     except Exception as e:
         import traceback
-        result = restricted_globals.get("_print", lambda: "")()
-        if result.strip():
-            return result + f"\n\nError: {e}\n\nFull traceback:\n{traceback.format_exc()}"
+        if prints.size:
+            return shown() + f"\n\nError: {e}\n\nFull traceback:\n{traceback.format_exc()}"
         return f"Error: {e}\n\nFull traceback:\n{traceback.format_exc()}"
+    finally:
+        # The job's last frame may still be waiting for its slot
+        output.flush()
     
 def __debug_cli():
     with open(sys.argv[1], "r") as f:
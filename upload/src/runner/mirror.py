@@ -0,0 +1,127 @@
+"""Shared-memory ring of the most recent LED frames, so the webapp can mirror the tree to browsers
+
+setLEDs publishes every frame here (a couple of memcpys, never blocks); readers only ever take the
+newest frame, so a slow viewer simply sees fewer frames. Layout of the mapped file:
+
+    header  4s magic, I slots, I led count, Q newest sequence number
+    slots   [Q sequence, d timestamp, led count * 4 RGBL bytes] * slots
+
+A slot's sequence is zeroed while it is being written, which is how readers detect a torn copy.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+PATH = os.environ.get('FRAME_MIRROR', os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'tree-frames'))
+SLOTS = 8
+# The tree whose ring is PATH itself; start.py gives every other tree a ring of its own (path_for)
+FIRST_TREE = next((tree for tree in os.environ.get('TREES', 'main').split(',') if tree), 'main')
+
+MAGIC = b"TRF1"
+HEADER = struct.Struct("<4sIIQ")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = HEADER.size - SEQ.size
+SLOT = struct.Struct("<Qd")
+
+class FrameRing:
+    def __init__(self, mm):
+        self.mm = mm
+        magic, self.slots, self.count, _ = HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise ValueError("Not a frame mirror")
+        self.slot_size = SLOT.size + self.count * 4
+        if len(mm) != HEADER.size + self.slots * self.slot_size:
+            raise ValueError("Frame mirror has a different layout")
+
+    @classmethod
+    def create(cls, path, count, slots=SLOTS):
+        size = HEADER.size + slots * (SLOT.size + count * 4)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(fd).st_size != size:
+            # Never resize a file readers may have mapped (they would SIGBUS); swap in a new one
+            os.close(fd)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            os.ftruncate(fd, size)
+            os.replace(tmp_path, path)
+        try:
+            mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        if HEADER.unpack_from(mm)[:3] != (MAGIC, slots, count):
+            HEADER.pack_into(mm, 0, MAGIC, slots, count, 0)
+        return cls(mm)
+
+    @classmethod
+    def open(cls, path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            ring = cls(mm)
+            ring.inode = os.fstat(fd).st_ino
+        finally:
+            os.close(fd)
+        return ring
+
+    def replaced(self, path):
+        """True once the writer has swapped in a new file and this mapping is stale"""
+        try:
+            return os.stat(path).st_ino != self.inode
+        except OSError:
+            return True
+
+    def _slot(self, seq):
+        return HEADER.size + (seq % self.slots) * self.slot_size
+
+    def seq(self):
+        return SEQ.unpack_from(self.mm, SEQ_OFFSET)[0]
+
+    def publish(self, payload):
+        seq = self.seq() + 1
+        offset = self._slot(seq)
+        SLOT.pack_into(self.mm, offset, 0, 0.0)
+        self.mm[offset + SLOT.size:offset + self.slot_size] = payload
+        SLOT.pack_into(self.mm, offset, seq, time.time())
+        SEQ.pack_into(self.mm, SEQ_OFFSET, seq)
+
+    def latest(self):
+        """(seq, timestamp, frame bytes) of the newest complete frame, or None"""
+        for _ in range(3):
+            seq = self.seq()
+            if not seq:
+                return None
+            offset = self._slot(seq)
+            slot_seq, timestamp = SLOT.unpack_from(self.mm, offset)
+            frame = self.mm[offset + SLOT.size:offset + self.slot_size]
+            if slot_seq == seq and SLOT.unpack_from(self.mm, offset)[0] == seq:
+                return seq, timestamp, frame
+        return None
+
+_writer = None
+
+def publish(payload, count):
+    """Called from setLEDs; mirroring is best effort and must never break the job"""
+    global _writer
+    if _writer is None:
+        try:
+            _writer = FrameRing.create(PATH, count) if PATH else False
+        except (OSError, ValueError):
+            _writer = False
+    if _writer:
+        _writer.publish(payload)
+
+def path_for(tree):
+    """The ring tree's frames go to: <TREE>_FRAME_MIRROR if set, else PATH for the first tree and
+    PATH-<tree> for the others; '' when the tree is not mirrored"""
+    override = os.environ.get(f"{tree.upper()}_FRAME_MIRROR")
+    if override is not None:
+        return override
+    return PATH if not PATH or tree == FIRST_TREE else f"{PATH}-{tree}"
+
+def open_reader(path=None):
+    try:
+        return FrameRing.open(PATH if path is None else path)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,113 @@
+"""Where a job's prints go: one bounded output shared by every print in the program"""
+import codecs
+import os
+import threading
+
+OUTPUT_LIMIT = int(os.environ.get('JOB_OUTPUT_BYTES', 64 * 1024))
+FLUSH_SECONDS = float(os.environ.get('JOB_OUTPUT_FLUSH', 0.25))
+CHUNK_BYTES = 4096
+
+class BoundedOutput:
+    """Keeps the first `limit` bytes a job prints, then notes the truncation once and drops the rest"""
+    def __init__(self, limit=OUTPUT_LIMIT):
+        self.limit = limit
+        self.size = 0
+        self.parts = []
+        self.truncated = False
+
+    def write(self, text):
+        if self.truncated:
+            return
+        data = text.encode(errors="replace")
+        if self.size + len(data) > self.limit:
+            data = data[:self.limit - self.size]
+            self.truncated = True
+        self.size += len(data)
+        self.parts.append(data)
+        if self.truncated:
+            self.parts.append(f"\n[output truncated at {self.limit} bytes]\n".encode())
+
+    def getvalue(self):
+        return b"".join(self.parts).decode(errors="replace")
+
+class StreamingOutput(BoundedOutput):
+    """BoundedOutput that hands its text to send() while the job runs, instead of keeping it
+
+    A flusher thread sends complete lines every `interval` seconds (sooner once CHUNK_BYTES are
+    waiting); whatever is left goes out on close(). Sending only ever happens on that thread, so
+    a limit signal interrupting the job can't cut a message in half. What was sent is kept too
+    (at most `limit` bytes), so getvalue() and the program's `printed` still see everything.
+    """
+    def __init__(self, send, limit=OUTPUT_LIMIT, interval=FLUSH_SECONDS):
+        super().__init__(limit)
+        self.send = send
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closing = False
+        self.waiting = 0
+        self.sent = []
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, text):
+        with self.lock:
+            first = len(self.parts)
+            super().write(text)
+            self.waiting += sum(len(part) for part in self.parts[first:])
+            if self.waiting >= CHUNK_BYTES:
+                self.wake.set()
+
+    def getvalue(self):
+        with self.lock:
+            return b"".join(self.sent + self.parts).decode(errors="replace")
+
+    def _flush(self, everything):
+        with self.lock:
+            data = b"".join(self.parts)
+            end = len(data) if everything or len(data) >= CHUNK_BYTES else data.rfind(b"\n") + 1
+            self.parts = [data[end:]] if end < len(data) else []
+            self.waiting = len(data) - end
+            if end:
+                self.sent.append(data[:end])
+        text = self.decoder.decode(data[:end], final=everything)
+        if text:
+            self.send(text)
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            closing = self.closing
+            self._flush(closing)
+            if closing:
+                break
+
+    def close(self):
+        """Send whatever is left; call before reporting the job's result"""
+        self.closing = True
+        self.wake.set()
+        self.thread.join()
+
+class PrintCollector:
+    """RestrictedPython's PrintCollector, but every scope writes to the job's one output
+
+    (RestrictedPython makes a collector per function, so prints inside functions used to vanish)
+    """
+    def __init__(self, output, _getattr_=None):
+        self.output = output
+        self._getattr_ = _getattr_
+
+    def write(self, text):
+        self.output.write(text)
+
+    def __call__(self):
+        return self.output.getvalue()
+
+    def _call_print(self, *objects, **kwargs):
+        if kwargs.get('file', None) is None:
+            kwargs['file'] = self
+        else:
+            self._getattr_(kwargs['file'], 'write')
+        print(*objects, **kwargs)
@@ -0,0 +1,176 @@
+"""Preview runs: a program on the simulated strip against a virtual clock, sampled into a short frame strip
+
+init() turns a freshly spawned process into a preview host: the LEDs become the headless simulator (no
+hardware, socket, segments, compositor or mirror), which is why runner.exposed is only imported after
+it. Each run() forks a fresh sandbox from the host, so a program cannot leave anything behind for the
+next. In the sandbox sleep() and waitFrame() move a virtual clock instead of waiting, and setLEDs
+pays for a frame interval once it has overwritten COALESCE_LIMIT frames nobody would see, as the
+governor makes it on the tree. A 45 s animation therefore runs in the time its Python takes.
+
+The picture is sampled at the end of every duration / frames virtual seconds, so memory stays at
+`frames` frames however many the program draws. A program that is still drawing after WALL_SECONDS
+of real time is stopped and the strip so far is returned, marked truncated.
+"""
+import base64
+import multiprocessing
+import os
+import resource
+import signal
+import time
+
+# What a preview process must never drive
+SANDBOX_ENV = {'LED_BACKEND': 'sim', 'SIM_REALTIME': '0', 'SIM_RECORD': '', 'SIM_FRAMES': '1',
+               'LED_SOCKET': '', 'LED_SEGMENTS': '', 'LED_COMPOSITOR': '', 'FRAME_MIRROR': '',
+               'RECORD_JOBS': '0', 'JOB_PROFILE': '0'}
+WALL_SECONDS = float(os.environ.get('PREVIEW_WALL_SECONDS', 1.5))
+MEMORY_MB = int(os.environ.get('PREVIEW_MEMORY_MB', 256))
+# After the program is asked to stop, how long it gets to send its strip before it is killed
+GRACE_SECONDS = 1.0
+
+class PreviewOver(BaseException):
+    """Ends the program; BaseException so execute_code and the program's `except Exception` let it through"""
+
+class VirtualOutput:
+    """Stands in for runner.exposed's FrameGovernor: frames go to the strip at the virtual time they are set"""
+    def __init__(self, show, fps, coalesce_limit, duration, frames):
+        self.show = show
+        self.interval = 1.0 / fps if fps > 0 else 0
+        self.coalesce_limit = coalesce_limit
+        self.duration = duration
+        self.now = 0.0
+        self.frame = 0
+        self.pushed = 0
+        self.overwrites = 0
+        self.over = False
+        self.bucket = duration / frames
+        self.strip = [None] * frames
+
+    def advance(self, seconds):
+        self.now += seconds
+        self.overwrites = 0
+        if self.now >= self.duration:
+            self.stop()
+
+    def stop(self):
+        self.over = True
+        raise PreviewOver()
+
+    def submit(self, payload):
+        if self.over:
+            self.stop()
+        self.show(payload)
+        self.pushed += 1
+        self.strip[min(int(self.now / self.bucket), len(self.strip) - 1)] = payload
+        if not self.interval:
+            self.frame += 1
+            return
+        self.overwrites += 1
+        if self.overwrites >= self.coalesce_limit:
+            self.wait_frame()
+
+    def wait_frame(self):
+        if self.over:
+            self.stop()
+        if self.interval:
+            # The frame after the one now falls in; the epsilon stops a boundary rounding down into its own frame
+            self.frame = int(self.now / self.interval + 1e-9) + 1
+            self.advance(self.frame * self.interval - self.now)
+        return self.frame
+
+    def flush(self):
+        pass
+
+    def sleep(self, seconds):
+        if seconds > 10:
+            raise ValueError("sleep max 10s")
+        if self.over:
+            self.stop()
+        self.advance(max(seconds, 0))
+
+    def frames(self, size):
+        """The sampled strip up to where the program got, each bucket showing the last frame set in or before it"""
+        used = max(1, min(len(self.strip), -int(-self.now // self.bucket)))
+        shown = bytes(size * 4)
+        strip = []
+        for payload in self.strip[:used]:
+            shown = payload if payload is not None else shown
+            strip.append(shown)
+        return strip
+
+def init():
+    """ProcessPoolExecutor initializer: make this (freshly spawned) process a preview host and import the runner"""
+    os.environ.update(SANDBOX_ENV)
+    from .main import execute_code
+    # Forked sandboxes inherit inspect's warmed module cache, as in the tree's SandboxPool
+    execute_code("pass\n")
+
+def _limit_memory():
+    with open("/proc/self/statm") as f:
+        mapped = int(f.read().split()[0]) * resource.getpagesize()
+    hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+    soft = mapped + MEMORY_MB * 1024 * 1024
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+def _on_alarm(signum, frame):
+    raise PreviewOver()
+
+def _sandbox(conn, code, duration, frames):
+    from . import exposed
+    from .main import execute_code
+    from .output import BoundedOutput
+    if MEMORY_MB:
+        _limit_memory()
+    output = VirtualOutput(exposed._show, exposed.governor.FRAME_RATE, exposed.governor.COALESCE_LIMIT,
+                           duration, frames)
+    exposed.output = output
+    exposed.sleep = output.sleep
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, WALL_SECONDS)
+    prints = BoundedOutput()
+    truncated = False
+    try:
+        status, result = 'success', execute_code(code, prints)
+    except PreviewOver:
+        # Either the virtual clock ran out (the program just had its full run) or the real one did
+        truncated = not output.over
+        status, result = 'success', prints.getvalue()
+    except MemoryError:
+        status, result = 'memory', prints.getvalue()
+    except Exception as e:
+        status, result = 'error', str(e)
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    conn.send({
+        "status": status,
+        "output": result,
+        "leds": exposed.SIZE,
+        "duration": min(output.now, duration),
+        "interval": output.bucket,
+        "truncated": truncated,
+        "pushed": output.pushed,
+        "frames": [base64.b64encode(f).decode() for f in output.frames(exposed.SIZE)],
+    })
+
+def run(code, duration, frames):
+    """Preview code for up to duration virtual seconds as at most `frames` samples. Runs in the preview host"""
+    start = time.monotonic()
+    context = multiprocessing.get_context('fork')
+    conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_sandbox, args=(child_conn, code, duration, frames), daemon=True)
+    process.start()
+    child_conn.close()
+    try:
+        if conn.poll(WALL_SECONDS + GRACE_SECONDS):
+            result = conn.recv()
+        else:
+            result = {"status": "timeout", "output": "", "frames": []}
+    except EOFError:
+        result = {"status": "crashed", "output": "", "frames": []}
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        conn.close()
+    result["wall"] = time.monotonic() - start
+    return result
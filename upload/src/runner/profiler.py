@@ -0,0 +1,86 @@
+"""Opt-in per-job instrumentation (JOB_PROFILE=1): where a job's time goes between its own code,
+the sandbox guards and each stage of the LED pipeline
+
+Stages are timed where they run: pack (setLEDs building the payload), scale (brightness), write
+(driver buffer), show (pixels.show / the wire), mirror, and send (to the LED server when
+LED_SOCKET is set). Guards are only counted; timing every call would swamp what is measured.
+Calls the compiler elided (runner/guards.py) no longer exist to count, so `guards` covers only the
+guards that still run and `elided_guard_sites` says how many call sites of each were compiled away.
+"""
+import os
+import resource
+import time
+
+ENABLED = os.environ.get('JOB_PROFILE', '0') == '1'
+# Enough for a whole 45 s job at 60 fps; past this, stages keep counting but stop sampling
+MAX_SAMPLES = 10000
+GUARDS = ("_getitem_", "_getiter_", "_getattr_", "_write_", "_inplacevar_",
+          "_iter_unpack_sequence_", "_unpack_sequence_")
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class Profiler:
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.cpu = time.process_time()
+        self.stages = {}
+        self.counts = {}
+        self.guards = dict.fromkeys(GUARDS, 0)
+        self.elided_sites = {}
+        self.frames = 0
+        self.first_frame = self.last_frame = None
+
+    def record(self, stage, seconds):
+        samples = self.stages.setdefault(stage, [])
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+        if len(samples) < MAX_SAMPLES:
+            samples.append(seconds)
+
+    def frame(self):
+        """A frame reached the LEDs"""
+        now = time.perf_counter()
+        self.frames += 1
+        if self.first_frame is None:
+            self.first_frame = now
+        self.last_frame = now
+
+    def count_guards(self, restricted_globals, elided_sites=None):
+        """Swap the guards in restricted_globals for counting wrappers; elided_sites is what the
+        compiler removed from the code (guards.elided_sites)"""
+        self.elided_sites = dict(elided_sites or {})
+        for name in GUARDS:
+            if name in restricted_globals:
+                restricted_globals[name] = self._counting(name, restricted_globals[name])
+
+    def _counting(self, name, guard):
+        guards = self.guards
+        def counted(*args, **kwargs):
+            guards[name] += 1
+            return guard(*args, **kwargs)
+        return counted
+
+    def report(self):
+        span = (self.last_frame - self.first_frame) if self.frames > 1 else 0
+        return {
+            "seconds": time.perf_counter() - self.started,
+            "cpu_seconds": time.process_time() - self.cpu,
+            "frames": self.frames,
+            "fps": (self.frames - 1) / span if span else 0.0,
+            "stages": {stage: {"count": self.counts[stage],
+                               "mean_ms": sum(samples) / len(samples) * 1000,
+                               "p99_ms": _percentile(samples, 0.99) * 1000}
+                       for stage, samples in self.stages.items()},
+            # Calls made through the guards; calls at elided sites are plain Python and not in here
+            "guards": self.guards,
+            "elided_guard_sites": self.elided_sites,
+            # ru_maxrss is KiB on Linux, and the peak of the whole sandbox process so far
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        }
+
+profiler = Profiler()
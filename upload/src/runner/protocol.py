@@ -0,0 +1,221 @@
+"""Binary LED frame protocol between the scheduler/web side and the process that owns the LEDs
+
+Every message is a fixed little-endian header followed by a body:
+
+    magic   2s  b"LT"
+    flags   B   HELLO, FULL, DELTA or RLE
+    frame   I   frame number, +1 for every frame sent on a connection
+    count   H   number of LEDs in the frame
+    length  I   body length in bytes
+
+FULL  body: count packed (R, G, B, L) bytes
+DELTA body: repeated (start H, length H, length * RGBL bytes) on top of the previous frame
+RLE   body: repeated (run H, RGBL 4s), for solid fills and blocky patterns
+HELLO is sent once by the server on connect, with an empty body, to announce its LED count.
+"""
+import itertools
+import os
+import socket
+import struct
+import sys
+
+MAGIC = b"LT"
+HEADER = struct.Struct("<2sBIHI")
+SPAN = struct.Struct("<HH")
+RUN = struct.Struct("<H")
+
+HELLO, FULL, DELTA, RLE = 0, 1, 2, 3
+
+def _runs(payload, limit):
+    body = bytearray()
+    for n, (pixel, group) in enumerate(itertools.groupby(memoryview(payload).cast('I'))):
+        if n >= limit:
+            return None
+        body += RUN.pack(sum(1 for _ in group))
+        body += pixel.to_bytes(4, sys.byteorder)
+    return body
+
+def _spans(previous, payload):
+    old = memoryview(previous).cast('I')
+    new = memoryview(payload).cast('I')
+    body = bytearray()
+    start = end = None
+    for i in [i for i, a, b in zip(range(len(new)), old, new) if a != b]:
+        # A one-pixel gap costs as much as a new span header, so bridge it
+        if start is not None and i - end <= 1:
+            end = i + 1
+            continue
+        if start is not None:
+            body += SPAN.pack(start, end - start) + payload[start * 4:end * 4]
+        start, end = i, i + 1
+    if start is not None:
+        body += SPAN.pack(start, end - start) + payload[start * 4:end * 4]
+    return body
+
+class FrameEncoder:
+    def __init__(self, count):
+        self.count = count
+        self.frame = 0
+        self.previous = None
+
+    def encode(self, payload):
+        payload = bytes(payload)
+        if len(payload) != self.count * 4:
+            raise ValueError("Frame size does not match LED count")
+
+        best = (FULL, payload)
+        runs = _runs(payload, self.count // 4)
+        if runs is not None and len(runs) < len(best[1]):
+            best = (RLE, runs)
+        if self.previous is not None:
+            spans = _spans(self.previous, payload)
+            if len(spans) < len(best[1]):
+                best = (DELTA, spans)
+
+        self.previous = payload
+        self.frame += 1
+        flags, body = best
+        return HEADER.pack(MAGIC, flags, self.frame, self.count, len(body)) + body
+
+class FrameDecoder:
+    def __init__(self, count):
+        self.count = count
+        self.frame = 0
+        self.buf = bytearray(count * 4)
+
+    def apply(self, flags, frame, count, body):
+        """Apply one message to the framebuffer and return it"""
+        if count != self.count:
+            raise ValueError(f"Frame has {count} LEDs, expected {self.count}")
+
+        if flags == FULL:
+            if len(body) != self.count * 4:
+                raise ValueError("Full frame body has the wrong size")
+            self.buf[:] = body
+        elif flags == DELTA:
+            if frame != self.frame + 1:
+                raise ValueError(f"Delta frame {frame} does not follow frame {self.frame}")
+            # Every span is checked before any is applied, so a bad frame leaves the framebuffer as it was
+            spans = []
+            pos = 0
+            while pos < len(body):
+                if pos + SPAN.size > len(body):
+                    raise ValueError("Delta frame body ends inside a span header")
+                start, length = SPAN.unpack_from(body, pos)
+                pos += SPAN.size
+                if start + length > self.count:
+                    raise ValueError(f"Delta span {start}+{length} overruns {self.count} LEDs")
+                if pos + length * 4 > len(body):
+                    raise ValueError("Delta frame body is shorter than its spans")
+                spans.append((start, length, pos))
+                pos += length * 4
+            for start, length, pos in spans:
+                self.buf[start * 4:(start + length) * 4] = body[pos:pos + length * 4]
+        elif flags == RLE:
+            if len(body) % (RUN.size + 4):
+                raise ValueError("RLE frame body has the wrong size")
+            starts = range(0, len(body), RUN.size + 4)
+            runs = [RUN.unpack_from(body, pos)[0] for pos in starts]
+            # Checked up front, like a full frame's size, so a bad frame leaves the framebuffer as it was
+            if sum(runs) != self.count:
+                raise ValueError(f"RLE frame covers {sum(runs)} LEDs, expected {self.count}")
+            led = 0
+            for pos, run in zip(starts, runs):
+                self.buf[led * 4:(led + run) * 4] = bytes(body[pos + RUN.size:pos + RUN.size + 4]) * run
+                led += run
+        else:
+            raise ValueError(f"Unknown frame flags {flags}")
+        self.frame = frame
+        return self.buf
+
+def hello(count):
+    return HEADER.pack(MAGIC, HELLO, 0, count, 0)
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while view:
+        n = sock.recv_into(view)
+        if not n:
+            return None
+        view = view[n:]
+    return buf
+
+def read_message(sock):
+    """Read one message, returns (flags, frame, count, body) or None once the peer hangs up"""
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    magic, flags, frame, count, length = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Bad frame magic")
+    body = _recv_exact(sock, length) if length else b""
+    if body is None:
+        return None
+    return flags, frame, count, body
+
+def address(path):
+    """(family, address) for a socket path, or for host:port to reach an LED server over TCP"""
+    host, sep, port = path.rpartition(":")
+    if sep and port.isdigit() and not path.startswith("/"):
+        return socket.AF_INET, (host or "0.0.0.0", int(port))
+    return socket.AF_UNIX, path
+
+class LEDClient:
+    """Drop-in for the `leds` module that ships frames to the LED server over a Unix or TCP socket.
+    Without a size it adopts the server's LED count; with one, a server of another size is refused"""
+    def __init__(self, path, size=None):
+        self.path = path
+        self.family, self.address = address(path)
+        self.SIZE = size or int(os.environ.get('TREE_LEDS', 16))
+        self.sock = None
+        self.pid = None
+        self.encoder = None
+        try:
+            self._connect(adopt_size=size is None)
+        except OSError:
+            self._close()
+
+    def _connect(self, adopt_size=False):
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            if self.family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.connect(self.address)
+            msg = read_message(sock)
+        except (OSError, ValueError):
+            sock.close()
+            raise ConnectionError(f"LED server not reachable on {self.path}")
+        if msg is None or msg[0] != HELLO:
+            sock.close()
+            raise ConnectionError("LED server did not say hello")
+        if adopt_size:
+            self.SIZE = msg[2]
+        elif msg[2] != self.SIZE:
+            sock.close()
+            raise ConnectionError(f"LED server drives {msg[2]} LEDs, expected {self.SIZE}")
+        self.sock = sock
+        self.pid = os.getpid()
+        self.encoder = FrameEncoder(self.SIZE)
+
+    def _close(self):
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+
+    def get_led_count(self):
+        return self.SIZE
+
+    def set_framebuf(self, payload):
+        # A forked job process must not share the parent's connection (or its delta state)
+        if self.sock is not None and self.pid != os.getpid():
+            self._close()
+        for _ in range(2):
+            try:
+                if self.sock is None:
+                    self._connect()
+                self.sock.sendall(self.encoder.encode(payload))
+                return True
+            except OSError:
+                self._close()
+        return False
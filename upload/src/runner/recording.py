@@ -0,0 +1,196 @@
+"""Recorded animations: frames captured once, played back later for next to no CPU
+
+A recording is a file of timestamped frames in the binary LED protocol, so consecutive frames are
+delta or run-length encoded by the same FrameEncoder that feeds the LED server:
+
+    header   4s magic, I led count, I frames, I loop frame, Q loop offset, d duration
+    records  [d seconds since the first frame, protocol message (header + body)] * frames
+
+The loop frame (the first, unless loop_here() moved it) is always a full or RLE frame, so playback
+can jump back to it with no history; everything before it is an intro that plays once. Files are mapped, never read into memory.
+"""
+import mmap
+import os
+import re
+import struct
+import time
+
+from .protocol import HEADER as MESSAGE, FrameDecoder, FrameEncoder
+
+DIR = os.environ.get('RECORDING_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scheduler', 'recordings')))
+# Record every job's frames so it can be replayed; 0 turns it off
+RECORD_JOBS = os.environ.get('RECORD_JOBS', '1') != '0'
+
+MAGIC = b"TRA1"
+HEADER = struct.Struct("<4sIIIQd")
+STAMP = struct.Struct("<d")
+
+def path_for(name):
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+        raise ValueError(f"Bad recording name {name!r}")
+    return os.path.join(DIR, f"{name}.tra")
+
+class Recorder:
+    """Appends frames to a temporary file; close() moves it into place"""
+    def __init__(self, path, count):
+        self.path = path
+        self.count = count
+        self.encoder = FrameEncoder(count)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.file = open(self.tmp_path, 'wb')
+        self.file.write(bytes(HEADER.size))
+        self.frames = 0
+        self.loop_frame = 0
+        self.loop_offset = HEADER.size
+        self.started = None
+        self.last = 0.0
+
+    def loop_here(self):
+        """Playback loops back to the next frame once it reaches the end"""
+        self.encoder.previous = None
+        self.loop_frame = self.frames
+        self.loop_offset = self.file.tell()
+
+    def add(self, payload, timestamp=None):
+        """Record a frame shown at `timestamp` seconds into the recording (default: now)"""
+        if timestamp is None:
+            now = time.perf_counter()
+            if self.started is None:
+                self.started = now
+            timestamp = now - self.started
+        self.file.write(STAMP.pack(timestamp) + self.encoder.encode(payload))
+        self.frames += 1
+        self.last = timestamp
+
+    def close(self, duration=None):
+        """Finish the file; duration is how long the last frame stays up (default: one average frame)"""
+        if duration is None:
+            duration = self.last * self.frames / (self.frames - 1) if self.frames > 1 else self.last
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, self.count, self.frames, self.loop_frame, self.loop_offset, duration))
+        self.file.close()
+        if self.frames:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+
+    def discard(self):
+        self.file.close()
+        os.remove(self.tmp_path)
+
+class Recording:
+    def __init__(self, mm):
+        self.mm = mm
+        magic, self.count, self.frames, self.loop_frame, self.loop_offset, self.duration = HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise ValueError("Not a recording")
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def records(self, offset=HEADER.size):
+        """(timestamp, flags, frame, count, body) from the record at byte offset to the end"""
+        view = memoryview(self.mm)
+        while offset < len(view):
+            timestamp, = STAMP.unpack_from(view, offset)
+            offset += STAMP.size
+            _, flags, frame, count, length = MESSAGE.unpack_from(view, offset)
+            offset += MESSAGE.size
+            yield timestamp, flags, frame, count, view[offset:offset + length]
+            offset += length
+
+    def loop_start(self):
+        """Timestamp of the loop frame"""
+        return STAMP.unpack_from(self.mm, self.loop_offset)[0]
+
+def play(recording, output, loops=1, stop=None):
+    """Push the recording's frames to output(payload) on their original schedule.
+    The intro plays once, then the loop section `loops` times (forever if loops is None);
+    stop() is checked before every frame"""
+    decoder = FrameDecoder(recording.count)
+    start = time.perf_counter()
+    shift = 0.0
+    played = 0
+    offset = HEADER.size
+    while True:
+        for timestamp, flags, frame, count, body in recording.records(offset):
+            if stop is not None and stop():
+                return
+            delay = start + shift + timestamp - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            output(decoder.apply(flags, frame, count, body))
+        played += 1
+        if loops is not None and played >= loops:
+            break
+        # Jump back to the loop frame, one loop period later
+        shift += recording.duration - recording.loop_start()
+        offset = recording.loop_offset
+    delay = start + shift + recording.duration - time.perf_counter()
+    if delay > 0 and not (stop is not None and stop()):
+        time.sleep(delay)
+
+_recorder = None
+
+def start(name, count):
+    """Start recording everything this process shows, as recording `name`"""
+    global _recorder
+    try:
+        _recorder = Recorder(path_for(name), count)
+    except OSError:
+        _recorder = None
+
+def capture(payload):
+    """Called for every frame shown; best effort, like the mirror"""
+    global _recorder
+    if _recorder is not None:
+        try:
+            _recorder.add(payload)
+        except (OSError, ValueError):
+            _recorder.discard()
+            _recorder = None
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def remove_partial():
+    """Drop temporary files left by recorders that were killed mid-job. Workers of other trees record
+    into the same directory, so a file is only removed once the process named in it is gone"""
+    try:
+        for entry in os.scandir(DIR):
+            parts = entry.name.split(".")
+            if len(parts) == 4 and parts[3] == "tmp" and parts[2].isdigit() and not _alive(int(parts[2])):
+                os.remove(entry.path)
+    except OSError:
+        pass
+
+def prune(keep):
+    """Delete all but the newest `keep` job recordings; the idle animations are never pruned.
+    Workers of other trees prune too, so files can vanish under us"""
+    try:
+        entries = [entry for entry in os.scandir(DIR) if entry.name.endswith(".tra") and not entry.name.startswith("idle-")]
+        if len(entries) <= keep:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - keep]:
+            os.remove(entry.path)
+    except OSError:
+        pass
+
+def finish():
+    global _recorder
+    if _recorder is not None:
+        try:
+            _recorder.close()
+        except OSError:
+            pass
+        _recorder = None
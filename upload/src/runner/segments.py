@@ -0,0 +1,116 @@
+"""Segment map: one logical strip of LEDs spread over several controllers
+
+LED_SEGMENTS lists the controllers in strip order, comma separated, each as backend:count[@option]:
+
+    hardware:150@18           150 LEDs on a NeoPixel strip on GPIO 18
+    sim:100                   any other backend from runner.backends
+    socket:200@/run/top.sock  an LED server (runner.ledserver) owning another strip, on a Unix
+    socket:200@pi-top:7777    socket or on another host over TCP
+
+LED i of the logical strip is LED i - start of the segment it falls in. Every segment has its own
+output thread, so a frame takes as long as the slowest controller instead of the sum of them all.
+"""
+import os
+import threading
+import time
+
+def parse(spec):
+    """[(backend, count, option or None)] from an LED_SEGMENTS value"""
+    segments = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        backend, _, rest = part.partition(":")
+        count, _, option = rest.partition("@")
+        if not backend or not count.isdigit() or not int(count):
+            raise ValueError(f"Bad LED segment {part!r}, expected backend:count[@option]")
+        segments.append((backend, int(count), option or None))
+    if not segments:
+        raise ValueError("LED_SEGMENTS lists no segments")
+    return segments
+
+class Segment:
+    """One controller's slice of the strip; push(payload) shows its RGBL bytes"""
+    def __init__(self, name, start, count, push, strip=None):
+        self.name = name
+        self.start = start
+        self.count = count
+        self.push = push
+        self.strip = strip
+        self.last_push = 0.0
+        self.push_seconds = 0.0
+        self.pushes = 0
+        self.failures = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._done = True
+        self._error = None
+        self._pid = None
+
+    def send(self, payload):
+        start = time.perf_counter()
+        ok = self.push(payload)
+        self.push_seconds = time.perf_counter() - start
+        self.last_push = time.time()
+        self.pushes += 1
+        if ok is False:
+            self.failures += 1
+
+    def submit(self, payload):
+        """Hand a frame to the output thread; wait() for it to be shown"""
+        if self._pid != os.getpid():
+            # Threads do not survive a fork, so every process starts its own
+            self._pid = os.getpid()
+            self._cond = threading.Condition()
+            self._done = True
+            threading.Thread(target=self._run, daemon=True).start()
+        with self._cond:
+            self._pending = payload
+            self._done = False
+            self._cond.notify_all()
+
+    def wait(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._done)
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _run(self):
+        cond = self._cond
+        while True:
+            with cond:
+                cond.wait_for(lambda: self._pending is not None)
+                payload, self._pending = self._pending, None
+            try:
+                self.send(payload)
+            except Exception as e:
+                self.failures += 1
+                self._error = e
+            with cond:
+                self._done = True
+                cond.notify_all()
+
+    def status(self):
+        return {"name": self.name, "start": self.start, "count": self.count, "last_push": self.last_push,
+                "push_ms": self.push_seconds * 1000, "pushes": self.pushes, "failures": self.failures}
+
+class Fanout:
+    """Splits frames across segments and pushes them all at once"""
+    def __init__(self, segments):
+        self.segments = segments
+        self.size = sum(segment.count for segment in segments)
+
+    def push(self, payload):
+        frame = memoryview(payload).cast('B')
+        if len(self.segments) == 1:
+            self.segments[0].send(frame)
+            return
+        for segment in self.segments:
+            segment.submit(frame[segment.start * 4:(segment.start + segment.count) * 4])
+        for segment in self.segments:
+            segment.wait()
+
+    def status(self):
+        return [segment.status() for segment in self.segments]
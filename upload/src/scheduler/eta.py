@@ -0,0 +1,55 @@
+"""Queue ETAs from the runtimes of past jobs
+
+A job is expected to take as long as the same code took before (median), else the median for its
+user, else the median of every recent job. The pending jobs are then laid out in the order the
+worker's fair-share JobQueue will pick them, after whatever is still left of the running job.
+"""
+import os
+import statistics
+import time
+
+from .jobqueue import JobQueue
+
+# Until anything has run, assume jobs use their whole time slot
+DEFAULT_SECONDS = float(os.environ.get('JOB_TIMEOUT', 45))
+HISTORY = 500
+
+class RuntimeModel:
+    def __init__(self, runtimes=(), default=DEFAULT_SECONDS):
+        by_code, by_user, everyone = {}, {}, []
+        for job in runtimes:
+            seconds = max(job["seconds"], 0.0)
+            if job["code_hash"]:
+                by_code.setdefault(job["code_hash"], []).append(seconds)
+            by_user.setdefault(job["username"], []).append(seconds)
+            everyone.append(seconds)
+        self.by_code = {key: statistics.median(v) for key, v in by_code.items()}
+        self.by_user = {key: statistics.median(v) for key, v in by_user.items()}
+        self.default = statistics.median(everyone) if everyone else default
+
+    @classmethod
+    def from_store(cls, store, limit=HISTORY):
+        return cls(store.runtimes(limit))
+
+    def expected(self, job):
+        """Expected runtime of a job (a dict with username and code_hash) in seconds"""
+        if job.get("code_hash") in self.by_code:
+            return self.by_code[job["code_hash"]]
+        return self.by_user.get(job["username"], self.default)
+
+def schedule(pending, running, model, served=None, now=None):
+    """{job hash: expected start time} for the pending jobs of one tree.
+    running is the job on the tree right now (or None); served seeds the queue's turns"""
+    now = time.time() if now is None else now
+    clock = now
+    if running is not None:
+        clock += max(model.expected(running) - (now - running["started"]), 0.0)
+    queue = JobQueue(served)
+    for job in pending:
+        queue.push(job["hash"], job["username"], job["submitted"])
+    jobs = {job["hash"]: job for job in pending}
+    starts = {}
+    for job_hash in queue.drain():
+        starts[job_hash] = clock
+        clock += model.expected(jobs[job_hash])
+    return starts
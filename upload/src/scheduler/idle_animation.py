@@ -1,35 +1,39 @@
-import time
-import math
 import threading
 import sys, os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from runner.exposed import setLEDs, getLEDCount
+from runner import compositor, recording
+from runner.exposed import setLEDs, getLEDCount, output, Frame
 
 idle_running = False
 idle_thread = None
 
-def idle_animation():
-    global idle_running
-    led_count = getLEDCount()
-    frame = 0
-    
-    while idle_running:
-        try:
+# Frames of fade-in, then one period of the wave (40 * pi frames, near enough), which loops
+FADE_FRAMES = 100
+LOOP_FRAMES = 126
+FRAME_SECONDS = 0.05
+
+def idle_recording(led_count):
+    """The idle animation is computed once per tree size, then only ever replayed"""
+    path = recording.path_for(f"idle-v1-{led_count}")
+    if not os.path.exists(path):
+        recorder = recording.Recorder(path, led_count)
+        states = Frame(led_count)
+        for frame in range(FADE_FRAMES + LOOP_FRAMES):
+            if frame == FADE_FRAMES:
+                recorder.loop_here()
             fade = min(1.0, frame / 100)
-            states = []
-            
-            for i in range(led_count):
-                wave = math.sin((i / led_count * 4 * math.pi) + (frame / 20))
-                brightness = int((wave * 0.5 + 0.5) * 100 * fade)
-                r, g, b = int(80 * fade), int(50 * fade), int(200 * fade)
-                states.append((r, g, b, brightness))
-            
-            setLEDs(states)
-            frame += 1
-            time.sleep(0.05)
-        except:
-            break
+            states.fill((int(80 * fade), int(50 * fade), int(200 * fade), 0))
+            states.levelWave(cycles=2, phase=frame / 20, high=100 * fade)
+            recorder.add(states, frame * FRAME_SECONDS)
+        recorder.close((FADE_FRAMES + LOOP_FRAMES) * FRAME_SECONDS)
+    return recording.Recording.open(path)
+
+def idle_animation():
+    try:
+        recording.play(idle_recording(getLEDCount()), setLEDs, loops=None, stop=lambda: not idle_running)
+    except Exception as e:
+        print(f"Idle animation stopped: {e}")
 
 def start_idle_animation():
     global idle_running, idle_thread
@@ -44,3 +48,11 @@ def stop_idle_animation():
         idle_running = False
         if idle_thread:
             idle_thread.join(timeout=1)
+        # Don't let a queued idle frame land on top of the job's first frame
+        try:
+            output.flush()
+        except Exception as e:
+            print(f"Idle animation stopped: {e}")
+        if compositor.DIRECTORY:
+            # The compositor holds the idle frame until the job's first frame crossfades in
+            compositor.layer(compositor.IDLE).release()
@@ -0,0 +1,240 @@
+"""Job archive: every finished job's code and log, zlib-compressed in append-only segment files
+
+Replaces archive/<hash>.py and logs/<hash>.log, of which only the last 20 were kept. A running job's log
+is a plain file in logs/ so its page can follow along; when the job finishes, the worker appends the
+code and the log to the newest segment and deletes the file. A segment takes records until it passes
+SEGMENT_MB, then the next one starts. Retention deletes whole segments, oldest first, while the archive
+is over MAX_MB or the segment was last written more than MAX_DAYS ago; the newest segment always stays.
+
+    segment  seg-<n>.arc, records back to back
+    record   4s magic, B kind, 16s job hash, I raw length, I stored length, then the stored body
+    body     [I raw length, I compressed length, zlib data] * chunks of up to CHUNK_BYTES raw
+
+Every process indexes the records by (hash, kind) in memory, reading only the record headers, and
+picks up where it left off whenever a lookup misses. Logs are compressed in CHUNK_BYTES pieces, so a
+read from an offset (the job page's tail) decompresses only the chunks it covers. Workers of every tree
+append to the same archive, each holding an flock on its lock file while it writes.
+"""
+import fcntl
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR = os.environ.get('JOB_ARCHIVE_DIR', os.path.join(BASE_DIR, "archive"))
+LOG_DIR = os.environ.get('JOB_LOG_DIR', os.path.join(BASE_DIR, "logs"))
+SEGMENT_MB = float(os.environ.get('ARCHIVE_SEGMENT_MB', 16))
+MAX_MB = float(os.environ.get('ARCHIVE_MAX_MB', 1024))
+MAX_DAYS = float(os.environ.get('ARCHIVE_MAX_DAYS', os.environ.get('JOB_RETENTION_DAYS', 30)))
+CHUNK_BYTES = 64 * 1024
+LEVEL = 6
+
+CODE, LOG = 1, 2
+MAGIC = b"TJA1"
+RECORD = struct.Struct("<4sB16sII")
+CHUNK = struct.Struct("<II")
+SEGMENT = re.compile(r"seg-(\d{6})\.arc")
+NAME = re.compile(r"[A-Za-z0-9_-]{1,16}")
+
+def _check(job_hash):
+    if not NAME.fullmatch(job_hash):
+        raise ValueError(f"Bad job hash {job_hash!r}")
+
+def _pack(job_hash, kind, data):
+    chunks = []
+    for start in range(0, len(data), CHUNK_BYTES):
+        raw = data[start:start + CHUNK_BYTES]
+        packed = zlib.compress(raw, LEVEL)
+        chunks.append(CHUNK.pack(len(raw), len(packed)) + packed)
+    body = b"".join(chunks)
+    return RECORD.pack(MAGIC, kind, job_hash.encode(), len(data), len(body)) + body
+
+class JobArchive:
+    def __init__(self, directory=DIR, log_dir=LOG_DIR):
+        self.directory = directory
+        self.log_dir = log_dir
+        # (hash, kind): (segment number, body offset, raw length); the newest record wins
+        self._index = {}
+        # segment number: offset up to which its records are indexed
+        self._scanned = {}
+        self._lock = threading.Lock()
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"seg-{segment:06d}.arc")
+
+    def log_path(self, job_hash):
+        """Where a running job's log is written until it is archived"""
+        _check(job_hash)
+        return os.path.join(self.log_dir, f"{job_hash}.log")
+
+    def segments(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(m.group(1)) for m in map(SEGMENT.fullmatch, names) if m)
+
+    def _scan(self, segment):
+        """Index the records appended to segment since the last scan; stops at a record still being written"""
+        offset = self._scanned.get(segment, 0)
+        size = os.stat(self._path(segment)).st_size
+        if size == offset:
+            return offset, size
+        with open(self._path(segment), 'rb') as f:
+            while offset + RECORD.size <= size:
+                f.seek(offset)
+                magic, kind, job_hash, raw, stored = RECORD.unpack(f.read(RECORD.size))
+                end = offset + RECORD.size + stored
+                if magic != MAGIC or end > size:
+                    break
+                self._index[(job_hash.rstrip(b"\0").decode(), kind)] = (segment, offset + RECORD.size, raw)
+                offset = end
+        self._scanned[segment] = offset
+        return offset, size
+
+    def refresh(self):
+        """Catch the index up with the segments on disk"""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        segments = self.segments()
+        gone = set(self._scanned) - set(segments)
+        if gone:
+            self._index = {key: entry for key, entry in self._index.items() if entry[0] not in gone}
+            for segment in gone:
+                del self._scanned[segment]
+        for segment in segments:
+            try:
+                self._scan(segment)
+            except FileNotFoundError:
+                pass
+
+    def _find(self, job_hash, kind):
+        entry = self._index.get((job_hash, kind))
+        if entry is None:
+            self.refresh()
+            entry = self._index.get((job_hash, kind))
+        return entry
+
+    def size(self, job_hash, kind=LOG):
+        entry = self._find(job_hash, kind)
+        return None if entry is None else entry[2]
+
+    def read(self, job_hash, kind=LOG, offset=0, length=None):
+        """Bytes offset to offset + length (or the end) of the archived entry, None if there is none"""
+        entry = self._find(job_hash, kind)
+        if entry is None:
+            return None
+        segment, start, raw = entry
+        end = raw if length is None else min(raw, offset + length)
+        if offset >= end:
+            return b""
+        parts = []
+        try:
+            with open(self._path(segment), 'rb') as f:
+                f.seek(start)
+                position = 0
+                while position < end:
+                    raw_size, packed_size = CHUNK.unpack(f.read(CHUNK.size))
+                    if position + raw_size <= offset:
+                        f.seek(packed_size, os.SEEK_CUR)
+                    else:
+                        chunk = zlib.decompress(f.read(packed_size))
+                        parts.append(chunk[max(offset - position, 0):end - position])
+                    position += raw_size
+        except FileNotFoundError:
+            # Retention deleted the segment; forget it
+            self.refresh()
+            return None
+        return b"".join(parts)
+
+    def read_log(self, job_hash, offset=0, length=None):
+        """A job's log from offset on: the running job's file, else the archived copy; b"" if there is neither"""
+        try:
+            with open(self.log_path(job_hash), 'rb') as f:
+                f.seek(offset)
+                return f.read() if length is None else f.read(length)
+        except ValueError:
+            return b""
+        except FileNotFoundError:
+            # The worker only deletes the file once the log is in the archive
+            data = self.read(job_hash, LOG, offset, length)
+            return b"" if data is None else data
+
+    def put(self, job_hash, code=None, log=None):
+        """Append a finished job's code and/or log (bytes), then apply retention"""
+        _check(job_hash)
+        records = b"".join(_pack(job_hash, kind, data) for kind, data in ((CODE, code), (LOG, log)) if data is not None)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            with self._lock:
+                segments = self.segments()
+                segment = segments[-1] if segments else 1
+                if segments:
+                    end, size = self._scan(segment)
+                    if end < size:
+                        # A writer died mid-record; nobody can have indexed past the last whole one
+                        os.truncate(self._path(segment), end)
+                        size = end
+                    if size >= SEGMENT_MB * 1024 * 1024:
+                        segment += 1
+                fd = os.open(self._path(segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(fd, records)
+                finally:
+                    os.close(fd)
+                self._scan(segment)
+                self._retain()
+
+    def _retain(self):
+        segments = self.segments()
+        stats = {}
+        for segment in segments:
+            try:
+                stats[segment] = os.stat(self._path(segment))
+            except FileNotFoundError:
+                pass
+        total = sum(stat.st_size for stat in stats.values())
+        expired = time.time() - MAX_DAYS * 86400
+        for segment in segments[:-1]:
+            stat = stats.get(segment)
+            if stat is None:
+                continue
+            if total <= MAX_MB * 1024 * 1024 and stat.st_mtime >= expired:
+                break
+            os.remove(self._path(segment))
+            total -= stat.st_size
+        self._refresh()
+
+    def import_files(self, finished):
+        """One-off move of legacy archive/<hash>.py and logs/<hash>.log files into the archive;
+        logs of jobs that finished(job_hash) does not vouch for are left for their worker"""
+        moved = 0
+        names = set()
+        for directory, suffix in ((self.directory, ".py"), (self.log_dir, ".log")):
+            try:
+                names.update(name[:-len(suffix)] for name in os.listdir(directory) if name.endswith(suffix))
+            except FileNotFoundError:
+                pass
+        for job_hash in sorted(names):
+            if not NAME.fullmatch(job_hash) or not finished(job_hash):
+                continue
+            paths = (os.path.join(self.directory, f"{job_hash}.py"), self.log_path(job_hash))
+            contents = []
+            for path in paths:
+                try:
+                    with open(path, 'rb') as f:
+                        contents.append(f.read())
+                except FileNotFoundError:
+                    contents.append(None)
+            self.put(job_hash, *contents)
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            moved += 1
+        return moved
@@ -0,0 +1,96 @@
+"""In-memory job queue for the worker, woken by submit notifications over a Unix datagram socket"""
+import heapq
+import os
+import socket
+import threading
+import time
+
+SOCKET_PATH = os.environ.get('WORKER_SOCKET', os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.sock"))
+
+def socket_path(tree):
+    """The worker socket of a tree: SOCKET_PATH for "main", worker-<tree>.sock next to it for the rest"""
+    if tree == "main":
+        return SOCKET_PATH
+    root, ext = os.path.splitext(SOCKET_PATH)
+    return f"{root}-{tree}{ext}"
+
+def notify_worker(job_hash, path=SOCKET_PATH):
+    """Tell the worker a job was submitted. Never blocks; a lost wakeup is caught by the fallback rescan"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.setblocking(False)
+        sock.sendto(job_hash.encode(), path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+class JobQueue:
+    """Pending job hashes, fair-shared between users.
+
+    Each user's jobs wait in submit order; pop() serves the user who was served longest ago (never
+    served first, ties by who has the oldest job), so one user's flood of submissions takes turns
+    with everyone else instead of starving them."""
+    def __init__(self, served=None):
+        self._jobs = {}
+        self._queued = set()
+        # user -> when they were last served, seeded from the store so turns survive a restart
+        self.served = dict(served or {})
+        self._clock = max(self.served.values(), default=0.0)
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._queued)
+
+    def push(self, job_hash, user="", submitted=0.0):
+        with self._cond:
+            if job_hash in self._queued:
+                return
+            self._queued.add(job_hash)
+            heapq.heappush(self._jobs.setdefault(user, []), (submitted, job_hash))
+            self._cond.notify()
+
+    def _next(self):
+        user = min(self._jobs, key=lambda u: (self.served.get(u, 0.0), self._jobs[u][0]))
+        jobs = self._jobs[user]
+        _, job_hash = heapq.heappop(jobs)
+        if not jobs:
+            del self._jobs[user]
+        self._queued.discard(job_hash)
+        self._clock = max(time.time(), self._clock + 1e-6)
+        self.served[user] = self._clock
+        return job_hash
+
+    def pop(self, timeout=None):
+        """Next job hash, or None if nothing arrived within timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queued, timeout):
+                return None
+            return self._next()
+
+    def drain(self):
+        """Every queued job hash, in the order pop() would return them"""
+        with self._cond:
+            return [self._next() for _ in range(len(self._queued))]
+
+    def listen(self, path=SOCKET_PATH, lookup=None):
+        """Feed the queue from notify_worker() datagrams on a background thread;
+        lookup(job_hash) gives the (user, submitted) of a job, or None to drop it"""
+        if os.path.exists(path):
+            os.remove(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(path)
+
+        def _recv_loop():
+            while True:
+                job_hash = sock.recv(64).decode(errors="replace")
+                if not job_hash.isalnum():
+                    continue
+                job = lookup(job_hash) if lookup else ("", 0.0)
+                if job is not None:
+                    self.push(job_hash, *job)
+
+        threading.Thread(target=_recv_loop, daemon=True).start()
+        return sock
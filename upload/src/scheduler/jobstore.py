@@ -0,0 +1,217 @@
+"""Job store shared by the webapp and the scheduler: one SQLite database in WAL mode
+
+Replaces metadata.json. Every row is one submission; status moves pending -> running -> completed/failed
+through transition(), which only succeeds from the expected state, so two processes can never both
+claim the same job.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.environ.get('JOB_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.db"))
+RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', 30))
+# Every tree has its own worker and queue; jobs name the tree they run on
+TREES = tuple(tree for tree in os.environ.get('TREES', 'main').split(',') if tree)
+DEFAULT_TREE = TREES[0]
+
+PENDING, RUNNING, COMPLETED, FAILED = "pending", "running", "completed", "failed"
+FINISHED = (COMPLETED, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    hash TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    profile TEXT,
+    tree TEXT NOT NULL DEFAULT 'main',
+    code_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted);
+CREATE INDEX IF NOT EXISTS jobs_submitted ON jobs (submitted);
+CREATE INDEX IF NOT EXISTS jobs_user ON jobs (username, status);
+CREATE TABLE IF NOT EXISTS version (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL);
+INSERT OR IGNORE INTO version VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS jobs_inserted AFTER INSERT ON jobs BEGIN UPDATE version SET value = value + 1; END;
+CREATE TRIGGER IF NOT EXISTS jobs_updated AFTER UPDATE ON jobs BEGIN UPDATE version SET value = value + 1; END;
+CREATE TRIGGER IF NOT EXISTS jobs_deleted AFTER DELETE ON jobs BEGIN UPDATE version SET value = value + 1; END;
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL);
+INSERT OR IGNORE INTO counters VALUES ('start_time', strftime('%s', 'now'));
+"""
+
+# Columns added since the first schema, for databases created before them
+COLUMNS = (("profile", "TEXT"), ("tree", "TEXT NOT NULL DEFAULT 'main'"), ("code_hash", "TEXT"))
+
+class JobStore:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self):
+        # sqlite3 connections belong to one thread, and must not survive a fork
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            columns = [row[1] for row in db.execute("PRAGMA table_info(jobs)")]
+            for column, definition in COLUMNS:
+                if column not in columns:
+                    try:
+                        db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+                    except sqlite3.OperationalError:
+                        pass  # another process just added it
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def add(self, job_hash, username, filename, submitted=None, tree=DEFAULT_TREE, code_hash=None, max_pending=None):
+        """Insert a pending job; raises sqlite3.IntegrityError if the hash is taken.
+        With max_pending, returns False instead of adding when the user already has that many jobs pending"""
+        row = (job_hash, username, filename, PENDING, submitted or time.time(), tree, code_hash)
+        if max_pending is None:
+            self._db().execute(
+                "INSERT INTO jobs (hash, username, filename, status, submitted, tree, code_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            return True
+        # Count and insert in one statement, so two submits at once cannot both squeeze under the cap
+        cur = self._db().execute(
+            "INSERT INTO jobs (hash, username, filename, status, submitted, tree, code_hash) "
+            "SELECT ?, ?, ?, ?, ?, ?, ? WHERE (SELECT COUNT(*) FROM jobs WHERE username = ? AND status = ?) < ?",
+            (*row, username, PENDING, max_pending))
+        return cur.rowcount == 1
+
+    def pending_copy(self, username, code_hash, tree=DEFAULT_TREE):
+        """Hash of a job by username with this code that is still waiting on tree, or None"""
+        row = self._db().execute(
+            "SELECT hash FROM jobs WHERE username = ? AND status = ? AND code_hash = ? AND tree = ? LIMIT 1",
+            (username, PENDING, code_hash, tree)).fetchone()
+        return row[0] if row else None
+
+    def get(self, job_hash):
+        row = self._db().execute("SELECT * FROM jobs WHERE hash = ?", (job_hash,)).fetchone()
+        return dict(row) if row else None
+
+    def transition(self, job_hash, old_status, new_status):
+        """Atomically move a job from old_status to new_status, False if it was not in old_status"""
+        column = "started" if new_status == RUNNING else "finished"
+        cur = self._db().execute(
+            f"UPDATE jobs SET status = ?, {column} = ? WHERE hash = ? AND status = ?",
+            (new_status, time.time(), job_hash, old_status))
+        return cur.rowcount == 1
+
+    def by_status(self, *statuses, tree=None):
+        """Jobs in any of statuses (on one tree, if given), oldest submission first"""
+        marks = ", ".join("?" * len(statuses))
+        if tree is None:
+            rows = self._db().execute(
+                f"SELECT * FROM jobs WHERE status IN ({marks}) ORDER BY submitted", statuses)
+        else:
+            rows = self._db().execute(
+                f"SELECT * FROM jobs WHERE status IN ({marks}) AND tree = ? ORDER BY submitted", (*statuses, tree))
+        return [dict(row) for row in rows]
+
+    def recent(self, limit, *statuses):
+        """The newest `limit` jobs in any of statuses, newest first"""
+        marks = ", ".join("?" * len(statuses))
+        rows = self._db().execute(
+            f"SELECT * FROM jobs WHERE status IN ({marks}) ORDER BY submitted DESC LIMIT ?",
+            (*statuses, limit))
+        return [dict(row) for row in rows]
+
+    def last_served(self, tree=DEFAULT_TREE):
+        """{username: when their latest job on tree started}, to seed the fair-share queue"""
+        rows = self._db().execute(
+            "SELECT username, MAX(started) FROM jobs WHERE tree = ? AND started IS NOT NULL GROUP BY username", (tree,))
+        return {username: started for username, started in rows}
+
+    def runtimes(self, limit):
+        """The newest `limit` finished jobs that ran, newest first, for runtime estimates"""
+        marks = ", ".join("?" * len(FINISHED))
+        rows = self._db().execute(
+            f"SELECT username, code_hash, finished - started AS seconds FROM jobs "
+            f"WHERE status IN ({marks}) AND started IS NOT NULL ORDER BY finished DESC LIMIT ?", (*FINISHED, limit))
+        return [dict(row) for row in rows]
+
+    def set_profile(self, job_hash, profile):
+        self._db().execute("UPDATE jobs SET profile = ? WHERE hash = ?", (json.dumps(profile), job_hash))
+
+    def last_profiled(self):
+        """The most recently finished job that has a profile, or None"""
+        row = self._db().execute(
+            "SELECT * FROM jobs WHERE profile IS NOT NULL ORDER BY finished DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+
+    def bump(self, name, amount=1):
+        """Add to a lifetime counter; unlike the jobs table these survive purge()"""
+        self._db().execute(
+            "INSERT INTO counters VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            (name, amount))
+
+    def counters(self):
+        return {name: value for name, value in self._db().execute("SELECT name, value FROM counters")}
+
+    def version(self):
+        """Bumped (by trigger, in the same transaction) on every change to any job"""
+        return self._db().execute("SELECT value FROM version").fetchone()[0]
+
+    def counts(self):
+        rows = self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return {status: n for status, n in rows}
+
+    def fail_running(self, tree=DEFAULT_TREE):
+        """Jobs left running on tree by a worker that died can never finish; mark them failed"""
+        cur = self._db().execute(
+            "UPDATE jobs SET status = ?, finished = ? WHERE status = ? AND tree = ?",
+            (FAILED, time.time(), RUNNING, tree))
+        return cur.rowcount
+
+    def purge(self, max_age_days=RETENTION_DAYS):
+        """Drop finished jobs submitted more than max_age_days ago"""
+        marks = ", ".join("?" * len(FINISHED))
+        cur = self._db().execute(
+            f"DELETE FROM jobs WHERE status IN ({marks}) AND submitted < ?",
+            (*FINISHED, time.time() - max_age_days * 86400))
+        return cur.rowcount
+
+    def import_metadata(self, metadata_file, job_dir):
+        """One-off import of a legacy metadata.json; jobs whose file is still in job_dir stay pending"""
+        if not os.path.exists(metadata_file):
+            return 0
+        with open(metadata_file, 'r') as f:
+            metadata = json.load(f)
+        rows = []
+        for job_hash, meta in metadata.items():
+            pending = os.path.exists(os.path.join(job_dir, f"{job_hash}.py"))
+            rows.append((job_hash, meta.get("username", "unknown"), meta.get("filename", "unknown"),
+                         PENDING if pending else COMPLETED, meta.get("timestamp", 0)))
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        db.executemany(
+            "INSERT OR IGNORE INTO jobs (hash, username, filename, status, submitted) VALUES (?, ?, ?, ?, ?)", rows)
+        db.execute("COMMIT")
+        os.replace(metadata_file, metadata_file + ".imported")
+        return len(rows)
+
+    def import_stats(self, stats_file):
+        """One-off import of the legacy stats.json counters"""
+        if not os.path.exists(stats_file):
+            return False
+        with open(stats_file, 'r') as f:
+            stats = json.load(f)
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        db.execute("UPDATE counters SET value = MIN(value, ?) WHERE name = 'start_time'",
+                   (stats.get('start_time', time.time()),))
+        self.bump('jobs', stats.get('total_jobs', 0))
+        self.bump('errors', stats.get('total_errors', 0))
+        db.execute("COMMIT")
+        os.replace(stats_file, stats_file + ".imported")
+        return True
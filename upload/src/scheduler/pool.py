@@ -0,0 +1,246 @@
+"""Pool of pre-started sandbox processes that already have the runner imported and are waiting for code"""
+import ctypes
+import multiprocessing
+import os
+import resource
+import signal
+import time
+
+from runner import compositor, exposed, heartbeat, recording
+from runner.heartbeat import HEARTBEAT, LAST_CHANGE, STARTED
+from runner.main import execute_code
+from runner.output import StreamingOutput
+from runner.profiler import profiler
+
+POOL_SIZE = int(os.environ.get('SANDBOX_POOL_SIZE', 1))
+# 1 keeps every job in a fresh process (user code can mutate math/random and the exposed module);
+# raise it to trade that isolation for skipping the fork entirely
+MAX_JOBS_PER_SANDBOX = int(os.environ.get('SANDBOX_MAX_JOBS', 1))
+# Per job, 0 for no limit. Memory is on top of what the runner itself already has mapped. An unpaced
+# animation keeps a core busy for its whole turn, so CPU time defaults to the wall clock timeout
+MEMORY_MB = int(os.environ.get('JOB_MEMORY_MB', 256))
+CPU_SECONDS = int(os.environ.get('JOB_CPU_SECONDS', os.environ.get('JOB_TIMEOUT', 45)))
+# The watchdog hands the tree to the next job early when this one is not using it: no frame within
+# NO_FRAMES_SECONDS of starting, the picture unchanged for STATIC_SECONDS, or no heartbeat for
+# STALL_SECONDS (one C call holding the GIL). 0 turns a check off
+NO_FRAMES_SECONDS = float(os.environ.get('JOB_NO_FRAMES_SECONDS', 10))
+STATIC_SECONDS = float(os.environ.get('JOB_STATIC_SECONDS', 15))
+STALL_SECONDS = float(os.environ.get('JOB_STALL_SECONDS', 5))
+WATCHDOG_INTERVAL = 0.25
+PR_SET_PDEATHSIG = 1
+
+# The worker's end of every sandbox's pipe. A forked sandbox closes its copies, so that when the
+# worker goes away every sandbox sees its pipe close instead of waiting on it forever
+_parent_ends = set()
+
+class CPULimitExceeded(BaseException):
+    """BaseException so neither execute_code nor the program's own `except Exception` swallows it"""
+
+def _on_sigxcpu(signum, frame):
+    raise CPULimitExceeded()
+
+def _mapped_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * resource.getpagesize()
+
+def _set_soft_limit(which, soft):
+    hard = resource.getrlimit(which)[1]
+    if hard != resource.RLIM_INFINITY and (soft == resource.RLIM_INFINITY or soft > hard):
+        soft = hard
+    resource.setrlimit(which, (soft, hard))
+
+def _limit_job():
+    """Limits for the job about to run in this sandbox; only soft limits, so a reused sandbox can raise them again"""
+    if CPU_SECONDS:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _set_soft_limit(resource.RLIMIT_CPU, int(usage.ru_utime + usage.ru_stime) + CPU_SECONDS)
+    if MEMORY_MB:
+        try:
+            _set_soft_limit(resource.RLIMIT_AS, _mapped_bytes() + MEMORY_MB * 1024 * 1024)
+        except OSError:
+            pass
+
+def _lift_limits():
+    for which in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        _set_soft_limit(which, resource.RLIM_INFINITY)
+
+def stop_reason(counters, now=None):
+    """Why the watchdog would stop the running job now (one of heartbeat.REASONS), or None"""
+    now = time.monotonic() if now is None else now
+    if STALL_SECONDS and counters.since(HEARTBEAT, now) > STALL_SECONDS:
+        return 'stalled'
+    if not counters.frames:
+        if NO_FRAMES_SECONDS and counters.since(STARTED, now) > NO_FRAMES_SECONDS:
+            return 'no_frames'
+    elif STATIC_SECONDS and counters.since(LAST_CHANGE, now) > STATIC_SECONDS:
+        return 'static'
+    return None
+
+def _die_with(parent):
+    """Have the kernel SIGKILL this process when the worker exits, even in the middle of a job"""
+    try:
+        ctypes.CDLL(None, use_errno=True).prctl(PR_SET_PDEATHSIG, signal.SIGKILL)
+    except (OSError, AttributeError):
+        pass
+    # The worker may already have died before the prctl
+    if os.getppid() != parent:
+        os._exit(1)
+
+def _sandbox_main(conn, counters, parent):
+    _die_with(parent)
+    for end in _parent_ends:
+        end.close()
+    _parent_ends.clear()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+    signal.signal(signal.SIGXCPU, _on_sigxcpu)
+    heartbeat.attach(counters)
+    if compositor.DIRECTORY:
+        exposed.leds = compositor.layer(compositor.JOB)
+    conn.send(('ready', os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            # The worker is gone
+            break
+        if job is None:
+            break
+        code, record = job
+        if record:
+            recording.start(record, exposed.SIZE)
+        # Prints stream back as ('output', text) messages while the job runs
+        prints = StreamingOutput(lambda text: conn.send(('output', text)))
+        profiler.reset()
+        try:
+            _limit_job()
+            status, result = 'success', execute_code(code, prints)
+        except CPULimitExceeded:
+            status, result = 'cpu', None
+        except MemoryError:
+            status, result = 'memory', None
+        except Exception as e:
+            status, result = 'error', str(e)
+        _lift_limits()
+        prints.close()
+        recording.finish()
+        if profiler.enabled:
+            conn.send(('profile', profiler.report()))
+        conn.send((status, result))
+
+class Sandbox:
+    def __init__(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.counters = heartbeat.Counters()
+        _parent_ends.add(self.conn)
+        self.process = multiprocessing.Process(target=_sandbox_main, args=(child_conn, self.counters, os.getpid()),
+                                               daemon=True)
+        # Until the sandbox has put SIGTERM back to the default, the worker's handler would run in it
+        # and unwind the worker's stack there; hold the signal back over the fork
+        blocked = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+        try:
+            self.process.start()
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, blocked)
+        child_conn.close()
+        self.jobs = 0
+        self.ready = False
+
+    def run(self, code, timeout, on_output=None, on_profile=None, record=None):
+        """Returns (status, result): success or error, or the reason it was stopped (timeout, cpu,
+        memory, crashed; result is then a crashed process's exit code), or the watchdog's reason
+        (stalled, no_frames, static; result is then how many seconds the job had run). Prints are passed to
+        on_output as they arrive, and with JOB_PROFILE the job's profile to on_profile.
+        With record, the job's frames are saved as that recording"""
+        try:
+            if not self.ready:
+                self.conn.recv()
+                self.ready = True
+            self.counters.reset()
+            self.conn.send((code, record))
+            self.jobs += 1
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if not self.conn.poll(min(max(remaining, 0), WATCHDOG_INTERVAL)):
+                    if remaining <= 0:
+                        self.kill()
+                        return 'timeout', None
+                    reason = stop_reason(self.counters)
+                    if reason is not None:
+                        ran = self.counters.since(STARTED)
+                        self.kill()
+                        return reason, ran
+                    continue
+                status, result = self.conn.recv()
+                if status == 'output':
+                    if on_output is not None:
+                        on_output(result)
+                elif status == 'profile':
+                    if on_profile is not None:
+                        on_profile(result)
+                else:
+                    return status, result
+        except (EOFError, OSError):
+            self.kill()
+            return 'crashed', self.process.exitcode
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def retire(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+        _parent_ends.discard(self.conn)
+        self.conn.close()
+
+class SandboxPool:
+    def __init__(self, size=POOL_SIZE, max_jobs=MAX_JOBS_PER_SANDBOX):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.idle = []
+        self.primed = False
+
+    def warm(self):
+        """Start sandboxes until `size` are waiting"""
+        if not self.primed:
+            # The first execute_code in a process pays ~10 ms filling inspect's module cache
+            # (get_exposed_functions); pay it once here so every forked sandbox inherits it
+            execute_code("pass\n")
+            self.primed = True
+        while len(self.idle) < self.size:
+            self.idle.append(Sandbox())
+
+    def run(self, code, timeout, on_output=None, on_profile=None, record=None):
+        sandbox = self.idle.pop(0) if self.idle else Sandbox()
+        try:
+            status, result = sandbox.run(code, timeout, on_output, on_profile, record)
+        except BaseException:
+            # The worker is going down (SIGTERM); its job goes with it
+            sandbox.kill()
+            raise
+
+        # Anything that timed out, crashed or used up its job budget is replaced, never reused
+        if status in ('success', 'error') and sandbox.jobs < self.max_jobs and sandbox.alive():
+            self.idle.append(sandbox)
+        else:
+            sandbox.retire()
+        self.warm()
+        return status, result
+
+    def close(self):
+        """Stop the waiting sandboxes"""
+        while self.idle:
+            self.idle.pop().retire()
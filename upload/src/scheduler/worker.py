@@ -1,157 +1,185 @@
-import time
+import colorsys
+import signal
 import sys
 import os
-import json
-import multiprocessing
+import zlib
 
 from idle_animation import start_idle_animation, stop_idle_animation
 from callback import DelayedCallback
+from jobarchive import JobArchive
+from jobqueue import JobQueue, socket_path
+from jobstore import JobStore, PENDING, RUNNING, COMPLETED, FAILED, FINISHED, DEFAULT_TREE
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from runner.main import execute_code
+from pool import SandboxPool, MEMORY_MB, CPU_SECONDS, NO_FRAMES_SECONDS, STATIC_SECONDS, STALL_SECONDS
+from runner import compositor, heartbeat, recording
 
 JOB_DIR = "jobs"
-LOG_DIR = "logs"
-ARCHIVE_DIR = "archive"
 METADATA_FILE = "metadata.json"
 STATS_FILE = "stats.json"
 TIMEOUT_SECONDS = int(os.environ.get('JOB_TIMEOUT', 45))
 IDLE_DELAY = int(os.environ.get('IDLE_ANIMATION_DELAY', 10))
-
-os.makedirs(JOB_DIR, exist_ok=True)
-os.makedirs(LOG_DIR, exist_ok=True)
-os.makedirs(ARCHIVE_DIR, exist_ok=True)
+# Submits wake the worker directly; this rescan only catches notifications that got lost
+RESCAN_SECONDS = int(os.environ.get('JOB_RESCAN_INTERVAL', 30))
+# The tree this worker drives; start.py runs one worker per entry in TREES
+TREE = os.environ.get('TREE_NAME', DEFAULT_TREE)
+# With the LED compositor, the top of the tree shows the user's colour this long as their job starts
+NOTICE_SECONDS = float(os.environ.get('NOTICE_SECONDS', 3))
+# Jobs' code and logs are kept in the archive (see jobarchive.py); recordings are files, this many of them
+RECORDINGS_KEPT = int(os.environ.get('RECORDINGS_KEPT', 20))
 
 idle_starter = DelayedCallback(IDLE_DELAY, start_idle_animation)
+sandbox_pool = SandboxPool()
+store = JobStore()
+archive = JobArchive()
 
-def load_metadata():
-    if os.path.exists(METADATA_FILE):
-        with open(METADATA_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+os.makedirs(JOB_DIR, exist_ok=True)
+os.makedirs(archive.log_dir, exist_ok=True)
+notice_clearer = DelayedCallback(NOTICE_SECONDS, lambda: compositor.layer(compositor.NOTICE).release())
 
-def cleanup_old_logs():
-    log_files = [f for f in os.listdir(LOG_DIR) if f.endswith(".log")]
-    if len(log_files) <= 20:
-        return
-    
-    log_files_sorted = sorted(log_files, key=lambda f: os.path.getmtime(os.path.join(LOG_DIR, f)))
-    for log_file in log_files_sorted[:len(log_files) - 20]:
-        os.remove(os.path.join(LOG_DIR, log_file))
-        job_hash = log_file.replace(".log", "")
-        archive_path = os.path.join(ARCHIVE_DIR, f"{job_hash}.py")
-        if os.path.exists(archive_path):
-            os.remove(archive_path)
+def show_notice(username):
+    """Overlay the top twentieth of the strip in a colour of username's own"""
+    notice = compositor.layer(compositor.NOTICE)
+    band = max(1, notice.count // 20)
+    hue = zlib.crc32(username.encode()) % 360 / 360
+    color = bytes(int(c * 255) for c in colorsys.hsv_to_rgb(hue, 1, 1)) + bytes((100,))
+    notice.publish(bytes((notice.count - band) * 4) + color * band)
+    notice_clearer.poke()
 
-def execute_code_wrapper(code, result_queue):
-    """Wrapper to run execute_code in a separate process"""
+def archive_job(job_hash, code, log_path):
+    """Move a finished job's code and log into the archive; the log stays a file if that fails"""
     try:
-        result = execute_code(code)
-        result_queue.put(('success', result))
-    except Exception as e:
-        result_queue.put(('error', str(e)))
-
-def update_stats(success=True):
-    """Update stats file with job completion"""
-    if os.path.exists(STATS_FILE):
-        with open(STATS_FILE, 'r') as f:
-            stats_data = json.load(f)
-    else:
-        stats_data = {'start_time': time.time(), 'total_jobs': 0, 'total_errors': 0}
-    
-    stats_data['total_jobs'] = stats_data.get('total_jobs', 0) + 1
-    if not success:
-        stats_data['total_errors'] = stats_data.get('total_errors', 0) + 1
-    
-    with open(STATS_FILE, 'w') as f:
-        json.dump(stats_data, f)
+        with open(log_path, 'rb') as f:
+            archive.put(job_hash, code.encode(), f.read())
+    except OSError as e:
+        print(f"Could not archive {job_hash}: {e}")
+        return
+    os.remove(log_path)
 
-def run_job(working_path, log_path, archive_path, meta, job_hash):
+def run_job(working_path, meta, job_hash):
     with open(working_path, "r") as f:
         code = f.read()
     
-    with open(archive_path, 'w') as archive:
-        archive.write(code)
-    
+    log_path = archive.log_path(job_hash)
     with open(log_path, 'w') as log:
         log.write(f"Job: {meta['filename']}\n")
         log.write(f"User: {meta['username']}\n")
         log.write(f"Hash: {job_hash}\n")
         log.write("=" * 50 + "\n\n")
-    
-    time.sleep(0.5)
-    
-    # Create a queue for the result
-    result_queue = multiprocessing.Queue()
-    
-    # Start the process
-    process = multiprocessing.Process(target=execute_code_wrapper, args=(code, result_queue))
-    process.start()
-    
-    # Wait for timeout
-    process.join(timeout=TIMEOUT_SECONDS)
-    
-    if process.is_alive():
-        # Timeout occurred - kill the process
-        process.terminate()
-        process.join(timeout=1)
-        if process.is_alive():
-            process.kill()
-            process.join()
-        result = f"Error: Job exceeded {TIMEOUT_SECONDS} second timeout"
-        update_stats(success=False)
-    else:
-        # Process finished normally
-        if not result_queue.empty():
-            status, result = result_queue.get()
-            if status == 'error':
-                result = f"Error: {result}"
-                update_stats(success=False)
-            else:
-                update_stats(success=True)
-        else:
-            result = "Error: Job finished but produced no output"
-            update_stats(success=False)
-    
-    with open(log_path, 'a') as log_file:
-        log_file.write(result)
+        log.flush()
+        
+        # Prints land in the log as the job runs, so the job page can follow along
+        streamed = 0
+        def write_output(text):
+            nonlocal streamed
+            streamed += len(text)
+            log.write(text)
+            log.flush()
+        
+        status, result = sandbox_pool.run(code, TIMEOUT_SECONDS, write_output,
+                                          lambda profile: store.set_profile(job_hash, profile),
+                                          record=job_hash if recording.RECORD_JOBS else None)
+        
+        if status == 'timeout':
+            result = f"Error: Job exceeded {TIMEOUT_SECONDS} second timeout"
+        elif status == 'cpu':
+            result = f"Error: Job killed after using {CPU_SECONDS} seconds of CPU time"
+        elif status == 'memory':
+            result = f"Error: Job killed for using more than {MEMORY_MB} MB of memory"
+        elif status in heartbeat.REASONS:
+            # The rest of the job's turn goes to the next job in the queue
+            store.bump('reclaimed_seconds', max(TIMEOUT_SECONDS - result, 0))
+            store.bump(f'stopped_{status}')
+            print(f"Watchdog stopped {job_hash} after {result:.1f}s: {status}")
+            result = "Error: Job stopped early, " + {
+                'stalled': f"its process stopped responding for {STALL_SECONDS:g} seconds",
+                'no_frames': f"it showed no frames in its first {NO_FRAMES_SECONDS:g} seconds",
+                'static': f"the LEDs did not change for {STATIC_SECONDS:g} seconds",
+            }[status]
+        elif status == 'crashed':
+            reason = f"signal {-result}" if result is not None and result < 0 else f"exit code {result}"
+            result = f"Error: Job's process died ({reason}) before reporting back"
+        elif status == 'error':
+            result = f"Error: {result}"
+        if status != 'success' and streamed:
+            result = "\n\n" + result
+        success = status == 'success'
+        store.bump('jobs')
+        if not success:
+            store.bump('errors')
+        log.write(result)
     
     os.remove(working_path)
+    archive_job(job_hash, code, log_path)
+    return success
+
+def queue_pending(job_queue):
+    for job in store.by_status(PENDING, tree=TREE):
+        job_queue.push(job["hash"], job["username"], job["submitted"])
+
+def lookup(job_hash):
+    job = store.get(job_hash)
+    return (job["username"], job["submitted"]) if job else None
 
 def worker_loop():
-    print("Worker started")
-    idle_starter.poke()
+    print(f"Worker started for tree {TREE}")
+    try:
+        serve()
+    finally:
+        sandbox_pool.close()
+
+def serve():
+    if TREE == DEFAULT_TREE:
+        store.import_metadata(METADATA_FILE, JOB_DIR)
+        store.import_stats(STATS_FILE)
+        archive.import_files(lambda job_hash: (store.get(job_hash) or {"status": COMPLETED})["status"] in FINISHED)
+    store.fail_running(TREE)
+    sandbox_pool.warm()
+    job_queue = JobQueue(store.last_served(TREE))
+    job_queue.listen(socket_path(TREE), lookup)
+    queue_pending(job_queue)
+    
+    if not len(job_queue):
+        idle_starter.poke()
     
     while True:
-        metadata = load_metadata()
-        job_files = sorted([f for f in os.listdir(JOB_DIR) if f.endswith(".py") and not f.endswith("_working.py")])
+        job_hash = job_queue.pop(timeout=RESCAN_SECONDS)
+        if job_hash is None:
+            queue_pending(job_queue)
+            continue
+        
+        job_path = os.path.join(JOB_DIR, f"{job_hash}.py")
+        meta = store.get(job_hash)
+        if meta is None or meta["tree"] != TREE or not os.path.exists(job_path):
+            continue
+        if not store.transition(job_hash, PENDING, RUNNING):
+            continue
+        
+        # Cancel idle animation immediately when we find jobs
+        idle_starter.cancel()
+        stop_idle_animation()
+        
+        working_path = job_path.replace(".py", "_working.py")
+        
+        os.rename(job_path, working_path)
+        print(f"Running: {job_hash}")
+        if compositor.DIRECTORY and NOTICE_SECONDS:
+            show_notice(meta["username"])
         
-        if job_files:
-            # Cancel idle animation immediately when we find jobs
-            idle_starter.cancel()
-            stop_idle_animation()
-            
-            job_file = job_files[0]
-            job_hash = job_file.replace(".py", "")
-            meta = metadata.get(job_hash, {"filename": "unknown", "username": "unknown"})
-            
-            job_path = os.path.join(JOB_DIR, job_file)
-            working_path = job_path.replace(".py", "_working.py")
-            log_path = os.path.join(LOG_DIR, f"{job_hash}.log")
-            archive_path = os.path.join(ARCHIVE_DIR, f"{job_hash}.py")
-            
-            os.rename(job_path, working_path)
-            print(f"Running: {job_hash}")
-            
-            run_job(working_path, log_path, archive_path, meta, job_hash)
-            cleanup_old_logs()
-            
-            # Only poke idle animation if queue is empty now
-            remaining_jobs = [f for f in os.listdir(JOB_DIR) if f.endswith(".py") and not f.endswith("_working.py")]
-            if not remaining_jobs:
-                idle_starter.poke()
+        success = run_job(working_path, meta, job_hash)
+        if compositor.DIRECTORY:
+            # A killed job cannot release its own layer
+            compositor.layer(compositor.JOB).release()
+        store.transition(job_hash, RUNNING, COMPLETED if success else FAILED)
+        recording.remove_partial()
+        recording.prune(RECORDINGS_KEPT)
+        store.purge()
         
-        time.sleep(2)
+        # Only poke idle animation if queue is empty now
+        if not len(job_queue):
+            idle_starter.poke()
 
 if __name__ == "__main__":
+    # start.py stops the worker with SIGTERM; unwind so the sandboxes are stopped with it
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     worker_loop()
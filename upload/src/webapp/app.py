@@ -11,10 +11,16 @@ def create_app():
     from .routes.queue import queue_bp
     from .routes.job import job_bp
     from .routes.editor import editor_bp
+    from .routes.events import events_bp
+    from .routes.metrics import metrics_bp
+    from . import assets
     
     app.register_blueprint(queue_bp)
     app.register_blueprint(job_bp)
     app.register_blueprint(editor_bp)
+    app.register_blueprint(events_bp)
+    app.register_blueprint(metrics_bp)
+    assets.init_app(app)
     
     return app
 
@@ -0,0 +1,109 @@
+"""Static files served from memory, precompressed, with far-future cache headers
+
+Every file under static/ is read once (and again only if its mtime changes) and compressed with gzip,
+and with brotli when the brotli module is installed. url_for('static', ...) adds the file's content
+hash as ?v=, so a changed file gets a new URL and browsers may keep each version for a year; a request
+without the current hash gets the file with a revalidate-every-time header instead.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import Response, abort, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MAX_AGE = 365 * 86400
+# Smaller files gain nothing from compression once headers are counted
+MIN_COMPRESS_BYTES = 256
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+class Asset:
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.version = hashlib.sha256(data).hexdigest()[:12]
+        self.bodies = {"identity": data}
+        if len(data) >= MIN_COMPRESS_BYTES and self.mimetype.startswith(COMPRESSIBLE):
+            candidates = {"gzip": gzip.compress(data, 9, mtime=0)}
+            if brotli is not None:
+                candidates["br"] = brotli.compress(data, quality=11)
+            self.bodies.update((encoding, body) for encoding, body in candidates.items() if len(body) < len(data))
+
+    def stale(self):
+        try:
+            return os.stat(self.path).st_mtime != self.mtime
+        except OSError:
+            return True
+
+def accepted(header):
+    """Encodings from an Accept-Encoding header, except those refused with q=0"""
+    encodings = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+class StaticFiles:
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.assets = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        asset = self.assets.get(filename)
+        if asset is not None and not asset.stale():
+            return asset
+        path = os.path.abspath(os.path.join(self.folder, filename))
+        if not path.startswith(self.folder + os.sep) or not os.path.isfile(path):
+            return None
+        with self._lock:
+            asset = self.assets[filename] = Asset(path)
+        return asset
+
+    def url_defaults(self, endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            asset = self.get(values["filename"])
+            if asset is not None:
+                values["v"] = asset.version
+
+    def serve(self, filename):
+        asset = self.get(filename)
+        if asset is None:
+            abort(404)
+        offered = accepted(request.headers.get("Accept-Encoding", ""))
+        encoding = next((e for e in ("br", "gzip") if e in asset.bodies and e in offered), "identity")
+        response = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        response.set_etag(f"{asset.version}-{encoding}")
+        if request.args.get("v") == asset.version:
+            response.headers["Cache-Control"] = f"public, max-age={MAX_AGE}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+def init_app(app):
+    """Serve app.static_folder through StaticFiles instead of Flask's send_from_directory"""
+    files = StaticFiles(app.static_folder)
+    for name in os.listdir(files.folder):
+        files.get(name)
+    app.url_defaults(files.url_defaults)
+    app.view_functions["static"] = files.serve
+    return files
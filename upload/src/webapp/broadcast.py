@@ -0,0 +1,159 @@
+"""Server-Sent Events fan-out: one thread watches the job store and job logs, every client just waits
+
+Work per tick is one check per source and one read per watched log, however many browsers are subscribed.
+"""
+import codecs
+import json
+import os
+import threading
+import time
+from collections import deque
+
+TICK_SECONDS = float(os.environ.get('EVENT_TICK', 0.5))
+KEEPALIVE_SECONDS = 15
+# A client this far behind gets disconnected; EventSource reconnects and starts from a fresh state
+MAX_BACKLOG = 256
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class Subscriber:
+    def __init__(self):
+        self.events = deque()
+        self.ready = threading.Event()
+        self.overflowed = False
+
+    def push(self, message):
+        if len(self.events) >= MAX_BACKLOG:
+            self.overflowed = True
+        else:
+            self.events.append(message)
+        self.ready.set()
+
+class LogWatcher:
+    def __init__(self, job_hash, read_log, status):
+        self.job_hash = job_hash
+        self.read_log = read_log
+        self.status = status
+        self.offset = 0
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.subscribers = set()
+
+    def read_new(self):
+        data = self.read_log(self.job_hash, self.offset)
+        if not data:
+            return ""
+        self.offset += len(data)
+        # Output arrives in chunks that can end mid-character
+        return self.decoder.decode(data)
+
+class Broadcaster:
+    def __init__(self, read_log, get_status):
+        """read_log(job_hash, offset, length=None) returns the bytes of a job's log from offset on"""
+        self.read_log = read_log
+        self.get_status = get_status
+        self.sources = {}
+        self.topics = {}
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_source(self, topic, event, poll):
+        """poll() returns the current payload for topic; it is pushed whenever it changes"""
+        self.sources[topic] = [event, poll, None]
+        self.topics[topic] = set()
+
+    def subscribe(self, topic):
+        """Returns (subscriber, initial messages)"""
+        sub = Subscriber()
+        with self._lock:
+            self._start()
+            event, poll, last = self.sources[topic]
+            if last is None:
+                last = self.sources[topic][2] = poll()
+            self.topics[topic].add(sub)
+        return sub, [format_event(event, last)]
+
+    def subscribe_job(self, job_hash):
+        """Returns (subscriber, initial messages): the status and the whole log so far, as `log`;
+        everything after arrives as appended `output` chunks"""
+        sub = Subscriber()
+        with self._lock:
+            self._start()
+            watcher = self.jobs.get(job_hash)
+            if watcher is None:
+                watcher = self.jobs[job_hash] = LogWatcher(job_hash, self.read_log, self.get_status(job_hash))
+                watcher.read_new()
+            watcher.subscribers.add(sub)
+            output = ""
+            if watcher.offset:
+                output = self.read_log(job_hash, 0, watcher.offset - len(watcher.decoder.getstate()[0]))
+                output = output.decode(errors="replace")
+        return sub, [format_event("status", watcher.status), format_event("log", output)]
+
+    def unsubscribe(self, sub, topic=None, job_hash=None):
+        with self._lock:
+            if topic is not None:
+                self.topics[topic].discard(sub)
+            if job_hash is not None and job_hash in self.jobs:
+                self.jobs[job_hash].subscribers.discard(sub)
+                if not self.jobs[job_hash].subscribers:
+                    del self.jobs[job_hash]
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(TICK_SECONDS)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Broadcaster tick failed: {e}")
+
+    def tick(self):
+        for topic, source in self.sources.items():
+            event, poll, last = source
+            if not self.topics[topic]:
+                source[2] = None
+                continue
+            payload = poll()
+            if payload != last:
+                source[2] = payload
+                self._publish(self.topics[topic], format_event(event, payload))
+
+        with self._lock:
+            watchers = list(self.jobs.values())
+        for watcher in watchers:
+            # Status first: the worker finishes writing the log before it marks the job done,
+            # so a finished status here means the read below gets the last of the output
+            status = self.get_status(watcher.job_hash)
+            with self._lock:
+                output = watcher.read_new()
+                if output:
+                    self._publish(watcher.subscribers, format_event("output", output))
+            if status != watcher.status:
+                watcher.status = status
+                self._publish(watcher.subscribers, format_event("status", status))
+
+    def _publish(self, subscribers, message):
+        for sub in list(subscribers):
+            sub.push(message)
+
+    def stream(self, sub, initial, topic=None, job_hash=None):
+        """Response generator for one client"""
+        try:
+            yield "retry: 2000\n\n"
+            for message in initial:
+                yield message
+            while not sub.overflowed:
+                if not sub.ready.wait(KEEPALIVE_SECONDS):
+                    yield ": keepalive\n\n"
+                    continue
+                sub.ready.clear()
+                while sub.events:
+                    yield sub.events.popleft()
+        finally:
+            self.unsubscribe(sub, topic, job_hash)
@@ -0,0 +1,32 @@
+"""Compiles submissions with RestrictedPython on a process pool, so policy errors are reported at submit
+time and the runner finds the bytecode already cached when the job reaches the tree"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from runner.compiler import cached, precompile
+
+COMPILE_WORKERS = int(os.environ.get('COMPILE_WORKERS', 2))
+COMPILE_TIMEOUT = 5
+
+def _pool():
+    # Spawned, not forked: the web process has request and broadcaster threads, whose locks a fork
+    # could copy mid-hold
+    return ProcessPoolExecutor(max_workers=COMPILE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+_executor = _pool()
+
+def validate(code):
+    """Restricted-policy errors for code, empty if it compiled (and is now cached)"""
+    global _executor
+    # Resubmissions of code that compiled before skip the round trip to the pool
+    if cached(code):
+        return []
+    try:
+        return _executor.submit(precompile, code).result(timeout=COMPILE_TIMEOUT)
+    except TimeoutError:
+        return ["Compilation took too long"]
+    except BrokenProcessPool:
+        _executor = _pool()
+        return precompile(code)
@@ -0,0 +1,86 @@
+"""Previews: runs a program on its own process pool against the simulated strip and a virtual clock
+(runner/preview.py), so a user sees roughly what it draws without waiting for the tree
+
+The pool's processes are spawned fresh, never forked from the webapp, so nothing of the web process
+(its mirror, its LED settings) reaches them. Each web process runs at most PREVIEW_CONCURRENCY previews
+at once and keeps its last PREVIEW_CACHE results by code hash; programs are rate limited per client IP and
+username on buckets of their own, apart from submissions.
+"""
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from runner import preview
+from runner.compiler import code_hash
+
+PREVIEW_WORKERS = int(os.environ.get('PREVIEW_WORKERS', 2))
+PREVIEW_CONCURRENCY = int(os.environ.get('PREVIEW_CONCURRENCY', PREVIEW_WORKERS))
+PREVIEW_CACHE = int(os.environ.get('PREVIEW_CACHE', 128))
+# Samples in the strip, over the virtual seconds a job gets on the tree
+PREVIEW_FRAMES = int(os.environ.get('PREVIEW_FRAMES', 90))
+PREVIEW_SECONDS = float(os.environ.get('JOB_TIMEOUT', 45))
+PREVIEW_RATE = float(os.environ.get('PREVIEW_RATE', 0.5))
+PREVIEW_BURST = float(os.environ.get('PREVIEW_BURST', 5))
+# On top of the sandbox's own limits: a freshly spawned pool process imports the runner first
+PREVIEW_TIMEOUT = preview.WALL_SECONDS + preview.GRACE_SECONDS + 5
+# Results that only say the pool was in trouble are not worth keeping
+UNCACHED = ('timeout', 'crashed')
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PREVIEW_CONCURRENCY)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _pool():
+    # Started on first use, so importing the webapp (or a gunicorn master preloading it) starts no processes
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PREVIEW_WORKERS, initializer=preview.init,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+def _reset_pool(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False)
+
+def cached(code):
+    """The stored preview of code, or None"""
+    digest = code_hash(code)
+    with _cache_lock:
+        if digest in _cache:
+            _cache.move_to_end(digest)
+            return _cache[digest]
+    return None
+
+def _store(code, result):
+    with _cache_lock:
+        _cache[code_hash(code)] = result
+        while len(_cache) > PREVIEW_CACHE:
+            _cache.popitem(last=False)
+
+def run(code):
+    """The preview of code (see runner.preview.run), or None if this process already runs PREVIEW_CONCURRENCY"""
+    if not _slots.acquire(blocking=False):
+        return None
+    try:
+        executor = _pool()
+        try:
+            result = executor.submit(preview.run, code, PREVIEW_SECONDS, PREVIEW_FRAMES).result(timeout=PREVIEW_TIMEOUT)
+        except TimeoutError:
+            result = {"status": "timeout", "output": "", "frames": []}
+        except BrokenProcessPool:
+            _reset_pool(executor)
+            result = {"status": "crashed", "output": "", "frames": []}
+    finally:
+        _slots.release()
+    if result["status"] not in UNCACHED:
+        _store(code, result)
+    return result
@@ -0,0 +1,122 @@
+"""Token-bucket rate limiting for submissions, per client IP and per username
+
+Every key gets a bucket of `burst` tokens that refills at `rate` tokens a second; a submission takes
+one. A bucket that has refilled completely is no different from no bucket, so buckets are kept in
+least recently used order and dropped from the old end once full, or once there are more than
+max_keys of them.
+
+RateLimiter keeps the buckets in memory, for a single webapp process. Under several web workers
+(WEB_WORKERS > 1) every worker would hand out its own tokens, so SharedRateLimiter keeps them in a
+small SQLite database next to the job store instead.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from scheduler.jobstore import DB_PATH
+
+RATE = float(os.environ.get('SUBMIT_RATE', 0.2))
+BURST = float(os.environ.get('SUBMIT_BURST', 5))
+MAX_KEYS = int(os.environ.get('SUBMIT_LIMIT_KEYS', 10000))
+LIMIT_DB = os.environ.get('SUBMIT_LIMIT_DB', os.path.join(os.path.dirname(DB_PATH), "limits.db"))
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 1))
+
+def _refill(limiter, state, now):
+    tokens, last = state
+    return min(limiter.burst, tokens + (now - last) * limiter.rate)
+
+def _shortfall(limiter, levels):
+    """Seconds until every level has a whole token, 0 if they all have one now"""
+    short = max((1 - tokens for tokens in levels), default=0)
+    if short <= 0:
+        return 0
+    return short / limiter.rate if limiter.rate else float('inf')
+
+class RateLimiter:
+    def __init__(self, rate=RATE, burst=BURST, max_keys=MAX_KEYS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, *keys):
+        """Take a token from every key's bucket, or from none of them.
+        Returns 0 if allowed, else the seconds until it would be"""
+        now = self.clock()
+        with self._lock:
+            levels = [_refill(self, self._buckets.get(key, (self.burst, now)), now) for key in keys]
+            wait = _shortfall(self, levels)
+            if wait:
+                return wait
+            for key, tokens in zip(keys, levels):
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+            while self._buckets:
+                key, (tokens, last) = next(iter(self._buckets.items()))
+                if len(self._buckets) <= self.max_keys and tokens + (now - last) * self.rate < self.burst:
+                    break
+                del self._buckets[key]
+            return 0
+
+class SharedRateLimiter:
+    """The same buckets in SQLite, shared by every process that opens path"""
+    SCHEMA = "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+    # Full buckets are deleted every this many takes
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path=LIMIT_DB, rate=RATE, burst=BURST, clock=time.time):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._local = threading.local()
+        self._takes = 0
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+            db.execute(self.SCHEMA)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def take(self, *keys):
+        """Take a token from every key's bucket, or from none of them.
+        Returns 0 if allowed, else the seconds until it would be"""
+        db = self._db()
+        now = self.clock()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            marks = ", ".join("?" * len(keys))
+            stored = dict((key, (tokens, updated)) for key, tokens, updated in
+                          db.execute(f"SELECT key, tokens, updated FROM buckets WHERE key IN ({marks})", keys))
+            levels = [_refill(self, stored.get(key, (self.burst, now)), now) for key in keys]
+            wait = _shortfall(self, levels)
+            if not wait:
+                db.executemany("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                               [(key, tokens - 1, now) for key, tokens in zip(keys, levels)])
+                self._takes += 1
+                if self._takes % self.SWEEP_EVERY == 0:
+                    db.execute("DELETE FROM buckets WHERE tokens + (? - updated) * ? >= ?", (now, self.rate, self.burst))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return wait
+
+def make_limiter(rate=RATE, burst=BURST):
+    """In memory for one web process, in SQLite when several share the submissions"""
+    return SharedRateLimiter(rate=rate, burst=burst) if WEB_WORKERS > 1 else RateLimiter(rate, burst)
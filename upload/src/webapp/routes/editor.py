@@ -1,30 +1,77 @@
 from flask import Blueprint, request, render_template, jsonify, redirect, url_for
 import os
-import ast
-import hashlib
-import time
-import json
-from datetime import datetime
+import secrets
+import sqlite3
+from scheduler.jobqueue import notify_worker, socket_path
+from scheduler.jobstore import JobStore, TREES, DEFAULT_TREE, PENDING, FAILED
+from runner import recording
+from runner.compiler import code_hash
+from .. import preview
+from ..precompile import validate
+from ..ratelimit import make_limiter
 
 editor_bp = Blueprint('editor', __name__)
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scheduler'))
 JOB_DIR = os.path.join(BASE_DIR, "jobs")
-METADATA_FILE = os.path.join(BASE_DIR, "metadata.json")
 
-def load_metadata():
-    if os.path.exists(METADATA_FILE):
-        with open(METADATA_FILE, 'r') as f:
-            return json.load(f)
-    return {}
-
-def save_metadata(metadata):
-    with open(METADATA_FILE, 'w') as f:
-        json.dump(metadata, f)
+# Jobs one user may have waiting at once; the queue takes turns between users, this caps the backlog
+MAX_PENDING = int(os.environ.get('MAX_PENDING_PER_USER', 5))
+
+store = JobStore()
+limiter = make_limiter()
+preview_limiter = make_limiter(preview.PREVIEW_RATE, preview.PREVIEW_BURST)
+
+def enqueue(code, username, filename=None, tree=DEFAULT_TREE):
+    """Add the job to the store, write its file and wake the tree's worker. Returns the job hash:
+    the existing one if the user already has this code waiting on this tree, or None if the user
+    already has MAX_PENDING jobs waiting"""
+    digest = code_hash(code)
+    existing = store.pending_copy(username, digest, tree)
+    if existing is not None:
+        return existing
+    # Claim a random hash in the store first, so the job file can never overwrite another job's
+    while True:
+        job_hash = secrets.token_hex(4)
+        try:
+            if not store.add(job_hash, username, filename or f"{job_hash}.py", tree=tree,
+                             code_hash=digest, max_pending=MAX_PENDING):
+                return None
+            break
+        except sqlite3.IntegrityError:
+            continue
+    try:
+        with open(os.path.join(JOB_DIR, f"{job_hash}.py"), "w") as f:
+            f.write(code)
+    except OSError:
+        store.transition(job_hash, PENDING, FAILED)
+        raise
+    notify_worker(job_hash, socket_path(tree))
+    return job_hash
+
+def too_many_pending():
+    return jsonify({"error": f"You already have {MAX_PENDING} jobs waiting, try again when one has run"}), 429
+
+def rate_limited(username, buckets=limiter, kind="submissions"):
+    """A 429 response if this client or username is submitting too fast, else None"""
+    # Everyone who leaves the name empty is "anonymous"; those are only limited per IP.
+    # Other kinds of request get keys of their own, in case they share the submissions' database
+    prefix = "" if kind == "submissions" else f"{kind}:"
+    keys = [f"{prefix}ip:{request.remote_addr}"] + ([f"{prefix}user:{username}"] if username != "anonymous" else [])
+    wait = buckets.take(*keys)
+    if not wait:
+        return None
+    response = jsonify({"error": f"Too many {kind}, try again in {wait:.0f} seconds"})
+    response.headers["Retry-After"] = str(int(wait) + 1)
+    return response, 429
+
+def requested_tree():
+    tree = request.form.get("tree") or DEFAULT_TREE
+    return tree if tree in TREES else None
 
 @editor_bp.route("/")
 def index():
-    return render_template("editor.html")
+    return render_template("editor.html", trees=TREES)
 
 @editor_bp.route("/editor", methods=["GET", "POST"])
 def editor_view():
@@ -35,23 +82,25 @@ def editor_view():
         if not code:
             return jsonify({"error": "No code"}), 400
 
-        try:
-            ast.parse(code)
-        except:
-            return jsonify({"error": "Invalid Python"}), 400
-
-        job_hash = hashlib.sha256((code[:8] + str(time.time())).encode()).hexdigest()[:8]
-        
-        metadata = load_metadata()
-        metadata[job_hash] = {"filename": "editor.py", "username": username, "timestamp": time.time()}
-        save_metadata(metadata)
-        
-        with open(os.path.join(JOB_DIR, f"{job_hash}.py"), "w") as f:
-            f.write(code)
+        limited = rate_limited(username)
+        if limited:
+            return limited
+
+        tree = requested_tree()
+        if tree is None:
+            return jsonify({"error": "No such tree"}), 400
+
+        errors = validate(code)
+        if errors:
+            return jsonify({"error": "Invalid Python: " + "; ".join(errors)}), 400
+
+        job_hash = enqueue(code, username, "editor.py", tree)
+        if job_hash is None:
+            return too_many_pending()
 
         return jsonify({"job_hash": job_hash})
     
-    return render_template("editor.html")
+    return render_template("editor.html", trees=TREES)
 
 @editor_bp.route('/submit', methods=['POST'])
 def submit():
@@ -61,26 +110,63 @@ def submit():
     if not code:
         return jsonify({"error": "No code"}), 400
 
-    try:
-        ast.parse(code)
-    except:
-        return jsonify({"error": "Invalid Python"}), 400
-
-    job_hash = hashlib.sha256((code[:8] + str(time.time())).encode()).hexdigest()[:8]
-    filename = f"{job_hash}.py"
-    filepath = os.path.join(JOB_DIR, filename)
-
-    with open(filepath, "w") as f:
-        f.write(code)
-
-    job_queue = {}
-    job_queue[job_hash] = {
-        'username': username,
-        'filename': filename,
-        'filepath': filepath,
-        'status': 'pending',
-        'output': '',
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
+    limited = rate_limited(username)
+    if limited:
+        return limited
+
+    tree = requested_tree()
+    if tree is None:
+        return jsonify({"error": "No such tree"}), 400
+
+    errors = validate(code)
+    if errors:
+        return jsonify({"error": "Invalid Python: " + "; ".join(errors)}), 400
+
+    if enqueue(code, username, tree=tree) is None:
+        return too_many_pending()
 
     return redirect(url_for('editor.index'))
+
+@editor_bp.route('/api/preview', methods=['POST'])
+def preview_code():
+    """Run the code on the preview pool (never the tree) and return a strip of frames sampled over its 45 s"""
+    username = request.form.get("username", "anonymous")[:32]
+    code = request.form.get("editor_code")
+
+    if not code:
+        return jsonify({"error": "No code"}), 400
+
+    result = preview.cached(code)
+    if result is not None:
+        return jsonify({**result, "cached": True})
+
+    limited = rate_limited(username, preview_limiter, "previews")
+    if limited:
+        return limited
+
+    errors = validate(code)
+    if errors:
+        return jsonify({"error": "Invalid Python: " + "; ".join(errors)}), 400
+
+    result = preview.run(code)
+    if result is None:
+        response = jsonify({"error": "Previews are busy, try again in a moment"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+    return jsonify({**result, "cached": False})
+
+@editor_bp.route('/api/job/<job_hash>/replay', methods=['POST'])
+def replay(job_hash):
+    """Queue a rerun of a finished job from its recording; plays back the frames instead of running the code.
+    The rerun is the requester's job, limited like their own submissions, not the original author's"""
+    username = request.form.get("username", "anonymous")[:32] or "anonymous"
+    job = store.get(job_hash) if job_hash.isalnum() else None
+    if job is None or not os.path.exists(recording.path_for(job_hash)):
+        return jsonify({"error": "No recording of that job"}), 404
+    limited = rate_limited(username)
+    if limited:
+        return limited
+    new_hash = enqueue(f"replay({job_hash!r})\n", username, f"replay of {job['filename']}", job["tree"])
+    if new_hash is None:
+        return too_many_pending()
+    return jsonify({"job_hash": new_hash})
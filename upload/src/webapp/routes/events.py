@@ -0,0 +1,103 @@
+from flask import Blueprint, Response, abort, jsonify, request
+import base64
+import os
+import threading
+import time
+from runner import mirror
+from runner.protocol import FrameEncoder
+from scheduler.jobstore import DEFAULT_TREE, TREES
+from ..broadcast import Broadcaster, KEEPALIVE_SECONDS
+from .job import archive, job_status
+from .queue import get_queue_data, stream_data
+
+events_bp = Blueprint('events', __name__)
+
+# Per-viewer cap on mirrored frames; whatever the tree does in between is simply skipped
+MIRROR_FPS = float(os.environ.get('MIRROR_FPS', 15))
+
+# Every open stream holds one of the worker's WEB_THREADS threads; past this many, new ones get a 503
+# and the pages poll instead, so a crowd of viewers cannot starve ordinary requests
+MAX_STREAMS = int(os.environ.get('WEB_MAX_STREAMS', max(1, int(os.environ.get('WEB_THREADS', 64)) * 3 // 4)))
+_streams = threading.BoundedSemaphore(MAX_STREAMS)
+
+broadcaster = Broadcaster(archive.read_log, job_status)
+broadcaster.add_source('queue', 'queue', get_queue_data)
+broadcaster.add_source('stream', 'stream', stream_data)
+
+def streams_full():
+    response = jsonify({"error": "Too many live viewers, poll instead"})
+    response.status_code = 503
+    response.headers['Retry-After'] = '30'
+    return response
+
+def event_stream(start):
+    """Stream start()'s generator as Server-Sent Events, holding a stream slot until the client goes away.
+    start is only called once there is a slot, so a refused client never subscribes"""
+    if not _streams.acquire(blocking=False):
+        return streams_full()
+    try:
+        response = Response(start(), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except BaseException:
+        _streams.release()
+        raise
+    response.call_on_close(_streams.release)
+    return response
+
+@events_bp.route('/api/queue/events')
+def queue_events():
+    def start():
+        sub, initial = broadcaster.subscribe('queue')
+        return broadcaster.stream(sub, initial, topic='queue')
+    return event_stream(start)
+
+@events_bp.route('/api/stream/events')
+def stream_events():
+    """Push version of /api/stream for the OBS overlays"""
+    def start():
+        sub, initial = broadcaster.subscribe('stream')
+        return broadcaster.stream(sub, initial, topic='stream')
+    return event_stream(start)
+
+@events_bp.route('/api/job/<job_hash>/events')
+def job_events(job_hash):
+    """Job status changes and log output, tailed from where the client left off"""
+    if not job_hash.isalnum():
+        abort(404)
+    def start():
+        sub, initial = broadcaster.subscribe_job(job_hash)
+        return broadcaster.stream(sub, initial, job_hash=job_hash)
+    return event_stream(start)
+
+def frame_stream(path):
+    """Newest frame in the ring at path at most MIRROR_FPS times a second, as base64 binary protocol messages
+    (runner/protocol.py), delta-encoded against whatever this viewer was sent last"""
+    interval = 1 / MIRROR_FPS
+    ring = encoder = None
+    last_seq = 0
+    quiet = 0.0
+    yield "retry: 2000\n\n"
+    while True:
+        if ring is None or ring.replaced(path):
+            ring = mirror.open_reader(path)
+            encoder = FrameEncoder(ring.count) if ring else None
+        latest = ring.latest() if ring else None
+        if latest and latest[0] != last_seq:
+            last_seq, _, frame = latest
+            quiet = 0.0
+            yield f"event: frame\ndata: {base64.b64encode(encoder.encode(frame)).decode()}\n\n"
+        else:
+            quiet += interval
+            if quiet >= KEEPALIVE_SECONDS:
+                quiet = 0.0
+                yield ": keepalive\n\n"
+        time.sleep(interval)
+
+@events_bp.route('/api/frames')
+def frames():
+    """Live mirror of a tree's LEDs (?tree=, default the first)"""
+    tree = request.args.get('tree') or DEFAULT_TREE
+    path = mirror.path_for(tree) if tree in TREES else ""
+    if not path:
+        abort(404)
+    return event_stream(lambda: frame_stream(path))
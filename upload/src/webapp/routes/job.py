@@ -1,45 +1,45 @@
-from flask import Blueprint, render_template, jsonify
-import os
+from flask import Blueprint, render_template, jsonify, request
+import codecs
 import json
+import os
+from scheduler.jobarchive import JobArchive
+from scheduler.jobstore import DEFAULT_TREE, JobStore
+from runner import mirror, recording
 
 job_bp = Blueprint('job', __name__)
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scheduler'))
-JOB_DIR = os.path.join(BASE_DIR, "jobs")
-LOG_DIR = os.path.join(BASE_DIR, "logs")
-METADATA_FILE = os.path.join(BASE_DIR, "metadata.json")
+store = JobStore()
+archive = JobArchive()
+UNKNOWN_JOB = {"filename": "unknown", "username": "unknown", "status": "completed"}
+
+def job_status(job_hash):
+    return (store.get(job_hash) or UNKNOWN_JOB)["status"]
 
-def load_metadata():
-    if os.path.exists(METADATA_FILE):
-        with open(METADATA_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+def read_log(job_hash, offset=0):
+    """Log text from byte offset on, and the offset to continue from; never splits a UTF-8 character"""
+    data = archive.read_log(job_hash, offset)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    text = decoder.decode(data)
+    return text, offset + len(data) - len(decoder.getstate()[0])
 
 @job_bp.route('/job/<job_hash>')
 def job_view(job_hash):
-    status = "completed"
+    meta = store.get(job_hash) or UNKNOWN_JOB
+    output = archive.read_log(job_hash).decode(errors="replace")
     
-    if os.path.exists(JOB_DIR):
-        for f in os.listdir(JOB_DIR):
-            if f.replace("_working.py", "").replace(".py", "") == job_hash:
-                status = "running" if "_working" in f else "pending"
-                break
-    
-    meta = load_metadata().get(job_hash, {"filename": "unknown", "username": "unknown"})
-    log_path = os.path.join(LOG_DIR, f"{job_hash}.log")
-    output = open(log_path, 'r').read() if os.path.exists(log_path) else ""
+    replayable = job_hash.isalnum() and os.path.exists(recording.path_for(job_hash))
+    # The live mirror shows the job's own tree, if that tree is mirrored at all
+    tree = meta.get("tree", DEFAULT_TREE)
     
     return render_template("job.html", job_hash=job_hash, filename=meta["filename"],
-                         username=meta["username"], status=status, output=output)
+                         username=meta["username"], status=meta["status"], output=output,
+                         replayable=replayable, tree=tree, mirrored=bool(mirror.path_for(tree)))
 
 @job_bp.route('/api/job/<job_hash>')
 def job_api(job_hash):
-    status = "completed"
-    if os.path.exists(JOB_DIR):
-        for f in os.listdir(JOB_DIR):
-            if f.replace("_working.py", "").replace(".py", "") == job_hash:
-                status = "running" if "_working" in f else "pending"
-    
-    log_path = os.path.join(LOG_DIR, f"{job_hash}.log")
-    output = open(log_path, 'r').read() if os.path.exists(log_path) else ""
-    return jsonify({"status": status, "output": output})
+    """The whole log, or with ?offset= only what was written after that byte offset"""
+    offset = request.args.get('offset', 0, type=int)
+    meta = store.get(job_hash) or UNKNOWN_JOB
+    output, offset = read_log(job_hash, max(offset, 0))
+    profile = json.loads(meta["profile"]) if meta.get("profile") else None
+    return jsonify({"status": meta["status"], "output": output, "offset": offset, "profile": profile})
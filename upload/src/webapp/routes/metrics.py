@@ -0,0 +1,64 @@
+from flask import Blueprint, Response
+import json
+import time
+from scheduler.jobstore import PENDING, RUNNING, COMPLETED, FAILED
+from runner.heartbeat import REASONS
+from .queue import snapshot
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for sample in samples:
+        # (labels, value), or (suffix, labels, value) for a summary's _sum and _count
+        suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+        label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+        lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+
+def render_metrics(store):
+    """Prometheus text format: lifetime counters, the queue, and the last profiled job (JOB_PROFILE=1)"""
+    counters = store.counters()
+    counts = store.counts()
+    lines = []
+    _metric(lines, "tree_jobs_total", "counter", "Jobs run since the store was created",
+            [({}, int(counters.get('jobs', 0)))])
+    _metric(lines, "tree_job_errors_total", "counter", "Jobs that failed or were killed",
+            [({}, int(counters.get('errors', 0)))])
+    _metric(lines, "tree_jobs_stopped_total", "counter", "Jobs the watchdog stopped before their timeout",
+            [({"reason": reason}, int(counters.get(f'stopped_{reason}', 0))) for reason in REASONS])
+    _metric(lines, "tree_reclaimed_seconds_total", "counter", "Timeout seconds the watchdog handed to the next job",
+            [({}, round(counters.get('reclaimed_seconds', 0), 3))])
+    _metric(lines, "tree_start_time_seconds", "gauge", "When the job store was created",
+            [({}, counters.get('start_time', time.time()))])
+    _metric(lines, "tree_jobs", "gauge", "Jobs in the store by status",
+            [({"status": status}, counts.get(status, 0)) for status in (PENDING, RUNNING, COMPLETED, FAILED)])
+
+    job = store.last_profiled()
+    if job:
+        profile = json.loads(job["profile"])
+        _metric(lines, "tree_last_job_frames", "gauge", "Frames the last profiled job pushed to the LEDs",
+                [({}, profile["frames"])])
+        _metric(lines, "tree_last_job_fps", "gauge", "Frame rate the last profiled job achieved",
+                [({}, round(profile["fps"], 3))])
+        _metric(lines, "tree_last_job_seconds", "gauge", "Wall and CPU time of the last profiled job",
+                [({"kind": "wall"}, round(profile["seconds"], 6)), ({"kind": "cpu"}, round(profile["cpu_seconds"], 6))])
+        samples = []
+        for stage, stats in sorted(profile["stages"].items()):
+            samples += [({"stage": stage, "quantile": "0.99"}, round(stats["p99_ms"] / 1000, 9)),
+                        ("_sum", {"stage": stage}, round(stats["mean_ms"] * stats["count"] / 1000, 9)),
+                        ("_count", {"stage": stage}, stats["count"])]
+        _metric(lines, "tree_last_job_stage_seconds", "summary", "Time per call of each LED pipeline stage", samples)
+        _metric(lines, "tree_last_job_guard_calls", "gauge", "Sandbox guard calls made by the last profiled job",
+                [({"guard": guard.strip("_")}, count) for guard, count in sorted(profile["guards"].items())])
+        # Profiles stored before the sites were counted have none
+        _metric(lines, "tree_last_job_elided_guard_sites", "gauge",
+                "Guard call sites compiled into plain Python in the last profiled job; their calls are not in guard_calls",
+                [({"guard": guard.strip("_")}, count) for guard, count in sorted(profile.get("elided_guard_sites", {}).items())])
+        _metric(lines, "tree_last_job_peak_rss_bytes", "gauge", "Peak resident memory of the last profiled job's sandbox",
+                [({}, profile["peak_rss_bytes"])])
+    return "\n".join(lines) + "\n"
+
+@metrics_bp.route('/metrics')
+def metrics():
+    return Response(render_metrics(snapshot.store), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,71 @@
+"""Queue snapshot shared by every request, rebuilt only when the job store version moves"""
+import json
+import threading
+from datetime import datetime
+
+from scheduler.eta import RuntimeModel, schedule
+from scheduler.jobstore import PENDING, RUNNING, COMPLETED, FAILED
+
+class QueueSnapshot:
+    def __init__(self, store, history):
+        self.store = store
+        self.history = history
+        self.version = None
+        self.items = []
+        self.counts = {}
+        self.current_user = None
+        self.last_user = None
+        self.body = b"[]"
+        self.etag = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Bring the snapshot up to date with the store; cheap when nothing changed"""
+        version = self.store.version()
+        if version == self.version:
+            return self
+        with self._lock:
+            if version != self.version:
+                self._rebuild(version)
+        return self
+
+    def _etas(self, active):
+        """Expected start time of every pending job, tree by tree"""
+        model = RuntimeModel.from_store(self.store)
+        etas = {}
+        for tree in {job["tree"] for job in active if job["status"] == PENDING}:
+            pending = [job for job in active if job["tree"] == tree and job["status"] == PENDING]
+            running = next((job for job in active if job["tree"] == tree and job["status"] == RUNNING), None)
+            etas.update(schedule(pending, running, model, self.store.last_served(tree)))
+        return etas
+
+    def _rebuild(self, version):
+        active = self.store.by_status(PENDING, RUNNING)
+        jobs = active + self.store.recent(self.history, COMPLETED, FAILED)
+        etas = self._etas(active)
+        items = []
+        for job in jobs:
+            timestamp = job['submitted']
+            items.append({
+                "filename": job["filename"],
+                "status": job["status"],
+                "user": job["username"],
+                "hash": job["hash"],
+                "tree": job["tree"],
+                "timestamp": datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else 'N/A',
+                "timestamp_raw": timestamp,
+                "eta": etas.get(job["hash"])
+            })
+        # Sort by timestamp (newest first)
+        items.sort(key=lambda x: x['timestamp_raw'], reverse=True)
+
+        running = [item for item in items if item['status'] == RUNNING]
+        finished = [item for item in items if item['status'] in (COMPLETED, FAILED)]
+
+        self.items = items
+        self.counts = self.store.counts()
+        self.current_user = running[0]['user'] if running else None
+        self.last_user = finished[0]['user'] if finished else None
+        self.body = json.dumps(items).encode()
+        self.etag = f"q{version}"
+        self.version = version
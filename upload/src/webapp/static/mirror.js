@@ -0,0 +1,82 @@
+// Live LED mirror: decodes the binary frame protocol (runner/protocol.py) pushed by /api/frames
+// and draws every LED as a dot on a canvas.
+const HEADER_SIZE = 13;
+const FULL = 1, DELTA = 2, RLE = 3;
+
+function applyFrame(state, bytes) {
+    const view = new DataView(bytes.buffer);
+    const flags = view.getUint8(2);
+    const count = view.getUint16(7, true);
+    const body = bytes.subarray(HEADER_SIZE);
+    if (!state.leds || state.leds.length !== count * 4) {
+        state.leds = new Uint8Array(count * 4);
+    }
+    if (flags === FULL) {
+        state.leds.set(body);
+    } else if (flags === DELTA) {
+        for (let pos = 0; pos < body.length;) {
+            const start = body[pos] | (body[pos + 1] << 8);
+            const length = body[pos + 2] | (body[pos + 3] << 8);
+            state.leds.set(body.subarray(pos + 4, pos + 4 + length * 4), start * 4);
+            pos += 4 + length * 4;
+        }
+    } else if (flags === RLE) {
+        let led = 0;
+        for (let pos = 0; pos < body.length; pos += 6) {
+            const run = body[pos] | (body[pos + 1] << 8);
+            for (let i = 0; i < run; i++, led++) {
+                state.leds.set(body.subarray(pos + 2, pos + 6), led * 4);
+            }
+        }
+    }
+}
+
+function drawFrame(canvas, leds) {
+    const count = leds.length / 4;
+    const perRow = Math.min(count, 50);
+    const cell = Math.floor(canvas.clientWidth / perRow) || 8;
+    canvas.width = perRow * cell;
+    canvas.height = Math.ceil(count / perRow) * cell;
+    const ctx = canvas.getContext('2d');
+    ctx.fillStyle = '#111';
+    ctx.fillRect(0, 0, canvas.width, canvas.height);
+    for (let i = 0; i < count; i++) {
+        const l = Math.min(leds[i * 4 + 3], 100) / 100;
+        ctx.fillStyle = `rgb(${leds[i * 4] * l}, ${leds[i * 4 + 1] * l}, ${leds[i * 4 + 2] * l})`;
+        ctx.beginPath();
+        ctx.arc((i % perRow + 0.5) * cell, (Math.floor(i / perRow) + 0.5) * cell, cell * 0.4, 0, 2 * Math.PI);
+        ctx.fill();
+    }
+}
+
+function startMirror(canvas, tree) {
+    const state = {leds: null, events: null, retry: null};
+    function connect() {
+        state.events = new EventSource('/api/frames?tree=' + encodeURIComponent(tree));
+        state.events.addEventListener('frame', e => {
+            applyFrame(state, Uint8Array.from(atob(e.data), c => c.charCodeAt(0)));
+            drawFrame(canvas, state.leds);
+        });
+        // A refused stream (the server is at its limit of live viewers) is not retried by the browser
+        state.events.onerror = () => {
+            if (state.events.readyState === EventSource.CLOSED) {
+                state.retry = setTimeout(connect, 30000);
+            }
+        };
+    }
+    connect();
+    return {close() { clearTimeout(state.retry); state.events.close(); }};
+}
+
+// Plays a /api/preview result: its frames were sampled every preview.interval seconds of the program's
+// virtual clock; shown `speed` times faster than that. Returns a function that stops playback.
+function playPreview(canvas, preview, speed = 4) {
+    const frames = preview.frames.map(f => Uint8Array.from(atob(f), c => c.charCodeAt(0)));
+    let shown = 0;
+    drawFrame(canvas, frames[0]);
+    const timer = setInterval(() => {
+        shown = (shown + 1) % frames.length;
+        drawFrame(canvas, frames[shown]);
+    }, preview.interval * 1000 / speed);
+    return () => clearInterval(timer);
+}
@@ -1,30 +1,124 @@
 #!/usr/bin/env python3
+import importlib.util
+import signal
 import subprocess
 import time
 import os
+import sys
 
-processes = []
+TREES = [tree for tree in os.environ.get("TREES", "main").split(",") if tree]
+# gunicorn with threaded workers (gunicorn.conf.py) when installed; WEB_SERVER=flask for the development server
+WEB_SERVER = os.environ.get("WEB_SERVER", "gunicorn" if importlib.util.find_spec("gunicorn") else "flask")
+# A child that stayed up this long crashed for a new reason; restart it straight away
+STABLE_SECONDS = 60
+MAX_BACKOFF_SECONDS = 30
+
+def tree_env(tree):
+    """One tree's environment: TREE_NAME, plus <TREE>_<VAR> overrides (PORCH_LED_SEGMENTS=... sets LED_SEGMENTS)"""
+    env = dict(os.environ, TREE_NAME=tree)
+    prefix = tree.upper() + "_"
+    for key, value in os.environ.items():
+        if key.startswith(prefix):
+            env[key[len(prefix):]] = value
+    if tree != TREES[0] and prefix + "FRAME_MIRROR" not in os.environ:
+        # The webapp mirrors the first tree only
+        env["FRAME_MIRROR"] = ""
+    return env
+
+class Child:
+    """A supervised process, restarted with exponential backoff whenever it exits"""
+    def __init__(self, name, args, cwd=None, env=None):
+        self.name = name
+        self.args = args
+        self.cwd = cwd
+        self.env = env
+        self.proc = None
+        self.started = 0.0
+        self.crashes = 0
+        self.restart_at = 0.0
+
+    def start(self):
+        self.proc = subprocess.Popen(self.args, cwd=self.cwd, env=self.env)
+        self.started = time.monotonic()
+        print(f"{self.name} started (pid {self.proc.pid})")
+
+    def check(self):
+        now = time.monotonic()
+        if self.proc is not None:
+            code = self.proc.poll()
+            if code is None:
+                return
+            self.crashes = 1 if now - self.started >= STABLE_SECONDS else self.crashes + 1
+            delay = min(2 ** (self.crashes - 1), MAX_BACKOFF_SECONDS)
+            print(f"{self.name} exited with code {code}, restarting in {delay}s", file=sys.stderr)
+            self.proc = None
+            self.restart_at = now + delay
+        if now >= self.restart_at:
+            self.start()
+
+    def stop(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+
+    def wait(self, timeout):
+        if self.proc is None:
+            return
+        try:
+            self.proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+def children():
+    kids = []
+    # With LED_SOCKET set, one process owns the strip and everyone else talks the binary frame protocol
+    for tree in TREES:
+        env = tree_env(tree)
+        if env.get("LED_SOCKET"):
+            kids.append(Child(f"LED server for {tree} on {env['LED_SOCKET']}", ["python", "-m", "runner.ledserver"],
+                              cwd="src/", env=env))
+
+    # With LED_COMPOSITOR set, the compositor owns the strip and the worker and its jobs draw into layers
+    for tree in TREES:
+        env = tree_env(tree)
+        if env.get("LED_COMPOSITOR"):
+            kids.append(Child(f"LED compositor for {tree} in {env['LED_COMPOSITOR']}", ["python", "-m", "runner.compositor"],
+                              cwd="src/", env=env))
+
+    if WEB_SERVER == "gunicorn":
+        kids.append(Child("Web server (gunicorn) on http://localhost:5000",
+                          ["python", "-m", "gunicorn", "-c", "gunicorn.conf.py", "webapp.app:app"], cwd="src/"))
+    else:
+        # cd to src/webapp and start the Flask development server
+        kids.append(Child("Flask server on http://localhost:5000",
+                          ["flask", "run", "--host=0.0.0.0", "--port=5000"],
+                          cwd="src/webapp/", env={**dict(os.environ), "FLASK_APP": "app.py"}))
+
+    # cd to src/scheduler and start a worker per tree
+    for tree in TREES:
+        kids.append(Child(f"Worker scheduler for {tree}", ["python", "worker.py"], cwd="src/scheduler/", env=tree_env(tree)))
+    return kids
 
 def main():
     print("Starting Chippy Tree services...")
-    # cd to src/webapp and start Flask server
-    flask_proc = subprocess.Popen(
-        ["flask", "run", "--host=0.0.0.0", "--port=5000"],
-        cwd="src/webapp/",
-        env={**dict(os.environ), "FLASK_APP": "app.py"}
-    )
-    processes.append(flask_proc)
-    print("Flask server started on http://localhost:5000")
-    
-    # cd to src/scheduler and start worker
-    worker_proc = subprocess.Popen(
-        ["python", "worker.py"],
-        cwd="src/scheduler/"
-    )
-    processes.append(worker_proc)
-    
-    while True:
+    kids = children()
+    stopping = []
+    # docker stop sends SIGTERM; take the children down with us either way
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+    for kid in kids:
+        kid.start()
+    while not stopping:
         time.sleep(1)
+        for kid in kids:
+            kid.check()
+
+    print("\nShutting down services...")
+    for kid in kids:
+        kid.stop()
+    for kid in kids:
+        kid.wait(10)
+    sys.exit(0)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()